@@ -4,135 +4,210 @@ Local Video Generator - Simple UI
 Wraps ComfyUI with a clean Gradio interface
 """
 
+import asyncio
 import gradio as gr
-import requests
-import json
+import io
 import time
 import random
 import os
-import subprocess
+import threading
+from datetime import datetime
 from pathlib import Path
-from PIL import Image
 
-COMFYUI_URL = "http://127.0.0.1:8188"
-OUTPUT_DIR = Path.home() / "ComfyUI" / "output"
+from videogen import config, metrics
+from videogen.comfy import TRANSPORT_ERRORS, ComfyError, get_client, format_event
+from videogen.cache import get_cache
+from videogen.drafts import draft_params, promote, refine, score, settings as draft_settings
+from videogen.interpolate import gpu_seconds_saved, keyframe_fps, keyframes
+from videogen.inventory import get_inventory
+from videogen.longvideo import hard_cuts, join, plan_segments, segment_overrides, segment_workflow
+from videogen.metrics import JobTimer
+from videogen.outputs import get_index
+from videogen.pool import BackendPool, job_cost
+from videogen.scheduler import FairScheduler, fit_budget, format_eta
+from videogen.transcode import get_transcoder, output_formats
+from videogen.tuning import PRESETS, get_profile
+from videogen.workflows import keep_latent, latent_name, load_template
+
+COMFYUI_URLS = config.get("backends", "urls") or ["http://127.0.0.1:8188"]
+COMFYUI_URL = COMFYUI_URLS[0]
+OUTPUT_DIR = config.comfyui_output_dir()
+DOWNLOAD_DIR = config.get_path("downloads")
+OUTPUT_FORMATS = output_formats()
+
+STATUS_TTL = 1.0  # seconds a probe result is fresh enough for the Refresh button
+SCHEDULER_DEPTH = config.get("scheduler", "depth", 2)
+MAX_JOB_SECONDS = config.get("scheduler", "max_job_seconds", 900)
+OVERSIZE = config.get("scheduler", "oversize", "downscale")
+
+# Background services, set up by start() so importing the app has no side effects
+TRANSCODER = None
+POOL = None
+PROFILE = None
+COSTS = None
+SCHEDULER = None
+OUTPUTS = None
+_start_lock = threading.Lock()
+
+def start():
+    """Start the encoders, backend probes, metrics endpoint and outputs scan (once per process)"""
+    global TRANSCODER, POOL, PROFILE, COSTS, SCHEDULER, OUTPUTS
+    with _start_lock:
+        if POOL is not None:
+            return
+        
+        # Fork the encoder processes before any background threads exist
+        TRANSCODER = get_transcoder()
+        TRANSCODER.start()
+        
+        # Probed in the background; the UI only reads the cached results
+        pool = BackendPool(COMFYUI_URLS, interval=config.get("backends", "health_interval", 5))
+        pool.start()
+        
+        if config.get("metrics", "enabled", True):
+            try:
+                metrics.serve(config.get("metrics", "port", 7861), config.get("metrics", "host", "127.0.0.1"))
+            except OSError as e:
+                print(f"⚠️ Metrics endpoint disabled: {e}")
+        
+        PROFILE = get_profile()
+        COSTS = PROFILE.model("text-to-video-api")  # fitted by `make tune`, refined as jobs finish
+        SCHEDULER = FairScheduler(
+            lambda: SCHEDULER_DEPTH * max(1, sum(1 for b in pool.backends if b.available)),
+            quantum=config.get("scheduler", "quantum", 60),
+        )
+        
+        OUTPUTS = get_index()
+        threading.Thread(target=OUTPUTS.scan, name="outputs-scan", daemon=True).start()
+        threading.Thread(target=lambda: [get_inventory(url, wait=True) for url in COMFYUI_URLS], name="inventory",
+                         daemon=True).start()
+        POOL = pool  # last: marks the services ready
 
 # === ComfyUI API Helpers ===
 
-def queue_prompt(workflow: dict) -> str:
-    """Send workflow to ComfyUI, return prompt_id"""
-    p = {"prompt": workflow}
-    r = requests.post(f"{COMFYUI_URL}/prompt", json=p)
-    resp = r.json()
-    if "error" in resp:
-        raise Exception(f"ComfyUI error: {resp['error']}")
-    return resp.get("prompt_id")
-
-def get_queue() -> dict:
-    """Get current queue status"""
-    r = requests.get(f"{COMFYUI_URL}/queue")
-    return r.json()
-
-def cancel_all():
-    """Cancel all running and pending jobs"""
-    requests.post(f"{COMFYUI_URL}/interrupt")
-    requests.post(f"{COMFYUI_URL}/queue", json={"clear": True})
-    return "🛑 Cancelled all jobs"
-
-def get_history(prompt_id: str) -> dict:
-    """Get execution history for a prompt"""
-    r = requests.get(f"{COMFYUI_URL}/history/{prompt_id}")
-    return r.json()
-
-def get_progress() -> dict:
-    """Get current execution progress"""
-    try:
-        # Check queue for running job info
-        q = get_queue()
-        running = q.get("queue_running", [])
-        if running:
-            return {"status": "running", "queue_size": len(running)}
-        return {"status": "idle"}
-    except:
-        return {"status": "error"}
-
-def get_queue_status() -> str:
-    """Get formatted queue status"""
-    try:
-        q = get_queue()
-        running = len(q.get("queue_running", []))
-        pending = len(q.get("queue_pending", []))
-        if running == 0 and pending == 0:
-            return "✅ Idle"
-        return f"🔄 Running: {running} | Pending: {pending}"
-    except:
+def comfy(url: str = None):
+    """Shared ComfyUI client for a backend (one websocket per process)"""
+    return get_client(url or COMFYUI_URL)
+
+def validate_workflow(workflow: dict) -> list:
+    """Why no backend could run this workflow (empty if one can, or we can't tell)"""
+    return POOL.validate(workflow)
+
+def session_of(request) -> str:
+    """Scheduler key for a browser session"""
+    return getattr(request, "session_hash", None) or "anonymous"
+
+async def stop_ticket(ticket):
+    """Cancel a dispatched ticket's job on its backend (if it got that far)"""
+    if ticket.prompt_id and ticket.backend is not None:
+        try:
+            await ticket.backend.client.acancel(ticket.prompt_id)
+        except TRANSPORT_ERRORS:
+            ticket.backend.mark_failed()
+
+async def cancel_mine(request: gr.Request = None):
+    """Cancel this session's jobs only (waiting, queued or running)"""
+    # Tickets not on a backend yet are marked cancelled and never get submitted
+    for ticket in SCHEDULER.cancel(session_of(request)):
+        await stop_ticket(ticket)
+    return "🛑 Cancelled your jobs"
+
+async def cancel_all():
+    """Cancel all running and pending jobs on every backend"""
+    SCHEDULER.cancel_all()
+    await POOL.acancel_all()
+    return f"🛑 Cancelled all jobs ({len(POOL.backends)} backend{'s' if len(POOL.backends) > 1 else ''})"
+
+def live_queue_status() -> str:
+    """Aggregate queue status from the pool's last health check"""
+    running, pending, up, total = POOL.totals()
+    if up == 0:
         return "❌ ComfyUI not responding"
+    waiting = SCHEDULER.stats()["waiting"]
+    suffix = f" ({up}/{total} up)" if total > 1 else ""
+    if running == 0 and pending == 0 and waiting == 0:
+        return "✅ Idle" + suffix
+    waiting_note = f" | Waiting: {waiting}" if waiting else ""
+    return f"🔄 Running: {running} | Pending: {pending}{waiting_note}{suffix}"
 
-def get_output_files(history: dict) -> list:
-    """Extract output file paths from history"""
-    files = []
-    outputs = history.get("outputs", {})
-    for node_id, node_output in outputs.items():
-        for key in ["gifs", "images"]:
-            if key in node_output:
-                for item in node_output[key]:
-                    subfolder = item.get("subfolder", "")
-                    filename = item["filename"]
-                    if subfolder:
-                        files.append(OUTPUT_DIR / subfolder / filename)
-                    else:
-                        files.append(OUTPUT_DIR / filename)
-    return files
+async def get_queue_status() -> str:
+    """Get formatted queue status (re-checks backends whose status is stale)"""
+    await POOL.arefresh(max_age=STATUS_TTL)
+    return live_queue_status()
 
-def webp_to_mp4(webp_path: Path) -> Path:
-    """Convert animated webp to mp4"""
-    mp4_path = webp_path.with_suffix('.mp4')
-    
-    # Extract frames using PIL
-    img = Image.open(webp_path)
-    frames = []
-    try:
-        while True:
-            frames.append(img.copy())
-            img.seek(img.tell() + 1)
-    except EOFError:
-        pass
-    
-    if not frames:
-        return None
-    
-    # Save frames temporarily
-    temp_dir = Path("/tmp/video_frames")
-    temp_dir.mkdir(exist_ok=True)
-    for i, frame in enumerate(frames):
-        frame.save(temp_dir / f"frame_{i:04d}.png")
-    
-    # Convert to mp4
-    subprocess.run([
-        "ffmpeg", "-y", "-framerate", "8",
-        "-i", str(temp_dir / "frame_%04d.png"),
-        "-c:v", "libx264", "-pix_fmt", "yuv420p",
-        "-movflags", "+faststart",
-        str(mp4_path)
-    ], capture_output=True)
-    
-    # Cleanup
-    for f in temp_dir.glob("*.png"):
-        f.unlink()
-    
-    return mp4_path if mp4_path.exists() else None
+def get_output_files(history: dict, client=None) -> list:
+    """Local paths of a job's outputs (downloaded via /view if ComfyUI is remote)"""
+    return (client or comfy()).fetch_outputs(history, OUTPUT_DIR, DOWNLOAD_DIR)
+
+async def convert_output(webp_path: Path, interpolate: float = None) -> list:
+    """Converted copies of an animated webp, primary format first (empty if none worked)"""
+    if webp_path.suffix.lower() != ".webp":
+        return []
+    converted = await asyncio.wrap_future(TRANSCODER.submit(webp_path, interpolate))
+    return [path for path in converted.values() if path and path.exists()]
 
-# === Workflow Loaders ===
+# === Time Budget Presets ===
 
-def load_workflow(name: str) -> dict:
-    """Load a workflow JSON file"""
-    workflow_dir = Path(__file__).parent / "workflows"
-    with open(workflow_dir / f"{name}.json") as f:
-        return json.load(f)
+MAX_SIDE = 768  # slider ceiling
+BUDGET_CHOICES = ["Custom"] + [f"≤ {format_eta(b)}" for b in PRESETS]
+
+def estimate_text(frames, width, height, steps) -> str:
+    """Predicted GPU time for the current settings"""
+    eta = COSTS.estimate(int(frames), int(width), int(height), int(steps))
+    source = "tuned profile" if PROFILE.tuned("text-to-video-api") else "untuned, run `make tune`"
+    return f"⏱️ ~{format_eta(eta)} of GPU time ({source})"
+
+def apply_budget(choice: str, frames, width, height, steps):
+    """Best resolution/steps (at the current frame count and aspect) that fit a budget"""
+    if choice not in BUDGET_CHOICES[1:]:
+        return width, height, steps, estimate_text(frames, width, height, steps)
+    budget = PRESETS[BUDGET_CHOICES.index(choice) - 1]
+    # Start from the largest job the sliders allow and shrink to fit
+    scale = MAX_SIDE / max(int(width), int(height))
+    top_w, top_h = int(width * scale) // 64 * 64, int(height * scale) // 64 * 64
+    top_steps = max(int(steps), config.get("defaults", "steps", 20))
+    fitted = fit_budget(COSTS, int(frames), top_w, top_h, top_steps, budget)
+    if fitted is None:
+        return width, height, steps, f"⚠️ {frames} frames can't finish within {format_eta(budget)}; lower Frames"
+    width, height, steps = fitted
+    return width, height, steps, estimate_text(frames, width, height, steps)
 
 # === Generation Functions ===
 
-def generate_text_to_video(
+async def present_output(files: list, elapsed: int, note: str = "", workflow: dict = None,
+                   prompt_id: str = None, source: Path = None, timer: JobTimer = None,
+                   interpolate: float = None):
+    """Yield the final UI update for a finished job's output files.
+    
+    With a workflow, the presented file is also added to the output index.
+    With `interpolate` (fps), the conversion fills in frames up to that rate.
+    """
+    if not files:
+        if timer is not None:
+            timer.finish("empty")
+        yield None, f"⚠️ Complete but no output found", "✅ Idle"
+        return
+    
+    # Show the native webp right away; the converted file replaces it when ready
+    webp_file = files[0]
+    formats = ", ".join(fmt.upper() for fmt in OUTPUT_FORMATS)
+    action = f"Interpolating to {interpolate:g} fps as" if interpolate else "Converting to"
+    yield str(webp_file), f"✅ Generation complete! ({elapsed}s){note}\n🔄 {action} {formats}...", "✅ Processing..."
+    if timer is not None:
+        timer.stage("transcode")
+    converted = await convert_output(webp_file, interpolate)
+    if timer is not None:
+        timer.finish()
+    if workflow is not None:
+        await asyncio.to_thread(OUTPUTS.record, converted or [webp_file], workflow, "text-to-video-api",
+                                prompt_id, source)
+    
+    if converted:
+        yield str(converted[0]), f"✅ Done! ({elapsed}s){note}\n📁 {', '.join(p.name for p in converted)}", "✅ Idle"
+    else:
+        yield str(webp_file), f"✅ Done! ({elapsed}s){note}\n📁 {webp_file.name} (webp)", "✅ Idle"
+
+async def generate_text_to_video(
     prompt: str,
     negative_prompt: str,
     frames: int,
@@ -141,186 +216,708 @@ def generate_text_to_video(
     height: int,
     steps: int,
     cfg: float,
+    seed: int = -1,
+    request: gr.Request = None,
+    preview: dict = None,
+    interpolate: float = None,
+    latent: str = None,
 ):
-    """Generate video from text prompt"""
+    """Generate video from text prompt (async, so a waiting user holds no thread).
+    
+    With a `preview` dict, the latest live preview frame is kept in
+    ``preview["image"]`` as it arrives. With `interpolate` (fps), the
+    frames are keyframes at `fps` and the output is interpolated on CPU.
+    With `latent` (a draft's, already uploaded to the backends), the job
+    refines it instead of starting from noise.
+    """
     
     if not prompt.strip():
         yield None, "❌ Please enter a prompt", "✅ Idle"
         return
     
+    flight, owner = None, True
+    backend = token = timer = ticket = None
     try:
         yield None, "📂 Loading workflow...", "🔄 Starting..."
         
-        workflow = load_workflow("text-to-video-api")
+        # Admission: refuse or shrink jobs over the GPU-time budget
+        frames, width, height, steps = int(frames), int(width), int(height), int(steps)
+        estimate = COSTS.estimate(frames, width, height, steps)
+        note = ""
+        if estimate > MAX_JOB_SECONDS:
+            fitted = fit_budget(COSTS, frames, width, height, steps, MAX_JOB_SECONDS) if OVERSIZE == "downscale" else None
+            if fitted is None:
+                yield None, (f"❌ Job too large: ~{format_eta(estimate)} of GPU time "
+                             f"(limit {format_eta(MAX_JOB_SECONDS)}). Reduce frames, size or steps."), live_queue_status()
+                return
+            width, height, steps = fitted
+            estimate = COSTS.estimate(frames, width, height, steps)
+            note = f"\n📉 Scaled to {width}x{height}, {steps} steps to fit the {format_eta(MAX_JOB_SECONDS)} limit"
+        if interpolate:
+            saved = gpu_seconds_saved(COSTS, frames / int(fps), interpolate, width, height, steps, int(fps))
+            note += (f"\n🌀 {frames} keyframes @ {int(fps)} fps, interpolated to {interpolate:g} fps on CPU "
+                     f"(saves ~{format_eta(saved)} of GPU time)")
         
-        # Update workflow with user inputs
-        for node_id, node in workflow.items():
-            if node.get("class_type") == "CLIPTextEncode":
-                meta_title = str(node.get("_meta", {}).get("title", "")).lower()
-                if "positive" in meta_title or node_id == "6":
-                    node["inputs"]["text"] = prompt
-                elif "negative" in meta_title or node_id == "7":
-                    node["inputs"]["text"] = negative_prompt
-            
-            if node.get("class_type") == "KSampler":
-                node["inputs"]["steps"] = steps
-                node["inputs"]["cfg"] = cfg
-                node["inputs"]["seed"] = random.randint(0, 2**32 - 1)
-            
-            if node.get("class_type") == "EmptyLatentImage":
-                node["inputs"]["width"] = width
-                node["inputs"]["height"] = height
-                node["inputs"]["batch_size"] = frames
-            
-            if node.get("class_type") == "SaveAnimatedWEBP":
-                node["inputs"]["fps"] = float(fps)
+        seed = int(seed) if seed is not None and seed >= 0 else random.randint(0, 2**32 - 1)
+        workflow = load_template("text-to-video-api").apply(
+            prompt=prompt,
+            negative=negative_prompt,
+            steps=steps,
+            cfg=cfg,
+            seed=seed,
+            width=width,
+            height=height,
+            frames=frames,
+            fps=fps,
+        )
+        if latent:
+            workflow = refine(workflow, latent)
+        
+        # Missing nodes or models would only fail inside ComfyUI
+        problems = await asyncio.to_thread(validate_workflow, workflow)
+        if problems:
+            listed = "\n".join(f"   • {p}" for p in problems[:5])
+            yield None, f"❌ ComfyUI can't run this workflow:\n{listed}", live_queue_status()
+            return
         
-        yield None, "📤 Sending to ComfyUI...", "🔄 Queuing..."
+        # Identical workflow already rendered, or rendering right now?
+        cache = get_cache()
+        if cache is not None:
+            flight, owner = cache.begin(workflow)
+            if flight.hit:
+                async for update in present_output(flight.files, 0, f"\n♻️ Cached result (seed {seed})", workflow,
+                                                   interpolate=interpolate):
+                    yield update
+                return
         
-        prompt_id = queue_prompt(workflow)
+        if owner:
+            # Wait for a fair turn before handing the job to ComfyUI
+            timer = JobTimer(workflow, "text-to-video-api")
+            timer.stage("queue_wait")
+            ticket = SCHEDULER.submit(session_of(request), estimate, prompt[:40])
+            while not await ticket.wait_turn(2):
+                ahead, eta = SCHEDULER.position(ticket)
+                yield None, (f"⏳ Waiting for a GPU slot: {ahead} job(s) ahead, starts in ~{format_eta(eta)}\n"
+                             f"   est. {format_eta(estimate)} of GPU time{note}"), live_queue_status()
+            yield None, f"📤 Sending to ComfyUI...{note}", "🔄 Queuing..."
+            if ticket.state == "cancelled":
+                timer.finish("cancelled")
+                yield None, "🛑 Cancelled", live_queue_status()
+                return
+            timer.stage("submit")
+            backend, token, prompt_id = await POOL.asubmit(workflow, job_cost(frames, width, height, steps))
+            timer.stage("queue_wait")
+            ticket.prompt_id, ticket.backend = prompt_id, backend
+            if ticket.state == "cancelled":  # cancelled while it was being queued
+                await stop_ticket(ticket)
+                timer.finish("cancelled")
+                yield None, "🛑 Cancelled", live_queue_status()
+                return
+            client = backend.client
+            if flight is not None:
+                flight.set_prompt(prompt_id, backend.url)
+        else:
+            yield None, "🔗 Identical job already running, attaching...", live_queue_status()
+            prompt_id = await flight.await_prompt(timeout=600)
+            if prompt_id is None:
+                yield None, f"❌ Generation failed: {flight.error or 'attached job never started'}", "✅ Idle"
+                return
+            client = comfy(flight.url)
         
-        yield None, f"🆔 Job queued: {prompt_id[:8]}...\n⏳ Generating {frames} frames @ {width}x{height}...", get_queue_status()
+        yield None, f"🆔 Job queued: {prompt_id[:8]}...\n⏳ Generating {frames} frames @ {width}x{height}...", live_queue_status()
         
-        # Poll for completion with progress updates
+        # Wait for pushed execution events (falls back to polling if the socket drops)
         start = time.time()
-        timeout = 600
-        last_check = 0
+        detail = f"   {frames} frames @ {width}x{height}, {steps} steps, seed {seed}{note}"
+        stage = "⏳ Waiting in queue"
+        exec_start = None
+        bar = ""
         
-        while time.time() - start < timeout:
+        async for event in client.await_events(prompt_id, timeout=600):
             elapsed = int(time.time() - start)
+            if timer is not None:
+                timer.observe(event)
+            if event["type"] == "execution_start":
+                exec_start = time.time()
             
-            # Check completion
-            history = get_history(prompt_id)
-            if prompt_id in history:
-                status = history[prompt_id].get("status", {})
-                if status.get("status_str") == "error":
-                    msgs = status.get("messages", [])
-                    error_msg = msgs[-1] if msgs else "Unknown error"
-                    yield None, f"❌ Generation failed: {error_msg}", "✅ Idle"
-                    return
-                
-                # Success - get output
-                yield None, f"✅ Generation complete! ({elapsed}s)\n🔄 Converting to MP4...", "✅ Processing..."
-                
-                files = get_output_files(history[prompt_id])
-                if files:
-                    webp_file = files[0]
-                    mp4_file = webp_to_mp4(webp_file)
-                    
-                    if mp4_file and mp4_file.exists():
-                        yield str(mp4_file), f"✅ Done! ({elapsed}s)\n📁 {mp4_file.name}", "✅ Idle"
-                    else:
-                        yield str(webp_file), f"✅ Done! ({elapsed}s)\n📁 {webp_file.name} (webp)", "✅ Idle"
-                else:
-                    yield None, f"⚠️ Complete but no output found", "✅ Idle"
+            if event["type"] == "error":
+                if owner and flight is not None:
+                    flight.fail(event["message"])
+                if timer is not None:
+                    timer.finish("error")
+                yield None, f"❌ Generation failed: {event['message']}", "✅ Idle"
+                return
+            
+            if event["type"] == "timeout":
+                if timer is not None:
+                    timer.finish("timeout")
+                yield None, "⏰ Generation timed out (10 min limit)", "✅ Idle"
                 return
             
-            # Progress update every 3 seconds
-            progress_msg = f"⏳ Generating... ({elapsed}s elapsed)\n"
-            progress_msg += f"   {frames} frames @ {width}x{height}, {steps} steps"
+            if event["type"] == "done":
+                if timer is not None:
+                    timer.stage("fetch")
+                if owner and exec_start is not None:
+                    COSTS.observe(frames, width, height, steps, time.time() - exec_start)
+                if ticket is not None:
+                    SCHEDULER.release(ticket)  # GPU is free; don't hold the slot through transcoding
+                originals = await asyncio.to_thread(get_output_files, event["history"], client)
+                files = originals
+                if flight is not None:
+                    if owner:
+                        files = await asyncio.to_thread(flight.finish, files)
+                    else:
+                        files = await flight.await_files(timeout=60) or files
+                # A cached copy hides the ComfyUI original it was linked from
+                source = originals[0] if originals and files and files[0] != originals[0] else None
+                async for update in present_output(files, elapsed, note, workflow=workflow, prompt_id=prompt_id,
+                                                   source=source, timer=timer, interpolate=interpolate):
+                    yield update
+                return
             
-            yield None, progress_msg, get_queue_status()
-            time.sleep(3)
-        
-        yield None, "⏰ Generation timed out (10 min limit)", "✅ Idle"
+            if event["type"] == "preview":
+                if preview is not None:
+                    preview["image"] = await asyncio.to_thread(decode_preview, event["image"]) or preview.get("image")
+            elif event["type"] == "progress":
+                bar = progress_bar(event.get("value", 0), event.get("max", 0))
+            stage = format_event(event) or stage
+            left = f", ~{format_eta(max(0, estimate - (time.time() - exec_start)))} left" if exec_start else ""
+            yield None, f"{stage} ({elapsed}s elapsed{left})\n{bar}{detail}", live_queue_status()
             
     except Exception as e:
         yield None, f"❌ Error: {str(e)}", "✅ Idle"
+    finally:
+        if timer is not None:
+            timer.finish("aborted")
+        if ticket is not None:
+            SCHEDULER.release(ticket)
+        if backend is not None:
+            POOL.release(backend, token)
+        if owner and flight is not None and not flight.done:
+            flight.fail("aborted")
+
+# === Live Preview ===
+
+PREVIEW_UI_INTERVAL = 0.25  # seconds between UI updates while a job runs
+
+def decode_preview(data: bytes):
+    """PIL image from a preview frame's JPEG/PNG bytes (None if it won't decode)"""
+    from PIL import Image
+    
+    try:
+        img = Image.open(io.BytesIO(data))
+        img.load()
+        return img
+    except OSError:
+        return None
+
+def progress_bar(value: int, total: int, width: int = 20) -> str:
+    """Text progress bar line, e.g. '▕████░░░░▏ 50%'"""
+    if not total:
+        return ""
+    filled = int(width * value / total)
+    return f"   ▕{'█' * filled}{'░' * (width - filled)}▏ {value / total:.0%}\n"
 
-def check_comfyui_status():
-    """Check if ComfyUI is running"""
+async def generate_with_preview(prompt, negative_prompt, frames, fps, width, height, steps, cfg, seed=-1,
+                                smooth=False, duration=2, latent=None, request: gr.Request = None):
+    """generate_text_to_video plus the live preview, at most one UI update per PREVIEW_UI_INTERVAL.
+    
+    With `smooth`, only keyframes for `duration` seconds are rendered and
+    the rest of the frames up to FPS are interpolated on CPU.
+    """
+    preview, shown = {}, None
+    held, last = None, 0.0
+    interpolate = None
+    if smooth and int(fps) > keyframe_fps():
+        frames, interpolate, fps = keyframes(duration), int(fps), int(keyframe_fps())
+    async for video, logs, queue in generate_text_to_video(prompt, negative_prompt, frames, fps, width, height,
+                                                           steps, cfg, seed, request=request, preview=preview,
+                                                           interpolate=interpolate, latent=latent):
+        frame = preview.get("image")
+        if video is not None:
+            held = (video, logs, queue, None)  # the result replaces the preview
+        else:
+            held = (video, logs, queue, frame if frame is not shown else gr.update())
+        if video is None and time.monotonic() - last < PREVIEW_UI_INTERVAL:
+            continue
+        shown, last = frame, time.monotonic()
+        yield held
+        held = None
+    if held is not None:
+        yield held
+
+# === Fan-out Jobs ===
+
+async def render_job(workflow: dict, estimate: float, cost: float, session: str, label: str,
+                     state: list, k: int) -> tuple:
+    """Run one of several jobs through the fair scheduler and the backend pool.
+    
+    Returns (webp, saved latent or None), or None if it failed; its
+    progress is kept in ``state[k]``.
+    """
+    ticket = SCHEDULER.submit(session, estimate, label)
+    backend = token = None
     try:
-        r = requests.get(f"{COMFYUI_URL}/system_stats", timeout=5)
-        if r.status_code == 200:
-            stats = r.json()
-            devices = stats.get("devices", [{}])
-            if devices:
-                vram = devices[0].get("vram_total", 0) / 1e9
-                name = devices[0].get("name", "Unknown")
-                return f"✅ ComfyUI Online | {name} | {vram:.1f}GB"
-            return "✅ ComfyUI Online"
-    except:
-        pass
-    return "❌ ComfyUI Offline - Run: cd ~/ComfyUI && python main.py"
-
-def get_recent_outputs():
-    """List recent output files"""
+        while not await ticket.wait_turn(2):
+            pass
+        if ticket.state == "cancelled":
+            state[k] = "🛑"
+            return None
+        backend, token, prompt_id = await POOL.asubmit(workflow, cost)
+        ticket.prompt_id, ticket.backend = prompt_id, backend
+        if ticket.state == "cancelled":  # cancelled while it was being queued
+            await stop_ticket(ticket)
+            state[k] = "🛑"
+            return None
+        state[k] = "⏳"
+        async for event in backend.client.await_events(prompt_id, timeout=600):
+            if event["type"] in ("error", "timeout"):
+                state[k] = "❌"
+                return None
+            if event["type"] == "progress" and event.get("max"):
+                state[k] = f"{event['value'] / event['max']:.0%}"
+            elif event["type"] == "done":
+                SCHEDULER.release(ticket)
+                files = await asyncio.to_thread(get_output_files, event["history"], backend.client)
+                if not files:
+                    state[k] = "❌"
+                    return None
+                state[k] = "✅"
+                return files[0], next((f for f in files if f.suffix == ".latent"), None)
+        return None
+    finally:
+        SCHEDULER.release(ticket)
+        if backend is not None:
+            POOL.release(backend, token)
+
+async def share_latent(path: Path) -> str:
+    """Upload a saved latent to every available backend, since any may run the job that loads it.
+    
+    Returns its name in their input folders, or None if no upload worked.
+    """
+    name = await asyncio.to_thread(latent_name, path)
+    shared = False
+    for backend in POOL.backends:
+        if not backend.available:
+            continue
+        try:
+            await asyncio.to_thread(backend.client.upload, path, name)
+            shared = True
+        except (*TRANSPORT_ERRORS, ComfyError):
+            backend.mark_failed()
+    return name if shared else None
+
+def task_result(task: asyncio.Task):
+    """A finished task's result, or None if it failed or was cancelled"""
+    if task.cancelled() or task.exception() is not None:
+        return None
+    return task.result()
+
+# === Long Video ===
+
+async def generate_long_video(prompt, negative_prompt, seconds, fps, width, height, steps, cfg, seed=-1,
+                              request: gr.Request = None):
+    """Generate a clip longer than one job as overlapping segments, then join them.
+    
+    Each segment starts from the previous one's last latent frames, so
+    they render one after another (on whichever backend is free) and the
+    clip keeps its look across the joins; each stays at segment_frames,
+    so VRAM use doesn't grow with the clip length.
+    """
+    if not prompt.strip():
+        yield None, "❌ Please enter a prompt", "✅ Idle"
+        return
+    
+    fps, width, height, steps = int(fps), int(width), int(height), int(steps)
+    total = max(1, round(float(seconds) * fps))
+    plan = plan_segments(total)
+    seed = int(seed) if seed is not None and seed >= 0 else random.randint(0, 2**32 - 1)
+    template = load_template("text-to-video-api")
+    common = dict(prompt=prompt, negative=negative_prompt, steps=steps, cfg=cfg, width=width, height=height, fps=fps)
+    workflows = [template.apply(**common, **overrides) for overrides in segment_overrides(plan, seed)]
+    
+    problems = await asyncio.to_thread(validate_workflow, segment_workflow(workflows[0], plan, 0))
+    if problems:
+        listed = "\n".join(f"   • {p}" for p in problems[:5])
+        yield None, f"❌ ComfyUI can't run this workflow:\n{listed}", live_queue_status()
+        return
+    
+    session = session_of(request)
+    convert = hard_cuts(plan)  # only then can the encoded segments be stream-copied
+    state = ["⏸️"] * len(plan)
+    results, conversions = [], []
+    start = time.time()
+    eta = sum(COSTS.estimate(frames, width, height, steps) for _, frames in plan)
+    detail = f"   {total} frames @ {width}x{height} in {len(plan)} segments, seed {seed}, ~{format_eta(eta)} of GPU time"
+    try:
+        for k, (workflow, (_, frames)) in enumerate(zip(workflows, plan)):
+            latent = None
+            if k > 0:
+                latent = await share_latent(results[-1][1])
+                if latent is None:
+                    yield None, f"❌ Couldn't hand segment {k}'s last frames to ComfyUI; nothing to join", live_queue_status()
+                    return
+            task = asyncio.create_task(render_job(
+                segment_workflow(workflow, plan, k, latent), COSTS.estimate(frames, width, height, steps),
+                job_cost(frames, width, height, steps), session, f"{prompt[:32]} [{k + 1}/{len(plan)}]", state, k,
+            ))
+            try:
+                while not task.done():
+                    await asyncio.wait([task], timeout=1)
+                    segments = " ".join(f"{j + 1}:{s}" for j, s in enumerate(state))
+                    yield None, f"🎞️ Rendering segments ({int(time.time() - start)}s elapsed)\n   {segments}\n{detail}", live_queue_status()
+            finally:
+                task.cancel()
+            result = task_result(task)
+            if not result or (k + 1 < len(plan) and result[1] is None):
+                # A gap would break the clip, so one lost segment means nothing to join
+                error = None if task.cancelled() else task.exception()
+                yield None, f"❌ Segment {k + 1} of {len(plan)} failed: {error or 'no output'}; nothing to join", live_queue_status()
+                return
+            results.append(result)
+            if convert:
+                # Encode while the next segment renders
+                conversions.append(asyncio.create_task(convert_output(result[0])))
+        if conversions:
+            await asyncio.wait(conversions)
+    finally:
+        for c in conversions:
+            c.cancel()
+    
+    yield None, f"🧵 Joining {len(plan)} segments...", "✅ Processing..."
+    files = [webp for webp, _ in results]
+    converted = [(task_result(c) or [None])[0] for c in conversions] if convert else None
+    dest = files[0].parent / f"long_{datetime.now():%Y%m%d_%H%M%S}_{seed}"
+    error = ""
     try:
-        files = sorted(OUTPUT_DIR.glob("*.mp4"), key=lambda x: x.stat().st_mtime, reverse=True)[:10]
-        if not files:
-            files = sorted(OUTPUT_DIR.glob("*.webp"), key=lambda x: x.stat().st_mtime, reverse=True)[:10]
-        return "\n".join([f"• {f.name} ({f.stat().st_size // 1024}KB)" for f in files]) or "No outputs yet"
-    except:
-        return "Error reading outputs"
+        joined = await asyncio.wrap_future(TRANSCODER.run(join, files, plan, dest, converted, None, None, fps))
+    except Exception as e:
+        joined, error = None, f": {e}"
+    elapsed = int(time.time() - start)
+    if joined is None:
+        yield str(files[0]), f"❌ Could not join the segments ({elapsed}s){error}", "✅ Idle"
+        return
+    await asyncio.to_thread(OUTPUTS.record, [joined], template.apply(**common, frames=total, seed=seed),
+                            "text-to-video-api")
+    yield str(joined), f"✅ Done! ({elapsed}s)\n📁 {joined.name} ({total} frames, {len(plan)} segments)", "✅ Idle"
 
-# === UI ===
+# === Drafts ===
+
+DRAFTS = draft_settings()
+
+def draft_gallery(drafts: list, outputs: list, scores: list) -> tuple:
+    """(gallery items, matching drafts) for the finished drafts, best score first"""
+    done = sorted((k for k in range(len(drafts)) if outputs[k]), key=lambda k: scores[k] or 0, reverse=True)
+    items = [(str(outputs[k]), f"seed {drafts[k]['seed']} · score {scores[k] or 0:.2f}") for k in done]
+    return items, [drafts[k] for k in done]
 
-with gr.Blocks(title="Local Video Generator") as app:
-    gr.Markdown("# 🎬 Local Video Generator")
+async def generate_drafts(prompt, negative_prompt, count, frames, fps, width, height, steps, cfg,
+                          request: gr.Request = None):
+    """Render `count` cheap variants of the current settings at once, ranked as they land.
     
-    with gr.Row():
-        status = gr.Textbox(value=check_comfyui_status(), label="ComfyUI", interactive=False, scale=3)
-        queue_status = gr.Textbox(value=get_queue_status(), label="Queue", interactive=False, scale=1)
+    Yields (gallery, status, queue, drafts); drafts lines up with the
+    gallery so a picked item can be promoted from its exact seed and
+    saved latent.
+    """
+    if not prompt.strip():
+        yield [], "❌ Please enter a prompt", "✅ Idle", []
+        return
     
-    with gr.Row():
-        refresh_btn = gr.Button("🔄 Refresh", scale=1)
-        cancel_btn = gr.Button("🛑 Cancel All", variant="stop", scale=1)
-        
-    refresh_btn.click(check_comfyui_status, outputs=status)
-    refresh_btn.click(get_queue_status, outputs=queue_status)
-    cancel_btn.click(cancel_all, outputs=queue_status)
+    full = dict(prompt=prompt, negative=negative_prompt, frames=int(frames), fps=int(fps),
+                width=int(width), height=int(height), steps=int(steps), cfg=cfg)
+    drafts = draft_params(full, int(count))
+    template = load_template("text-to-video-api")
+    workflows = [keep_latent(template.apply(**draft), "draft") for draft in drafts]
+    problems = await asyncio.to_thread(validate_workflow, workflows[0])
+    if problems:
+        listed = "\n".join(f"   • {p}" for p in problems[:5])
+        yield [], f"❌ ComfyUI can't run this workflow:\n{listed}", live_queue_status(), []
+        return
     
-    with gr.Tabs():
-        # === Text to Video ===
-        with gr.Tab("📝 Text to Video"):
-            with gr.Row():
-                with gr.Column(scale=1):
-                    t2v_prompt = gr.Textbox(
-                        label="Prompt",
-                        placeholder="A cat walking through a garden, cinematic lighting",
-                        lines=3
-                    )
-                    t2v_negative = gr.Textbox(
-                        label="Negative Prompt",
-                        value="ugly, blurry, low quality, distorted",
-                        lines=2
-                    )
-                    with gr.Row():
-                        t2v_frames = gr.Slider(4, 32, value=16, step=1, label="Frames")
-                        t2v_fps = gr.Slider(4, 24, value=8, step=1, label="FPS")
-                    with gr.Row():
-                        t2v_width = gr.Slider(256, 768, value=512, step=64, label="Width")
-                        t2v_height = gr.Slider(256, 768, value=512, step=64, label="Height")
-                    with gr.Row():
-                        t2v_steps = gr.Slider(10, 40, value=20, step=1, label="Steps")
-                        t2v_cfg = gr.Slider(1, 15, value=7.5, step=0.5, label="CFG")
-                    t2v_btn = gr.Button("🎬 Generate Video", variant="primary", size="lg")
-                
-                with gr.Column(scale=1):
-                    t2v_output = gr.Video(label="Output", height=400)
-                    t2v_logs = gr.Textbox(label="Status", lines=6, interactive=False)
-            
-            t2v_btn.click(
-                generate_text_to_video,
-                inputs=[t2v_prompt, t2v_negative, t2v_frames, t2v_fps, t2v_width, t2v_height, t2v_steps, t2v_cfg],
-                outputs=[t2v_output, t2v_logs, queue_status]
-            )
+    sample = drafts[0]
+    size = (sample["frames"], sample["width"], sample["height"], sample["steps"])
+    estimate, cost = COSTS.estimate(*size), job_cost(*size)
+    session = session_of(request)
+    state = ["⏸️"] * len(drafts)
+    tasks = [
+        asyncio.create_task(render_job(workflow, estimate, cost, session, f"draft {draft['seed']}", state, k))
+        for k, (workflow, draft) in enumerate(zip(workflows, drafts))
+    ]
+    outputs, scores = [None] * len(drafts), [None] * len(drafts)
+    start = time.time()
+    detail = (f"   {len(drafts)} drafts @ {size[1]}x{size[2]}, {size[0]} frames, {size[3]} steps: "
+              f"~{format_eta(estimate * len(drafts))} of GPU time "
+              f"(one full render: ~{format_eta(COSTS.estimate(full['frames'], full['width'], full['height'], full['steps']))})")
+    try:
+        while True:
+            done, _ = await asyncio.wait(tasks, timeout=1)
+            for k, task in enumerate(tasks):
+                result = task_result(task) if task.done() else None
+                if result and outputs[k] is None:
+                    outputs[k] = result[0]
+                    drafts[k] = {**drafts[k], "latent": result[1] and str(result[1])}
+                    scores[k] = await asyncio.to_thread(score, result[0])
+            items, ranked = draft_gallery(drafts, outputs, scores)
+            if len(done) == len(tasks):
+                break
+            yield (items, f"🧪 Drafting ({int(time.time() - start)}s elapsed): "
+                          f"{len(items)}/{len(drafts)} ready\n{detail}", live_queue_status(), ranked)
+    finally:
+        for task in tasks:
+            task.cancel()
+    
+    failed = len(drafts) - len(items)
+    note = f", {failed} failed" if failed else ""
+    yield (items, f"✅ {len(items)} drafts in {int(time.time() - start)}s{note}\n{detail}\n"
+                  f"👆 Pick one, then Promote to refine it at the size and steps above", "✅ Idle", ranked)
+
+def select_draft(evt: gr.SelectData):
+    """Index of the gallery item the user clicked"""
+    return evt.index
+
+async def promote_draft(drafts: list, picked, width, height, steps, request: gr.Request = None):
+    """Full-quality render refined from the picked draft: same seed, frames, prompt, cfg and fps; size and steps from the sliders"""
+    if not drafts or picked is None or not 0 <= int(picked) < len(drafts):
+        yield None, "❌ Draft some variants and click one first", live_queue_status(), None
+        return
+    chosen = promote(drafts[int(picked)], dict(width=int(width), height=int(height), steps=int(steps)))
+    saved = chosen.pop("latent", None)
+    latent = await share_latent(Path(saved)) if saved and Path(saved).is_file() else None
+    if latent is None:
+        yield None, "❌ That draft's latent is gone or couldn't be sent to ComfyUI; draft again", live_queue_status(), None
+        return
+    async for update in generate_with_preview(chosen["prompt"], chosen["negative"], chosen["frames"], chosen["fps"],
+                                              chosen["width"], chosen["height"], chosen["steps"], chosen["cfg"],
+                                              chosen["seed"], latent=latent, request=request):
+        yield update
+
+def comfyui_status() -> str:
+    """Which ComfyUI backends are running, as of the last health check"""
+    if all(b.healthy is None for b in POOL.backends):
+        return "⏳ Checking ComfyUI..."
+    up = [b for b in POOL.backends if b.healthy]
+    if not up:
+        return "❌ ComfyUI Offline - Run: cd ~/ComfyUI && python main.py"
+    devices = ", ".join(f"{b.device} | {b.vram_gb:.1f}GB" for b in up)
+    if len(POOL.backends) == 1:
+        return f"✅ ComfyUI Online | {devices}"
+    return f"✅ {len(up)}/{len(POOL.backends)} ComfyUI Online | {devices}"
+
+async def check_comfyui_status():
+    """Check which ComfyUI backends are running (re-checks stale ones)"""
+    await POOL.arefresh(max_age=STATUS_TTL)
+    return comfyui_status()
+
+OUTPUT_COLUMNS = ["Created", "File", "Prompt", "Seed", "Workflow", "Size", "Length"]
+OUTPUTS_PER_PAGE = 20
+
+def parse_day(text: str) -> float:
+    """Timestamp of a YYYY-MM-DD date, or None if blank/invalid"""
+    try:
+        return datetime.strptime(text.strip(), "%Y-%m-%d").timestamp()
+    except (AttributeError, ValueError):
+        return None
+
+def browse_outputs(text: str = "", workflow: str = "All", since: str = "", until: str = "", page: int = 1,
+                   scan: bool = True):
+    """One page of indexed outputs: (table rows, summary, page)"""
+    if scan:
+        OUTPUTS.scan()
+    end = parse_day(until)
+    page = max(1, int(page or 1))
+    query = dict(
+        text=(text or "").strip() or None,
+        workflow=None if workflow in (None, "", "All") else workflow,
+        since=parse_day(since),
+        until=end + 86400 if end is not None else None,
+        per_page=OUTPUTS_PER_PAGE,
+    )
+    rows, total = OUTPUTS.query(page=page, **query)
+    pages = max(1, -(-total // OUTPUTS_PER_PAGE))
+    if page > pages:
+        page = pages
+        rows, total = OUTPUTS.query(page=page, **query)
+    
+    # Files recorded outside the scanned folder (e.g. the result cache) may be gone
+    gone = [r["path"] for r in rows if not os.path.exists(r["path"])]
+    if gone:
+        OUTPUTS.forget(gone)
+        rows = [r for r in rows if r["path"] not in gone]
+    
+    table = [[
+        datetime.fromtimestamp(r["created"]).strftime("%Y-%m-%d %H:%M"),
+        r["name"],
+        (r["prompt"] or "")[:80],
+        r["seed"] if r["seed"] is not None else "",
+        r["workflow"] or "",
+        f"{r['size'] / 2**20:.1f}MB" if r["size"] >= 2**20 else f"{r['size'] // 1024}KB",
+        f"{r['duration']:g}s" if r["duration"] else "",
+    ] for r in rows]
+    summary = f"Page {page}/{pages} ({total} outputs)" if total else "No outputs yet"
+    return table, summary, page
+
+def output_workflows():
+    """Workflow filter choices"""
+    return gr.update(choices=["All"] + OUTPUTS.workflows())
+
+# === UI ===
+
+def build_ui() -> gr.Blocks:
+    """The Gradio app (call start() before launching it)"""
+    with gr.Blocks(title="Local Video Generator") as app:
+        gr.Markdown("# 🎬 Local Video Generator")
         
-        # === Recent Outputs ===
-        with gr.Tab("📁 Outputs"):
-            outputs_list = gr.Textbox(label="Recent Outputs", lines=15, interactive=False, value=get_recent_outputs())
-            outputs_refresh = gr.Button("🔄 Refresh")
-            outputs_refresh.click(get_recent_outputs, outputs=outputs_list)
-            gr.Markdown(f"**Output folder:** `{OUTPUT_DIR}`")
+        with gr.Row():
+            status = gr.Textbox(value=comfyui_status, label="ComfyUI", interactive=False, scale=3)
+            queue_status = gr.Textbox(value=live_queue_status, label="Queue", interactive=False, scale=1)
         
-        # === Settings ===
-        with gr.Tab("⚙️ Settings"):
-            gr.Markdown("## Configuration")
-            gr.Markdown(f"**Output Directory:** `{OUTPUT_DIR}`")
-            gr.Markdown(f"**ComfyUI URL:** `{COMFYUI_URL}`")
-            gr.Markdown("### Models")
-            gr.Markdown("- Realistic Vision V5.1")
-            gr.Markdown("- SD 1.5 base")
+        with gr.Row():
+            refresh_btn = gr.Button("🔄 Refresh", scale=1)
+            cancel_mine_btn = gr.Button("🛑 Cancel My Jobs", variant="stop", scale=1)
+            cancel_btn = gr.Button("Cancel All", scale=1)
+            
+        # Async handlers; no concurrency cap so they never wait behind running generations
+        refresh_btn.click(check_comfyui_status, outputs=status, concurrency_limit=None)
+        refresh_btn.click(get_queue_status, outputs=queue_status, concurrency_limit=None)
+        cancel_mine_btn.click(cancel_mine, outputs=queue_status, concurrency_limit=None)
+        cancel_btn.click(cancel_all, outputs=queue_status, concurrency_limit=None)
+        
+        with gr.Tabs():
+            # === Text to Video ===
+            with gr.Tab("📝 Text to Video"):
+                with gr.Row():
+                    with gr.Column(scale=1):
+                        t2v_prompt = gr.Textbox(
+                            label="Prompt",
+                            placeholder="A cat walking through a garden, cinematic lighting",
+                            lines=3
+                        )
+                        t2v_negative = gr.Textbox(
+                            label="Negative Prompt",
+                            value="ugly, blurry, low quality, distorted",
+                            lines=2
+                        )
+                        with gr.Row():
+                            t2v_frames = gr.Slider(4, 32, value=16, step=1, label="Frames")
+                            t2v_fps = gr.Slider(4, 24, value=8, step=1, label="FPS")
+                        with gr.Row():
+                            t2v_width = gr.Slider(256, 768, value=512, step=64, label="Width")
+                            t2v_height = gr.Slider(256, 768, value=512, step=64, label="Height")
+                        with gr.Row():
+                            t2v_steps = gr.Slider(10, 40, value=20, step=1, label="Steps")
+                            t2v_cfg = gr.Slider(1, 15, value=7.5, step=0.5, label="CFG")
+                        t2v_seed = gr.Number(value=-1, precision=0, label="Seed (-1 = random)")
+                        with gr.Row():
+                            t2v_budget = gr.Dropdown(BUDGET_CHOICES, value="Custom", label="Finish within", scale=1)
+                            t2v_eta = gr.Markdown(estimate_text(16, 512, 512, 20))
+                        with gr.Accordion("🌀 Smooth motion (CPU interpolation)", open=False):
+                            t2v_smooth = gr.Checkbox(
+                                value=False,
+                                label=f"Render keyframes at {keyframe_fps():g} fps and interpolate up to FPS (Frames is ignored)",
+                            )
+                            t2v_duration = gr.Slider(1, 4, value=2, step=0.5, label="Duration (seconds)")
+                        t2v_btn = gr.Button("🎬 Generate Video", variant="primary", size="lg")
+                        with gr.Accordion("🧪 Drafts", open=False):
+                            gr.Markdown("Try many seeds cheaply at low resolution, then promote the best one: "
+                                        "it is upscaled and refined at the size and steps above, keeping its "
+                                        "frames and look.")
+                            t2v_draft_count = gr.Slider(2, 16, value=DRAFTS["count"], step=1, label="Drafts")
+                            t2v_draft_btn = gr.Button("🧪 Draft Variants")
+                        with gr.Accordion("🎞️ Long video", open=False):
+                            gr.Markdown("Renders overlapping segments, each continuing from the end of the last, "
+                                        "and crossfades them together; Frames is ignored.")
+                            t2v_seconds = gr.Slider(4, 120, value=20, step=1, label="Duration (seconds)")
+                            t2v_long_btn = gr.Button("🎞️ Generate Long Video")
+                    
+                    with gr.Column(scale=1):
+                        t2v_output = gr.Video(label="Output", height=400)
+                        t2v_preview = gr.Image(label="Live preview", type="pil", interactive=False, height=200)
+                        t2v_logs = gr.Textbox(label="Status", lines=7, interactive=False)
+                        t2v_stop = gr.Button("⏹️ Stop My Jobs", variant="stop")
+                        t2v_drafts = gr.Gallery(label="Drafts (best first; click one to pick it)", columns=4, height=240)
+                        t2v_promote = gr.Button("⬆️ Promote Picked Draft")
+                        t2v_draft_list = gr.State([])
+                        t2v_draft_pick = gr.State(None)
+                
+                t2v_btn.click(
+                    generate_with_preview,
+                    inputs=[t2v_prompt, t2v_negative, t2v_frames, t2v_fps, t2v_width, t2v_height, t2v_steps, t2v_cfg, t2v_seed,
+                            t2v_smooth, t2v_duration],
+                    outputs=[t2v_output, t2v_logs, queue_status, t2v_preview],
+                    concurrency_limit=None,  # waiting jobs are cheap; ComfyUI does the queuing
+                )
+                t2v_long_btn.click(
+                    generate_long_video,
+                    inputs=[t2v_prompt, t2v_negative, t2v_seconds, t2v_fps, t2v_width, t2v_height, t2v_steps, t2v_cfg, t2v_seed],
+                    outputs=[t2v_output, t2v_logs, queue_status],
+                    concurrency_limit=None,
+                )
+                t2v_stop.click(cancel_mine, outputs=queue_status, concurrency_limit=None)
+                t2v_draft_btn.click(lambda: None, outputs=t2v_draft_pick)
+                t2v_draft_btn.click(
+                    generate_drafts,
+                    inputs=[t2v_prompt, t2v_negative, t2v_draft_count, t2v_frames, t2v_fps, t2v_width, t2v_height,
+                            t2v_steps, t2v_cfg],
+                    outputs=[t2v_drafts, t2v_logs, queue_status, t2v_draft_list],
+                    concurrency_limit=None,
+                )
+                t2v_drafts.select(select_draft, outputs=t2v_draft_pick)
+                t2v_promote.click(
+                    promote_draft,
+                    inputs=[t2v_draft_list, t2v_draft_pick, t2v_width, t2v_height, t2v_steps],
+                    outputs=[t2v_output, t2v_logs, queue_status, t2v_preview],
+                    concurrency_limit=None,
+                )
+                t2v_budget.change(
+                    apply_budget,
+                    inputs=[t2v_budget, t2v_frames, t2v_width, t2v_height, t2v_steps],
+                    outputs=[t2v_width, t2v_height, t2v_steps, t2v_eta],
+                )
+                for slider in (t2v_frames, t2v_width, t2v_height, t2v_steps):
+                    slider.release(estimate_text, inputs=[t2v_frames, t2v_width, t2v_height, t2v_steps], outputs=t2v_eta)
+            
+            # === Recent Outputs ===
+            with gr.Tab("📁 Outputs"):
+                first_rows, first_summary, _ = browse_outputs(scan=False)  # the startup scan runs in the background
+                with gr.Row():
+                    outputs_text = gr.Textbox(label="Prompt / filename contains", scale=3)
+                    outputs_workflow = gr.Dropdown(["All"] + OUTPUTS.workflows(), value="All", label="Workflow", scale=2)
+                    outputs_since = gr.Textbox(label="From (YYYY-MM-DD)", scale=1)
+                    outputs_until = gr.Textbox(label="To (YYYY-MM-DD)", scale=1)
+                outputs_table = gr.Dataframe(value=first_rows, headers=OUTPUT_COLUMNS, interactive=False, wrap=True)
+                with gr.Row():
+                    outputs_prev = gr.Button("◀ Prev", scale=1)
+                    outputs_summary = gr.Markdown(first_summary)
+                    outputs_page = gr.Number(value=1, label="Page", precision=0, scale=1)
+                    outputs_next = gr.Button("Next ▶", scale=1)
+                    outputs_refresh = gr.Button("🔄 Refresh", scale=1)
+                
+                filters = [outputs_text, outputs_workflow, outputs_since, outputs_until]
+                results = [outputs_table, outputs_summary, outputs_page]
+                search = lambda *f: browse_outputs(*f, page=1)
+                for box in (outputs_text, outputs_since, outputs_until):
+                    box.submit(search, inputs=filters, outputs=results)
+                outputs_workflow.change(search, inputs=filters, outputs=results)
+                outputs_prev.click(lambda *f: browse_outputs(*f[:4], page=f[4] - 1), inputs=filters + [outputs_page], outputs=results)
+                outputs_next.click(lambda *f: browse_outputs(*f[:4], page=f[4] + 1), inputs=filters + [outputs_page], outputs=results)
+                outputs_page.submit(browse_outputs, inputs=filters + [outputs_page], outputs=results)
+                outputs_refresh.click(browse_outputs, inputs=filters + [outputs_page], outputs=results)
+                outputs_refresh.click(output_workflows, outputs=outputs_workflow)
+                gr.Markdown(f"**Output folder:** `{OUTPUT_DIR}`")
+            
+            # === Settings ===
+            with gr.Tab("⚙️ Settings"):
+                gr.Markdown("## Configuration")
+                gr.Markdown(f"**Output Directory:** `{OUTPUT_DIR}`")
+                gr.Markdown(f"**ComfyUI URLs:** {', '.join(f'`{url}`' for url in COMFYUI_URLS)}")
+                gr.Markdown("### Models")
+                gr.Markdown("- Realistic Vision V5.1")
+                gr.Markdown("- SD 1.5 base")
+    return app
+
+def main():
+    start()
+    build_ui().launch(server_port=7860)
 
 if __name__ == "__main__":
-    app.launch(server_port=7860)
+    main()
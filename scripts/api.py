@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+"""
+Job API Server
+Headless REST service for other programs: submit jobs (one or in bulk),
+poll their status, stream their results and cancel them
+"""
+
+import argparse
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from videogen import config
+from videogen.api import JobService, serve, settings
+from videogen.jobs import get_store
+from videogen.pool import BackendPool
+from videogen.transcode import get_transcoder
+
+
+def main():
+    cfg = settings()
+    parser = argparse.ArgumentParser(description='REST job API in front of ComfyUI')
+    parser.add_argument('--host', default=cfg['host'], help='Bind address')
+    parser.add_argument('--port', type=int, default=cfg['port'], help='Port')
+    parser.add_argument('--url', action='append',
+                        help='ComfyUI server URL (repeatable, default backends.urls from config.yaml)')
+    parser.add_argument('--max-queued', type=int, default=cfg['max_queued'],
+                        help='Jobs allowed to wait before submissions get 429 Too Many Requests')
+    args = parser.parse_args()
+
+    # Fork the encoder processes before any background threads exist
+    get_transcoder().start()
+
+    pool = BackendPool(args.url or config.get("backends", "urls") or ["http://127.0.0.1:8188"],
+                       interval=config.get("backends", "health_interval", 5))
+    pool.refresh()
+    pool.start()
+    store = get_store()
+    service = JobService(store, pool, depth=config.get("scheduler", "depth", 2), max_queued=args.max_queued)
+    service.start()
+    server = serve(service, args.host, args.port, cfg['max_body_mb'])
+
+    stats = store.stats()
+    up = sum(1 for b in pool.backends if b.healthy)
+    print(f"🛰️ Job API on http://{args.host}:{server.server_port}")
+    print(f"   ComfyUI: {up}/{len(pool.backends)} backend(s) up ({', '.join(b.url for b in pool.backends)})")
+    print(f"   Queue: {stats['queued']} waiting, {stats['running']} running (limit {args.max_queued})")
+    print("   POST /jobs, POST /jobs:batch, GET /jobs/{id}, GET /jobs/{id}/result, POST /jobs/{id}:cancel")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\n👋 Stopped; queued jobs resume on the next start")
+    finally:
+        server.server_close()
+        get_transcoder().shutdown(wait=False)
+
+
+if __name__ == "__main__":
+    main()
@@ -7,167 +7,896 @@ Queues multiple generations via ComfyUI API
 import json
 import argparse
 import requests
+import sys
+import threading
 import time
 import random
 from pathlib import Path
 from datetime import datetime
 
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from videogen import config, metrics
+from videogen.cache import get_cache
+from videogen.comfy import TRANSPORT_ERRORS, ComfyError, Tracker, format_event, get_client
+from videogen.drafts import draft_params, promote, refine, score, top
+from videogen.interpolate import gpu_seconds_saved, keyframe_fps, keyframes
+from videogen.inventory import get_inventory
+from videogen.longvideo import can_continue, hard_cuts, join, plan_segments, segment_overrides, segment_workflow
+from videogen.outputs import get_index
+from videogen.transcode import get_transcoder, transcode_suffix
+from videogen.journal import DONE, FAILED, QUEUED, RUNNING, Journal, replay
+from videogen.scheduler import fit_budget, format_eta
+from videogen.spool import Spool, Worker
+from videogen.staged import prepare_latents, split
+from videogen.tuning import get_profile
+from videogen.workflows import (ROLES, Template, job_size, keep_latent, latent_name, load_template,
+                                loader_nodes, model_signature, resolve, role_values, text_signature)
+
 COMFYUI_URL = "http://127.0.0.1:8188"
+USE_CACHE = True
+TRANSCODE = True
+INTERPOLATE = None  # fps the converted outputs are interpolated up to
 
-def load_workflow(workflow_path: str) -> dict:
-    """Load a workflow JSON file."""
-    with open(workflow_path, 'r') as f:
-        return json.load(f)
-
-def update_prompt(workflow: dict, prompt: str, negative: str = None) -> dict:
-    """Update prompt in workflow nodes."""
-    for node_id, node in workflow.items():
-        if isinstance(node, dict) and node.get('class_type') == 'CLIPTextEncode':
-            inputs = node.get('inputs', {})
-            # Check if this is positive or negative prompt based on common patterns
-            if 'text' in inputs:
-                current = inputs['text']
-                if any(neg in current.lower() for neg in ['blur', 'ugly', 'bad', 'worst']):
-                    if negative:
-                        inputs['text'] = negative
-                else:
-                    inputs['text'] = prompt
-    return workflow
+def load_workflow(workflow_path: str) -> Template:
+    """Load (once) and compile a workflow, UI or API format."""
+    return load_template(workflow_path)
 
-def update_seed(workflow: dict, seed: int = None) -> dict:
-    """Update seed in KSampler nodes."""
-    if seed is None:
-        seed = random.randint(0, 2**32 - 1)
-    
-    for node_id, node in workflow.items():
-        if isinstance(node, dict) and 'KSampler' in node.get('class_type', ''):
-            if 'inputs' in node and 'seed' in node['inputs']:
-                node['inputs']['seed'] = seed
-    return workflow
+def random_seed() -> int:
+    """Fresh random seed."""
+    return random.randint(0, 2**32 - 1)
 
 def queue_prompt(workflow: dict) -> str:
     """Send workflow to ComfyUI queue."""
-    payload = {"prompt": workflow}
     try:
-        response = requests.post(f"{COMFYUI_URL}/prompt", json=payload)
-        response.raise_for_status()
-        return response.json().get('prompt_id')
-    except requests.exceptions.RequestException as e:
+        return get_client(COMFYUI_URL).queue_prompt(workflow)
+    except (requests.exceptions.RequestException, ComfyError) as e:
         print(f"Error queuing prompt: {e}")
         return None
 
-def check_status(prompt_id: str) -> dict:
-    """Check generation status."""
+def iter_prompts(prompts_path: Path):
+    """Prompt entries from a file, one at a time.
+    
+    .jsonl files hold one JSON entry (a string or an object) per line and
+    are read as a stream, so huge sets never sit in memory; .json files
+    hold one array; anything else is one prompt per line.
+    """
+    prompts_path = Path(prompts_path)
+    with open(prompts_path) as f:
+        if prompts_path.suffix == '.json':
+            yield from json.load(f)
+            return
+        for line in f:
+            line = line.strip()
+            if line:
+                yield json.loads(line) if prompts_path.suffix == '.jsonl' else line
+
+def seeded(prompts, seed: int = None):
+    """Prompt entries with `seed` filled in where they have none."""
+    for p in prompts:
+        if seed is None:
+            yield p
+        elif isinstance(p, str):
+            yield {'prompt': p, 'seed': seed}
+        else:
+            yield {**p, 'seed': p.get('seed', seed)}
+
+def cache_lookup(workflow: dict) -> tuple:
+    """(flight, is_owner) from the shared result cache, or (None, True) if disabled."""
+    cache = get_cache() if USE_CACHE else None
+    if cache is None:
+        return None, True
+    return cache.begin(workflow)
+
+def job_record(prompt: str, prompt_id: str, files: list = None, **extra) -> dict:
+    """Result log entry for a finished job."""
+    record = {
+        'prompt': prompt,
+        'prompt_id': prompt_id,
+        'success': files is not None,
+        'timestamp': datetime.now().isoformat()
+    }
+    if files:
+        record['outputs'] = [str(f) for f in files]
+    record.update(extra)
+    return record
+
+def collect_outputs(history: dict, flight=None) -> list:
+    """Output files of a finished job, stored in the result cache if enabled."""
+    files = get_client(COMFYUI_URL).fetch_outputs(history, config.comfyui_output_dir(), config.get_path('downloads'))
+    return flight.finish(files) if flight is not None else files
+
+def workflow_name(template: Template, prompt_data) -> str:
+    """Name of the workflow a prompt entry runs (for the output index)."""
+    if isinstance(prompt_data, dict) and prompt_data.get('workflow'):
+        return load_workflow(prompt_data['workflow']).name
+    return template.name
+
+def prepare_job(template: Template, prompt_data) -> tuple:
+    """Build (prompt, workflow) for one prompt entry.
+    
+    JSON entries may name their own `workflow` and override any template
+    role (checkpoint, unet, steps, width, ...) alongside prompt/negative/seed.
+    Long-mode segments also carry a `segment` (plan, k, latent) that makes
+    the job continue from the previous segment's latent (see run_long);
+    drafts carry `draft` to save their latent and promoted drafts `refine`,
+    the uploaded latent to start from (see run_drafts).
+    """
+    overrides = {}
+    if isinstance(prompt_data, str):
+        prompt = prompt_data
+        negative = None
+        seed = None
+    else:
+        prompt = prompt_data.get('prompt', '')
+        negative = prompt_data.get('negative')
+        seed = prompt_data.get('seed')
+        if prompt_data.get('workflow'):
+            template = load_workflow(prompt_data['workflow'])
+        overrides = {k: v for k, v in prompt_data.items() if k in ROLES and k not in ('prompt', 'negative', 'seed')}
+    
+    workflow = template.apply(
+        prompt=prompt,
+        negative=negative,
+        seed=random_seed() if seed is None else seed,
+        **overrides,
+    )
+    extra = prompt_data if isinstance(prompt_data, dict) else {}
+    if extra.get('segment'):
+        segment = extra['segment']
+        workflow = segment_workflow(workflow, segment['plan'], segment['k'], segment.get('latent'))
+    if extra.get('draft'):
+        workflow = keep_latent(workflow, 'draft')
+    if extra.get('refine'):
+        workflow = refine(workflow, extra['refine'])
+    return prompt, workflow
+
+def fit_jobs(jobs: list, names: list, budget: float) -> int:
+    """Shrink jobs predicted to exceed `budget` seconds (resolution, then steps); returns how many."""
+    profile = get_profile()
+    shrunk = 0
+    for i, (prompt, workflow) in enumerate(jobs):
+        frames, width, height, steps = job_size(workflow)
+        fitted = fit_budget(profile.model(names[i]), frames, width, height, steps, budget)
+        if fitted is not None and fitted != (width, height, steps):
+            w, h, s = fitted
+            jobs[i] = (prompt, Template(names[i], workflow).apply(width=w, height=h, steps=s))
+            shrunk += 1
+    return shrunk
+
+def estimate_seconds(jobs: list, names: list) -> float:
+    """Predicted GPU time for all jobs, from the tuning profile."""
+    profile = get_profile()
+    return sum(profile.model(names[i]).estimate(*job_size(workflow)) for i, (_, workflow) in enumerate(jobs))
+
+def validate_jobs(jobs: list) -> dict:
+    """{index: problems} for jobs ComfyUI can't run (missing nodes, models or choices)."""
+    inventory = get_inventory(COMFYUI_URL, wait=True)
+    rejected = {}
+    for i, (_, workflow) in enumerate(jobs):
+        problems = inventory.validate(workflow)
+        if problems:
+            rejected[i] = problems
+    return rejected
+
+def keyframe_entries(prompts: list, workflow_path: str, fps: float, duration: float = None) -> tuple:
+    """Prompt entries rewritten to render keyframes only, plus the GPU seconds that saves.
+    
+    Each clip keeps its length (an entry's `duration`, else `duration`,
+    else the frames/fps it would have had) but is rendered at the
+    interpolation keyframe rate; the converted output is filled in to `fps`.
+    """
+    template = load_workflow(workflow_path)
+    values = role_values(template.api)
+    rate = keyframe_fps()
+    entries, saved = [], 0.0
+    for data in prompts:
+        entry = {'prompt': data} if isinstance(data, str) else dict(data)
+        seconds = float(entry.pop('duration', None) or duration
+                        or int(entry.get('frames', values.get('frames', 16))) / float(entry.get('fps', values.get('fps', 8))))
+        entry.update(frames=keyframes(seconds, rate), fps=rate)
+        job_template = load_workflow(entry['workflow']) if entry.get('workflow') else template
+        _, width, height, steps = job_size(job_template.apply(**{k: entry[k] for k in ('width', 'height', 'steps') if k in entry}))
+        saved += gpu_seconds_saved(get_profile().model(job_template.name), seconds, fps, width, height, steps, rate)
+        entries.append(entry)
+    return entries, saved
+
+def stage_jobs(jobs: list, skip, inflight: int = 1) -> dict:
+    """Run the high-noise half of every two-expert job, then point each job at its low-noise half.
+    
+    First stages shared by several jobs (same prompt, seed, size, steps)
+    run once, and any already in the result cache don't run at all.
+    Returns {index: error} for jobs whose first stage failed.
+    """
+    staged = {}
+    for i, (_, workflow) in enumerate(jobs):
+        stages = split(workflow) if i not in skip else None
+        if stages is not None:
+            staged[i] = stages
+    if not staged:
+        print("   Staged: no job hands leftover noise between samplers; running normally")
+        return {}
+    
+    keys = list(dict.fromkeys(s.key for s in staged.values()))
+    print(f"\n🧊 Stage 1: {len(keys)} high-noise pass(es) for {len(staged)} job(s)")
+    def done(stages, ok, cached):
+        n = keys.index(stages.key) + 1
+        state = ('♻️ Cached' if cached else '✅ Rendered') if ok else '❌ Failed'
+        print(f"   [{n}/{len(keys)}] {state} latent {stages.key[:12]}")
+    ready = prepare_latents(get_client(COMFYUI_URL), list(staged.values()), config.comfyui_output_dir(),
+                            config.get_path('downloads'), inflight=max(1, inflight), on_done=done,
+                            use_cache=USE_CACHE)
+    
+    failed = {}
+    for i, stages in staged.items():
+        if ready.get(stages.key):
+            jobs[i] = (jobs[i][0], stages.second)
+        else:
+            failed[i] = 'first (high-noise) stage failed'
+    print(f"🧊 Stage 2: {len(staged) - len(failed)} low-noise pass(es)")
+    return failed
+
+def locality_order(jobs: list) -> list:
+    """Submission order that keeps ComfyUI's model and conditioning caches warm.
+    
+    Jobs are grouped by the weights they load, then by identical prompts
+    (so seed sweeps reuse the text encode); groups keep the order in which
+    they first appear in the file.
+    """
+    groups = {}
+    for i, (_, workflow) in enumerate(jobs):
+        by_text = groups.setdefault(model_signature(workflow), {})
+        by_text.setdefault(text_signature(workflow), []).append(i)
+    return [i for by_text in groups.values() for indices in by_text.values() for i in indices]
+
+def count_swaps(jobs: list, order: list) -> int:
+    """Model loads needed to run jobs in this order (first load included)."""
+    swaps, last = 0, None
+    for i in order:
+        signature = model_signature(jobs[i][1])
+        if signature != last:
+            swaps += 1
+            last = signature
+    return swaps
+
+class SwapMeter:
+    """Counts jobs whose loader nodes actually executed (not served from ComfyUI's cache)."""
+    
+    def __init__(self):
+        self.loaders = {}
+        self.swapped = set()
+    
+    def expect(self, prompt_id: str, workflow: dict):
+        self.loaders[prompt_id] = loader_nodes(workflow)
+    
+    def observe(self, event: dict):
+        if event['type'] == 'executing' and event.get('node') in self.loaders.get(event.get('prompt_id'), ()):
+            self.swapped.add(event['prompt_id'])
+    
+    @property
+    def count(self) -> int:
+        return len(self.swapped)
+
+def restore(journal_path: Path, jobs: list, results: list, journal: Journal) -> dict:
+    """Pick up a previous run from its journal.
+    
+    Completed jobs are copied into `results`; jobs that finished while we
+    were gone are collected now. Returns {prompt_id: index} for jobs still
+    sitting in ComfyUI's queue, so they can be re-attached instead of
+    resubmitted. Everything else runs again.
+    """
+    client = get_client(COMFYUI_URL)
     try:
-        response = requests.get(f"{COMFYUI_URL}/history/{prompt_id}")
-        if response.status_code == 200:
-            return response.json().get(prompt_id, {})
-    except:
-        pass
-    return {}
-
-def wait_for_completion(prompt_id: str, timeout: int = 600) -> bool:
-    """Wait for generation to complete."""
-    start = time.time()
-    while time.time() - start < timeout:
-        status = check_status(prompt_id)
-        if status.get('status', {}).get('completed'):
-            return True
-        if status.get('status', {}).get('status_str') == 'error':
-            print(f"Generation failed: {status}")
-            return False
-        time.sleep(2)
-    print("Timeout waiting for generation")
-    return False
-
-def run_batch(prompts: list, workflow_path: str, output_dir: str, delay: int = 5):
-    """Run batch generation from prompt list."""
-    workflow_template = load_workflow(workflow_path)
+        live = client.queued_ids()
+    except (requests.exceptions.RequestException, ValueError):
+        live = set()
+    
+    attached = {}
+    for i, rec in replay(journal_path).items():
+        if i >= len(jobs) or rec.get('prompt', jobs[i][0]) != jobs[i][0]:
+            continue  # prompt file changed under us; redo this one
+        prompt = jobs[i][0]
+        prompt_id = rec.get('prompt_id')
+        if rec['state'] == DONE:
+            results[i] = job_record(prompt, prompt_id, rec.get('outputs', []), resumed=True)
+        elif rec['state'] in (QUEUED, RUNNING) and prompt_id:
+            if prompt_id in live:
+                attached[prompt_id] = i
+                continue
+            event = client.lookup(prompt_id)
+            if event and event['type'] == 'done':
+                files = collect_outputs(event['history'])
+                results[i] = job_record(prompt, prompt_id, files, resumed=True)
+                journal.record(i, DONE, prompt_id=prompt_id, prompt=prompt, outputs=[str(f) for f in files])
+    return attached
+
+def run_jobs(jobs: list, order: list, results: list, journal: Journal, meter: SwapMeter,
+             inflight: int = 1, delay: int = 0, attached: dict = None, timeout: int = 600,
+             names: list = None) -> list:
+    """Keep `inflight` jobs queued on ComfyUI, collecting completions as they land.
+    
+    Jobs are submitted in `order` and every state change goes to the
+    journal; `results` is filled in input order regardless. Jobs identical
+    to one already running ride along with it instead of taking a queue
+    slot. With a window of 1 the old one-at-a-time behaviour (live step
+    progress, `delay` between jobs) is kept. Finished outputs are added to
+    the output index under their workflow `names`, and WebPs are converted
+    to the configured formats in the background while the GPU moves on.
+    """
+    tracker = Tracker(get_client(COMFYUI_URL))
+    total = len(jobs)
+    running = {}  # prompt_id -> (index, prompt, flight)
+    riders = {}   # cache key -> (flight, [(index, prompt)])
+    pending = iter(order)
+    submitted = 0
+    live = False
+    
+    index = get_index()
+    timers = {}   # prompt_id -> JobTimer
+    transcoder = get_transcoder() if TRANSCODE else None
+    converting = []  # (index, prompt_id, files, future)
+    
+    def finish(i, prompt, prompt_id, files, error=None, **extra):
+        results[i] = job_record(prompt, prompt_id, files, **extra)
+        if files:
+            index.record(files, jobs[i][1], names[i] if names else None, prompt_id)
+            if transcoder is not None and files[0].suffix.lower() == '.webp':
+                converting.append((i, prompt_id, files, transcoder.submit(files[0], INTERPOLATE)))
+        if files is not None:
+            journal.record(i, DONE, prompt_id=prompt_id, prompt=prompt, outputs=[str(f) for f in files], **extra)
+        else:
+            journal.record(i, FAILED, prompt_id=prompt_id, error=error)
+    
+    for prompt_id, i in (attached or {}).items():
+        running[prompt_id] = (i, jobs[i][0], None)
+        meter.expect(prompt_id, jobs[i][1])
+        tracker.add(prompt_id, timeout)
+        print(f"[{i + 1}/{total}] 🔗 Re-attached to {prompt_id[:8]}")
+    
+    def top_up():
+        nonlocal submitted
+        while len(running) < inflight:
+            i = next(pending, None)
+            if i is None:
+                return
+            prompt, workflow = jobs[i]
+            flight, owner = cache_lookup(workflow)
+            if flight is not None and flight.hit:
+                print(f"[{i + 1}/{total}] ♻️ Cached: {prompt[:50]}...")
+                finish(i, prompt, None, flight.files, cached=True)
+                continue
+            if not owner:
+                print(f"[{i + 1}/{total}] 🔗 Same as a running job: {prompt[:50]}...")
+                riders.setdefault(flight.key, (flight, []))[1].append((i, prompt))
+                continue
+            
+            if delay and submitted and inflight == 1:
+                time.sleep(delay)
+            timer = metrics.JobTimer(workflow, names[i] if names else None)
+            prompt_id = queue_prompt(workflow)
+            submitted += 1
+            if prompt_id:
+                timer.stage('queue_wait')
+                timers[prompt_id] = timer
+                if flight is not None:
+                    flight.set_prompt(prompt_id)
+                running[prompt_id] = (i, prompt, flight)
+                meter.expect(prompt_id, workflow)
+                tracker.add(prompt_id, timeout)
+                journal.record(i, QUEUED, prompt_id=prompt_id, prompt=prompt)
+                print(f"[{i + 1}/{total}] Queued: {prompt[:50]}...")
+            else:
+                if flight is not None:
+                    flight.fail("failed to queue")
+                print(f"[{i + 1}/{total}] ❌ Failed to queue: {prompt[:50]}...")
+                finish(i, prompt, None, None, error="failed to queue")
+    
+    top_up()
+    for event in tracker.events():
+        meter.observe(event)
+        timer = timers.get(event['prompt_id'])
+        if timer is not None:
+            timer.observe(event)
+        if event['type'] == 'execution_start' and event['prompt_id'] in running:
+            journal.record(running[event['prompt_id']][0], RUNNING, prompt_id=event['prompt_id'])
+        if event['type'] not in ('done', 'error', 'timeout'):
+            if inflight == 1 and format_event(event):
+                print(f"\r   {format_event(event):<40}", end='', flush=True)
+                live = True
+            continue
+        if live:
+            print()
+            live = False
+        
+        prompt_id = event['prompt_id']
+        i, prompt, flight = running.pop(prompt_id)
+        timer = timers.pop(prompt_id, None)
+        files, error = None, None
+        if event['type'] == 'done':
+            if timer is not None:
+                timer.stage('fetch')
+            files = collect_outputs(event['history'], flight)
+            print(f"[{i + 1}/{total}] ✅ Complete")
+        else:
+            error = event.get('message', 'timeout')
+            if flight is not None:
+                flight.fail(error)
+            if event['type'] == 'error':
+                print(f"[{i + 1}/{total}] ❌ Failed: {error}")
+            else:
+                print(f"[{i + 1}/{total}] ❌ Timed out")
+        if timer is not None:
+            timer.finish(event['type'])
+        finish(i, prompt, prompt_id, files, error)
+        if flight is not None:
+            for j, dupe in riders.pop(flight.key, (None, []))[1]:
+                finish(j, dupe, prompt_id, files, error, deduplicated=True)
+        top_up()
+    
+    # Riders of jobs owned elsewhere in this process
+    for flight, waiting in riders.values():
+        files = flight.wait(timeout)
+        for j, dupe in waiting:
+            finish(j, dupe, flight.prompt_id, files, flight.error, deduplicated=True)
+    
+    if converting:
+        print(f"\n🎞️ Finishing {sum(1 for *_, f in converting if not f.done())} of {len(converting)} conversions...")
+    for i, prompt_id, files, future in converting:
+        converted = [path for path in future.result().values() if path]
+        if not converted:
+            continue
+        outputs = [str(f) for f in files] + [str(p) for p in converted]
+        results[i]['outputs'] = outputs
+        index.record(converted, jobs[i][1], names[i] if names else None, prompt_id, source=files[0])
+        journal.record(i, DONE, prompt_id=prompt_id, prompt=jobs[i][0], outputs=outputs)
+    
+    return results
+
+def run_batch(prompts: list, workflow_path: str, output_dir: str, delay: int = 5, inflight: int = 1,
+              order: str = 'file', resume: str = None, budget: float = None, staged: bool = False):
+    """Run batch generation from prompt list.
+    
+    With inflight > 1 the ComfyUI queue is kept `inflight` deep and the
+    per-job delay is skipped, so the GPU never waits on us. With
+    order='locality' jobs sharing models and prompts are submitted
+    back-to-back. With a `budget` (seconds), jobs predicted to take longer
+    are scaled down to fit. With `staged`, two-expert workflows run their
+    high-noise half first (cached by content) and then the low-noise half,
+    so only one expert is loaded at a time. Progress is journaled to a
+    JSONL file next to the log; pass it as `resume` to skip finished jobs
+    after a crash.
+    """
+    template = load_workflow(workflow_path)
     output_path = Path(output_dir)
     output_path.mkdir(parents=True, exist_ok=True)
     
-    results = []
     total = len(prompts)
+    results = [None] * total
+    jobs = [prepare_job(template, prompt_data) for prompt_data in prompts]
+    names = [workflow_name(template, prompt_data) for prompt_data in prompts]
+    shrunk = fit_jobs(jobs, names, budget) if budget else 0
+    rejected = validate_jobs(jobs)
+    submit_order = locality_order(jobs) if order == 'locality' else list(range(total))
+    meter = SwapMeter()
+    stamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+    journal_path = Path(resume) if resume else output_path / f"batch_{stamp}.jsonl"
+    if TRANSCODE:
+        get_transcoder().start()  # fork encoders before the journal and socket threads
     
     print(f"\n🎬 Starting batch generation: {total} prompts")
     print(f"   Workflow: {workflow_path}")
-    print(f"   Output: {output_dir}\n")
+    print(f"   Output: {output_dir}")
+    print(f"   Journal: {journal_path}")
+    if inflight > 1:
+        print(f"   In flight: {inflight}")
+    tuned = all(get_profile().tuned(name) for name in set(names))
+    print(f"   Estimated GPU time: ~{format_eta(estimate_seconds(jobs, names))}"
+          + ("" if tuned else " (untuned; run `make tune` for real numbers)"))
+    if budget:
+        print(f"   Budget: {format_eta(budget)} per job, {shrunk} job(s) scaled down")
+    if rejected:
+        print(f"   Rejected: {len(rejected)} job(s) ComfyUI can't run")
+    if order == 'locality':
+        print(f"   Model swaps (estimated): {count_swaps(jobs, range(total))} in file order, "
+              f"{count_swaps(jobs, submit_order)} scheduled")
     
-    for i, prompt_data in enumerate(prompts, 1):
-        if isinstance(prompt_data, str):
-            prompt = prompt_data
-            negative = None
-            seed = None
-        else:
-            prompt = prompt_data.get('prompt', '')
-            negative = prompt_data.get('negative')
-            seed = prompt_data.get('seed')
-        
-        print(f"[{i}/{total}] Generating: {prompt[:50]}...")
+    with Journal(journal_path) as journal:
+        attached = {}
+        if resume and journal_path.exists():
+            attached = restore(journal_path, jobs, results, journal)
+            finished = sum(1 for r in results if r is not None)
+            print(f"   Resumed: {finished} done, {len(attached)} still queued on ComfyUI")
+        print()
         
-        # Prepare workflow
-        workflow = json.loads(json.dumps(workflow_template))  # Deep copy
-        workflow = update_prompt(workflow, prompt, negative)
-        workflow = update_seed(workflow, seed)
+        if staged:
+            skip = set(rejected) | set(attached.values()) | {i for i, r in enumerate(results) if r is not None}
+            for i, error in stage_jobs(jobs, skip, inflight).items():
+                rejected[i] = [error]
         
-        # Queue and wait
-        prompt_id = queue_prompt(workflow)
-        if prompt_id:
-            success = wait_for_completion(prompt_id)
-            results.append({
-                'prompt': prompt,
-                'prompt_id': prompt_id,
-                'success': success,
-                'timestamp': datetime.now().isoformat()
-            })
-            if success:
-                print(f"   ✅ Complete")
-            else:
-                print(f"   ❌ Failed")
-        else:
-            print(f"   ❌ Failed to queue")
-            results.append({'prompt': prompt, 'success': False})
+        for i, problems in rejected.items():
+            if results[i] is None and i not in attached.values():
+                print(f"[{i + 1}/{total}] 🚫 Rejected: {problems[0]}" + (f" (+{len(problems) - 1} more)" if len(problems) > 1 else ""))
+                results[i] = job_record(jobs[i][0], None, None, error='; '.join(problems))
+                journal.record(i, FAILED, error='; '.join(problems))
         
-        # Delay between generations
-        if i < total:
-            time.sleep(delay)
+        busy = set(attached.values())
+        todo = [i for i in submit_order if results[i] is None and i not in busy]
+        run_jobs(jobs, todo, results, journal, meter, inflight, delay, attached, names=names)
     
     # Save results log
-    log_path = output_path / f"batch_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    log_path = output_path / f"batch_{stamp}.json"
     with open(log_path, 'w') as f:
         json.dump(results, f, indent=2)
     
-    success_count = sum(1 for r in results if r.get('success'))
+    success_count = sum(1 for r in results if r and r.get('success'))
     print(f"\n✨ Batch complete: {success_count}/{total} successful")
+    if meter.loaders and get_client(COMFYUI_URL).connected:
+        print(f"   Model swaps (observed): {meter.count}")
     print(f"   Log: {log_path}")
+    stages = metrics.REGISTRY.summary()
+    if stages:
+        print(f"\n⏱️ Time per stage:\n{stages}")
     
     return results
 
+def run_long(prompts: list, workflow_path: str, output_dir: str, seconds: float, inflight: int = 2, **kwargs):
+    """Render each prompt as a `seconds`-long clip made of overlapping segments.
+    
+    Each segment starts from the previous one's last latent frames, so
+    segments run in rounds: round k is segment k of every clip, run through
+    run_batch as ordinary jobs (at least two in flight). Each prompt's
+    segments are then joined into one file in output_dir.
+    """
+    global TRANSCODE
+    template = load_workflow(workflow_path)
+    if not can_continue(template.api):
+        print(f"Error: {template.name} has no EmptyLatentImage batch to continue segments from")
+        return []
+    default_fps = role_values(template.api).get('fps') or config.get('defaults', 'fps', 8)
+    groups = []
+    for data in prompts:
+        entry = {'prompt': data} if isinstance(data, str) else dict(data)
+        fps = float(entry.get('fps', default_fps))
+        plan = plan_segments(round(seconds * fps), entry.get('frames'))
+        overrides = segment_overrides(plan, entry.get('seed', random_seed()))
+        groups.append((entry, plan, overrides, fps, [None] * len(plan)))
+    
+    # Segments are only worth converting if they can be stream-copied together
+    transcode, TRANSCODE = TRANSCODE, TRANSCODE and any(hard_cuts(plan) for _, plan, _, _, _ in groups)
+    rounds = max(len(plan) for _, plan, _, _, _ in groups)
+    print(f"🎞️ Long mode: {len(prompts)} clip(s) of {seconds:g}s in {sum(len(g[1]) for g in groups)} segments, "
+          f"{rounds} round(s)")
+    client = get_client(COMFYUI_URL)
+    try:
+        for k in range(rounds):
+            segments, owners = [], []
+            for entry, plan, overrides, _, parts in groups:
+                if k >= len(plan) or (k > 0 and parts[k - 1] is None):
+                    continue
+                latent = None
+                if k > 0:
+                    saved = next((p for p in parts[k - 1]['outputs'] if p.endswith('.latent')), None)
+                    try:
+                        latent = client.upload(saved, latent_name(saved)) if saved else None
+                    except (*TRANSPORT_ERRORS, ComfyError, OSError):
+                        latent = None
+                    if latent is None:
+                        print(f"❌ Couldn't hand segment {k}'s last frames to ComfyUI: {entry.get('prompt', '')[:50]}...")
+                        continue
+                segments.append({**entry, **overrides[k], 'segment': {'plan': plan, 'k': k, 'latent': latent}})
+                owners.append(parts)
+            if not segments:
+                break
+            print(f"\n🎞️ Round {k + 1}/{rounds}: segment {k + 1} of {len(segments)} clip(s)")
+            results = run_batch(segments, workflow_path, output_dir, inflight=max(inflight, 2), **kwargs)
+            for parts, record in zip(owners, results):
+                parts[k] = record if record and record.get('success') and record.get('outputs') else None
+    finally:
+        TRANSCODE = transcode
+    
+    print(f"\n🧵 Joining segments...")
+    stamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+    joined = []
+    for n, (entry, plan, _, fps, parts) in enumerate(groups):
+        prompt = entry.get('prompt', '')
+        if not all(parts):
+            print(f"[{n + 1}/{len(groups)}] ❌ Missing segments: {prompt[:50]}...")
+            joined.append(None)
+            continue
+        outputs = [[Path(p) for p in r['outputs'] if not p.endswith('.latent')] for r in parts]
+        files = [out[0] for out in outputs]
+        converted = [next((p for p in out[1:] if p.suffix == transcode_suffix()), None) for out in outputs]
+        dest = join(files, plan, Path(output_dir) / f"long_{stamp}_{n + 1:03}", converted, fps=fps)
+        if dest is None:
+            print(f"[{n + 1}/{len(groups)}] ❌ Could not write the joined clip: {prompt[:50]}...")
+        else:
+            print(f"[{n + 1}/{len(groups)}] ✅ {dest}")
+        joined.append(dest)
+    return joined
+
+def run_drafts(prompts: list, workflow_path: str, output_dir: str, count: int, promote_k: int = 0, **kwargs):
+    """Explore each prompt as `count` cheap drafts, rank them, and render the best `promote_k` at full quality.
+    
+    Drafts keep every setting but size and steps; a prompt with a `seed`
+    explores seed, seed+1, ... so reruns draft the same variants. Each
+    draft saves its latent, and a promoted one is upscaled from it and
+    refined at full size and steps. Rankings (with each draft's exact
+    params) go to drafts_<stamp>.json.
+    """
+    global TRANSCODE
+    template = load_workflow(workflow_path)
+    entries, groups = [], []
+    for data in prompts:
+        entry = {'prompt': data} if isinstance(data, str) else dict(data)
+        job_template = load_workflow(entry['workflow']) if entry.get('workflow') else template
+        sized = {k: entry[k] for k in ('frames', 'width', 'height', 'steps') if k in entry}
+        frames, width, height, steps = job_size(job_template.apply(**sized))
+        full = {**entry, 'frames': frames, 'width': width, 'height': height, 'steps': steps}
+        seeds = [int(entry['seed']) + i for i in range(count)] if entry.get('seed') is not None else None
+        drafts = draft_params(full, count, seeds)
+        groups.append((full, len(entries), drafts))
+        entries += [{**draft, 'draft': True} for draft in drafts]
+    
+    print(f"🧪 Draft mode: {len(entries)} drafts for {len(prompts)} prompt(s)")
+    transcode, TRANSCODE = TRANSCODE, False  # drafts are judged from the WebPs
+    try:
+        results = run_batch(entries, workflow_path, output_dir, **kwargs)
+    finally:
+        TRANSCODE = transcode
+    
+    print(f"\n🏅 Ranking drafts...")
+    client = get_client(COMFYUI_URL)
+    promoted, rankings = [], []
+    for n, (full, first, drafts) in enumerate(groups):
+        scored, latents = [], {}
+        for j, draft in enumerate(drafts):
+            record = results[first + j]
+            videos = [p for p in (record or {}).get('outputs') or [] if not p.endswith('.latent')]
+            if record and record.get('success') and videos:
+                scored.append((score(videos[0]), draft))
+                latents[j] = next((p for p in record['outputs'] if p.endswith('.latent')), None)
+        best = top(scored, len(scored))
+        shown = ", ".join(f"seed {draft['seed']} ({s:.2f})" for s, draft in best[:3])
+        print(f"[{n + 1}/{len(groups)}] {full['prompt'][:40]}: {shown or 'no drafts finished'}")
+        for _, draft in best[:promote_k]:
+            saved = latents[drafts.index(draft)]
+            try:
+                latent = client.upload(saved, latent_name(saved)) if saved else None
+            except (*TRANSPORT_ERRORS, ComfyError, OSError):
+                latent = None
+            if latent is None:
+                print(f"   ❌ Couldn't hand seed {draft['seed']}'s latent to ComfyUI; not promoted")
+                continue
+            promoted.append({**promote(draft, full), 'refine': latent})
+        rankings.append({
+            'prompt': full['prompt'],
+            'drafts': [{'score': s, 'params': draft,
+                        'outputs': results[first + drafts.index(draft)].get('outputs')} for s, draft in best],
+        })
+    
+    stamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+    rankings_path = Path(output_dir) / f"drafts_{stamp}.json"
+    with open(rankings_path, 'w') as f:
+        json.dump(rankings, f, indent=2)
+    print(f"   Rankings: {rankings_path}")
+    
+    if promoted:
+        print(f"\n⬆️ Promoting the top {promote_k} draft(s) of each prompt: {len(promoted)} full render(s)")
+        run_batch(promoted, workflow_path, output_dir, **kwargs)
+    return rankings
+
+def run_spool(spool_dir: str, workflow_path: str = None, inflight: int = 1, budget: float = None,
+              timeout: int = 600) -> int:
+    """Work through a spool until it is empty, on this worker's ComfyUI (COMFYUI_URL).
+    
+    Any number of workers may share one spool directory, each pointed at
+    its own ComfyUI. A worker leases up to `inflight` jobs at a time and
+    heartbeats them; jobs leased by a worker that died go back to the queue
+    once their leases expire. A lease is closed once the job's outputs are
+    converted, and results stream to results/<worker>.jsonl in the spool.
+    Returns how many jobs this worker finished.
+    """
+    spool = Spool(spool_dir)
+    workflow_path = workflow_path or spool.meta()['workflow']
+    template = load_workflow(workflow_path)
+    client = get_client(COMFYUI_URL)
+    inventory = get_inventory(COMFYUI_URL, wait=True)
+    index = get_index()
+    transcoder = get_transcoder() if TRANSCODE else None
+    if transcoder is not None:
+        transcoder.start()  # fork encoders before the heartbeat and socket threads
+    tracker = Tracker(client)
+    running = {}  # prompt_id -> (lease, prompt, workflow, name, flight, timer)
+    riders = {}   # cache key -> [(lease, prompt, workflow, name)]
+    finished = [0]
+    finished_lock = threading.Lock()  # conversions close leases from the transcoder's callback thread
+    
+    counts = spool.counts()
+    print(f"\n📬 Spool worker: {spool.root} ({counts['pending']} pending, {counts['done']} done)")
+    print(f"   Workflow: {workflow_path}")
+    print(f"   ComfyUI: {COMFYUI_URL}")
+    
+    with Worker(spool) as worker:
+        print(f"   Worker: {worker.name}\n")
+        
+        def close(lease, record):
+            with finished_lock:
+                worker.finish(lease, record, ok=record['success'])
+                finished[0] += 1
+        
+        def finish(lease, prompt, prompt_id, workflow, name, files, error=None, **extra):
+            record = job_record(prompt, prompt_id, files, **extra)
+            if error:
+                record['error'] = error
+            if files:
+                index.record(files, workflow, name, prompt_id)
+            if files and transcoder is not None and files[0].suffix.lower() == '.webp':
+                def converted(future):
+                    paths = [path for path in future.result().values() if path]
+                    if paths:
+                        index.record(paths, workflow, name, prompt_id, source=files[0])
+                        record['outputs'] += [str(p) for p in paths]
+                    close(lease, record)
+                transcoder.submit(files[0], INTERPOLATE).add_done_callback(converted)
+                return
+            close(lease, record)
+        
+        def top_up():
+            while len(running) < inflight:
+                lease = worker.claim()
+                if lease is None:
+                    return
+                entry = lease.job['entry']
+                name = workflow_name(template, entry)
+                prompt, workflow = prepare_job(template, entry)
+                tag = f"[#{lease.index + 1}]"
+                if budget:
+                    jobs = [(prompt, workflow)]
+                    fit_jobs(jobs, [name], budget)
+                    workflow = jobs[0][1]
+                problems = inventory.validate(workflow)
+                if problems:
+                    print(f"{tag} 🚫 Rejected: {problems[0]}")
+                    finish(lease, prompt, None, workflow, name, None, error='; '.join(problems))
+                    continue
+                flight, owner = cache_lookup(workflow)
+                if flight is not None and flight.hit:
+                    print(f"{tag} ♻️ Cached: {prompt[:50]}...")
+                    finish(lease, prompt, None, workflow, name, flight.files, cached=True)
+                    continue
+                if not owner:
+                    print(f"{tag} 🔗 Same as a running job: {prompt[:50]}...")
+                    riders.setdefault(flight.key, []).append((lease, prompt, workflow, name))
+                    continue
+                timer = metrics.JobTimer(workflow, name)
+                prompt_id = queue_prompt(workflow)
+                if not prompt_id:
+                    if flight is not None:
+                        flight.fail("failed to queue")
+                    print(f"{tag} ❌ Failed to queue: {prompt[:50]}...")
+                    finish(lease, prompt, None, workflow, name, None, error="failed to queue")
+                    continue
+                timer.stage('queue_wait')
+                if flight is not None:
+                    flight.set_prompt(prompt_id)
+                running[prompt_id] = (lease, prompt, workflow, name, flight, timer)
+                tracker.add(prompt_id, timeout)
+                print(f"{tag} Queued: {prompt[:50]}...")
+        
+        while True:
+            top_up()
+            for event in tracker.events():
+                if event['prompt_id'] not in running:
+                    if event['type'] == 'tick':
+                        top_up()  # jobs may have been added or freed up meanwhile
+                    continue
+                lease, prompt, workflow, name, flight, timer = running[event['prompt_id']]
+                timer.observe(event)
+                if event['type'] not in ('done', 'error', 'timeout'):
+                    continue
+                prompt_id = event['prompt_id']
+                del running[prompt_id]
+                tag = f"[#{lease.index + 1}]"
+                files, error = None, None
+                if event['type'] == 'done':
+                    timer.stage('fetch')
+                    files = collect_outputs(event['history'], flight)
+                    print(f"{tag} ✅ Complete")
+                else:
+                    error = event.get('message', 'timeout')
+                    if flight is not None:
+                        flight.fail(error)
+                    print(f"{tag} ❌ " + (f"Failed: {error}" if event['type'] == 'error' else "Timed out"))
+                timer.finish(event['type'])
+                finish(lease, prompt, prompt_id, workflow, name, files, error)
+                if flight is not None:
+                    for dupe in riders.pop(flight.key, []):
+                        finish(dupe[0], dupe[1], prompt_id, dupe[2], dupe[3], files, error, deduplicated=True)
+                top_up()
+            if running:
+                continue
+            if spool.idle():
+                break
+            # Other workers (or our own conversions) still hold leases; some may expire
+            time.sleep(min(worker.heartbeat, 5))
+    
+    counts = spool.counts()
+    print(f"\n✨ Worker done: {finished[0]} job(s) here; spool has {counts['done']} done, {counts['failed']} failed")
+    print(f"   Results: {spool.root / 'results' / (worker.name + '.jsonl')}")
+    stages = metrics.REGISTRY.summary()
+    if stages:
+        print(f"\n⏱️ Time per stage:\n{stages}")
+    return finished[0]
+
 def main():
+    global COMFYUI_URL, USE_CACHE, TRANSCODE, INTERPOLATE
     parser = argparse.ArgumentParser(description='Batch video generation via ComfyUI')
-    parser.add_argument('--workflow', '-w', required=True, help='Path to workflow JSON')
-    parser.add_argument('--prompts', '-p', help='Path to prompts file (one per line or JSON array)')
+    parser.add_argument('--workflow', '-w', help='Path to workflow JSON (optional for --spool workers)')
+    parser.add_argument('--prompts', '-p', help='Path to prompts file (one per line, JSON array or JSONL)')
     parser.add_argument('--prompt', help='Single prompt to generate')
     parser.add_argument('--count', '-n', type=int, default=1, help='Number of variations (with --prompt)')
     parser.add_argument('--output', '-o', default='./outputs', help='Output directory')
-    parser.add_argument('--delay', '-d', type=int, default=5, help='Delay between generations (seconds)')
+    parser.add_argument('--delay', '-d', type=int, default=5, help='Delay between generations (seconds, sequential mode only)')
+    parser.add_argument('--inflight', '-j', type=int, default=1, help='Prompts kept queued on ComfyUI at once (>1 disables --delay)')
+    parser.add_argument('--order', choices=['file', 'locality'], default='file',
+                        help='Submission order; locality groups jobs by model, then prompt')
+    parser.add_argument('--seed', type=int, help='Fixed seed for every prompt without its own')
+    parser.add_argument('--no-cache', action='store_true', help='Always regenerate, ignoring the result cache')
+    parser.add_argument('--no-transcode', action='store_true', help='Keep WebP outputs only (skip background conversion)')
+    parser.add_argument('--resume', metavar='JOURNAL', help='Continue a crashed run from its batch_*.jsonl journal')
+    parser.add_argument('--budget', type=float, metavar='SECONDS',
+                        help='Scale down jobs predicted to take longer than this (see make tune)')
+    parser.add_argument('--interpolate', type=float, metavar='FPS',
+                        help='Render keyframes only and interpolate the converted outputs up to this frame rate on CPU')
+    parser.add_argument('--duration', type=float, metavar='SECONDS',
+                        help='Clip length with --interpolate (default: each job\'s frames / fps)')
+    parser.add_argument('--drafts', type=int, metavar='N',
+                        help='Draft mode: render N cheap variants of each prompt and rank them')
+    parser.add_argument('--promote', type=int, default=0, metavar='K',
+                        help='With --drafts, upscale and refine the K best drafts of each prompt at full quality')
+    parser.add_argument('--staged', action='store_true',
+                        help='Run two-expert workflows (Wan2.2) as separate high/low-noise jobs via a cached latent')
+    parser.add_argument('--seconds', type=float,
+                        help='Long mode: render each prompt as a clip this long, in overlapping segments')
+    parser.add_argument('--spool', metavar='DIR',
+                        help='Work-queue mode: add --prompts/--prompt to this spool directory (if given), '
+                             'then work on it; start more workers with just --spool and their own --url')
+    parser.add_argument('--fill-only', action='store_true', help='With --spool, only add the prompts')
     parser.add_argument('--url', default=COMFYUI_URL, help='ComfyUI server URL')
     
     args = parser.parse_args()
-    global COMFYUI_URL
     COMFYUI_URL = args.url
+    USE_CACHE = not args.no_cache
+    TRANSCODE = not args.no_transcode
+    if args.interpolate and (args.no_transcode or args.seconds):
+        parser.error('--interpolate needs transcoding and can\'t be combined with --seconds')
+    if args.drafts and (args.seconds or args.resume):
+        parser.error('--drafts can\'t be combined with --seconds or --resume')
+    if args.seconds and args.resume:
+        parser.error('--seconds can\'t be combined with --resume')
+    if args.spool and (args.drafts or args.seconds or args.resume or args.staged or args.interpolate
+                       or args.order != 'file'):
+        parser.error('--spool can\'t be combined with --drafts, --seconds, --resume, --staged, --interpolate or --order')
+    if not args.workflow and not (args.spool and Spool(args.spool).exists and not (args.prompts or args.prompt)):
+        parser.error('--workflow is required (except for workers joining an existing --spool)')
+    
+    if args.spool:
+        spool = Spool(args.spool)
+        if args.prompts or args.prompt:
+            entries = iter_prompts(args.prompts) if args.prompts else (args.prompt for _ in range(args.count))
+            added = spool.fill(seeded(entries, args.seed), str(resolve(args.workflow)))
+            print(f"📥 Added {added} job(s) to {spool.root}")
+        elif not spool.exists:
+            print("Error: Empty spool; add jobs with --prompts or --prompt")
+            return
+        if not args.fill_only:
+            run_spool(args.spool, args.workflow, args.inflight, args.budget)
+        return
     
     # Build prompt list
     prompts = []
     
     if args.prompts:
-        prompts_path = Path(args.prompts)
-        if prompts_path.suffix == '.json':
-            with open(prompts_path) as f:
-                prompts = json.load(f)
-        else:
-            with open(prompts_path) as f:
-                prompts = [line.strip() for line in f if line.strip()]
+        prompts = list(iter_prompts(args.prompts))
     elif args.prompt:
         prompts = [args.prompt] * args.count
     else:
@@ -178,7 +907,25 @@ def main():
         print("Error: No prompts to process")
         return
     
-    run_batch(prompts, args.workflow, args.output, args.delay)
+    if args.seed is not None:
+        prompts = list(seeded(prompts, args.seed))
+    
+    saved = None
+    if args.interpolate:
+        INTERPOLATE = args.interpolate
+        prompts, saved = keyframe_entries(prompts, args.workflow, args.interpolate, args.duration)
+    
+    if args.drafts:
+        run_drafts(prompts, args.workflow, args.output, args.drafts, args.promote, delay=args.delay,
+                   inflight=args.inflight, order=args.order, budget=args.budget, staged=args.staged)
+    elif args.seconds:
+        run_long(prompts, args.workflow, args.output, args.seconds, args.inflight, delay=args.delay,
+                 order=args.order, budget=args.budget, staged=args.staged)
+    else:
+        run_batch(prompts, args.workflow, args.output, args.delay, args.inflight, args.order, args.resume,
+                  args.budget, args.staged)
+    if saved is not None:
+        print(f"🌀 Interpolated to {args.interpolate:g} fps on CPU: ~{format_eta(saved)} of GPU time saved")
 
 if __name__ == '__main__':
     main()
@@ -0,0 +1,250 @@
+#!/usr/bin/env python3
+"""
+Overhead Benchmark
+Runs the Gradio generator and run_batch against a fake ComfyUI and reports
+how much wall time we add on top of (simulated) GPU time.
+"""
+
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import platform
+import resource
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from videogen import config
+from fake_comfyui import FakeComfyUI
+
+DEFAULT_BASELINE = config.ROOT / "outputs" / "bench" / "baseline.json"
+JOB = {"frames": 16, "width": 512, "height": 288, "steps": 20}
+
+
+def peak_rss_mb() -> float:
+    """Peak resident set size of this process so far"""
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / 2**20 if sys.platform == "darwin" else rss / 2**10  # bytes on macOS, KiB on Linux
+
+
+def percentile(values: list, q: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(q * (len(values) - 1))))] if values else 0.0
+
+
+def summarize(fake: FakeComfyUI, prompt_ids: list, wall: float, overheads: list, failed: int) -> dict:
+    """Throughput and overhead figures for one run"""
+    gpu = sum(fake.timings[p]["finished"] - fake.timings[p]["started"]
+              for p in prompt_ids if "finished" in fake.timings.get(p, {}))
+    done = len(prompt_ids)
+    return {
+        "jobs": done + failed,
+        "failed": failed,
+        "wall_s": round(wall, 3),
+        "gpu_s": round(gpu, 3),
+        "gpu_util": round(gpu / wall, 3) if wall else 0.0,
+        "jobs_per_min": round(done / wall * 60, 2) if wall else 0.0,
+        "overhead_ms_mean": round(statistics.mean(overheads) * 1000, 1) if overheads else 0.0,
+        "overhead_ms_p50": round(percentile(overheads, 0.5) * 1000, 1),
+        "overhead_ms_p95": round(percentile(overheads, 0.95) * 1000, 1),
+    }
+
+
+def busy_overlap(intervals: list, start: float, end: float) -> float:
+    """Seconds of [start, end] during which the fake GPU was running something"""
+    return sum(max(0.0, min(end, b) - max(start, a)) for a, b in intervals)
+
+
+def find_prompt(fake: FakeComfyUI, text: str) -> str:
+    """prompt_id of the fake-server job whose prompt text is `text`"""
+    for prompt_id, entry in list(fake.history.items()):
+        for node in entry["prompt"][2].values():
+            if node.get("class_type") == "CLIPTextEncode" and node["inputs"].get("text") == text:
+                return prompt_id
+    return None
+
+
+def bench_app(app, fake: FakeComfyUI, jobs: int, concurrency: int, tag: str) -> dict:
+    """Drive the async generate_text_to_video with `concurrency` callers on one event loop"""
+    async def one(i, gate):
+        async with gate:
+            text = f"bench {tag} job {i}"
+            t0 = time.time()
+            video = None
+            async for video, _, _ in app.generate_text_to_video(
+                text, "", JOB["frames"], 8, JOB["width"], JOB["height"], JOB["steps"], 7.5, i,
+            ):
+                pass
+            return text, t0, time.time(), video
+
+    async def run_all():
+        gate = asyncio.Semaphore(concurrency)
+        return await asyncio.gather(*(one(i, gate) for i in range(jobs)))
+
+    start = time.time()
+    runs = asyncio.run(run_all())
+    wall = time.time() - start
+
+    busy = [(t["started"], t["finished"]) for t in fake.timings.values() if "finished" in t]
+    prompt_ids, overheads, failed = [], [], 0
+    for text, t0, t1, video in runs:
+        prompt_id = find_prompt(fake, text)
+        timing = fake.timings.get(prompt_id, {})
+        if video is None or "finished" not in timing:
+            failed += 1
+            continue
+        prompt_ids.append(prompt_id)
+        # Latency not explained by GPU work: ours or other jobs' ahead of us
+        overheads.append((t1 - t0) - busy_overlap(busy, t0, timing["finished"]))
+    return summarize(fake, prompt_ids, wall, overheads, failed)
+
+
+def bench_batch(batch, fake: FakeComfyUI, workflow: str, out: Path, jobs: int, inflight: int,
+                delay: int, tag: str) -> dict:
+    """One run_batch call; overhead is wall time the fake GPU sat idle, per job"""
+    prompts = [{"prompt": f"bench {tag} job {i}", "seed": i, **JOB} for i in range(jobs)]
+    start = time.time()
+    with contextlib.redirect_stdout(io.StringIO()):
+        results = batch.run_batch(prompts, workflow, str(out / f"batch-{tag}"), delay=delay, inflight=inflight)
+    wall = time.time() - start
+    prompt_ids = [r["prompt_id"] for r in results if r and r.get("success")]
+    gpu = sum(fake.timings[p]["finished"] - fake.timings[p]["started"] for p in prompt_ids)
+    idle = max(0.0, wall - gpu) / max(1, len(prompt_ids))
+    return summarize(fake, prompt_ids, wall, [idle] * len(prompt_ids), jobs - len(prompt_ids))
+
+
+def print_table(title: str, rows: dict, baseline: dict = None):
+    print(f"\n{title}")
+    print(f"   {'conc':>4} {'jobs/min':>9} {'gpu util':>8} {'overhead ms (mean/p50/p95)':>28} {'failed':>6}")
+    for level, r in rows.items():
+        line = (f"   {level:>4} {r['jobs_per_min']:>9.1f} {r['gpu_util']:>7.0%} "
+                f"{r['overhead_ms_mean']:>10.0f} /{r['overhead_ms_p50']:>6.0f} /{r['overhead_ms_p95']:>6.0f} "
+                f"{r['failed']:>6}")
+        base = (baseline or {}).get(level)
+        if base:
+            line += f"   vs baseline: overhead {delta(base['overhead_ms_mean'], r['overhead_ms_mean'])}, " \
+                    f"throughput {delta(base['jobs_per_min'], r['jobs_per_min'])}"
+        print(line)
+
+
+def delta(before: float, after: float) -> str:
+    if not before:
+        return "n/a"
+    return f"{(after - before) / before:+.0%}"
+
+
+def regressions(report: dict, baseline: dict, tolerance: float) -> list:
+    """Runs whose mean overhead grew by more than `tolerance` (fraction) over the baseline"""
+    found = []
+    for suite, rows in report["results"].items():
+        for level, r in rows.items():
+            base = baseline.get("results", {}).get(suite, {}).get(level)
+            if base and base["overhead_ms_mean"] and \
+                    r["overhead_ms_mean"] > base["overhead_ms_mean"] * (1 + tolerance):
+                found.append(f"{suite} @ {level}: {base['overhead_ms_mean']:.0f} -> {r['overhead_ms_mean']:.0f} ms")
+    return found
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure app/batch overhead against a fake ComfyUI')
+    parser.add_argument('--jobs', '-n', type=int, default=8, help='Jobs per run')
+    parser.add_argument('--concurrency', '-c', default='1,2,4',
+                        help='Comma-separated levels (app: parallel users, batch: --inflight)')
+    parser.add_argument('--step-time', type=float, default=0.02, help='Fake seconds per sampler step')
+    parser.add_argument('--delay', type=int, default=0, help='run_batch --delay (sequential runs only)')
+    parser.add_argument('--workflow', '-w', default='text-to-video-api', help='Workflow for the batch runs')
+    parser.add_argument('--skip-app', action='store_true', help='Only benchmark run_batch')
+    parser.add_argument('--skip-batch', action='store_true', help='Only benchmark the Gradio generator')
+    parser.add_argument('--save', nargs='?', const=str(DEFAULT_BASELINE), metavar='PATH',
+                        help=f'Save results as a baseline (default {DEFAULT_BASELINE})')
+    parser.add_argument('--compare', nargs='?', const=str(DEFAULT_BASELINE), metavar='PATH',
+                        help='Compare against a saved baseline')
+    parser.add_argument('--max-regression', type=float, default=None, metavar='PCT',
+                        help='With --compare, exit 1 if mean overhead grows more than PCT percent')
+    args = parser.parse_args()
+    levels = [int(c) for c in args.concurrency.split(',')]
+
+    # Removed at the end, or at exit if a run fails part way
+    scratch = tempfile.TemporaryDirectory(prefix="videogen-bench-", ignore_cleanup_errors=True)
+    tmp = Path(scratch.name)
+    fake = FakeComfyUI(tmp / "comfyui" / "output", step_time=args.step_time)
+    url = fake.start()
+
+    # Point everything at the fake server before app/batch read their config
+    settings = config.load_config()
+    settings["paths"].update(comfyui=str(tmp / "comfyui"), outputs=str(tmp / "outputs"))
+    settings["backends"]["urls"] = [url]
+    settings["cache"]["enabled"] = False
+
+    print(f"🧪 Benchmark: {args.jobs} jobs x {levels}, {JOB['steps']} steps @ {args.step_time}s/step")
+    print(f"   Fake ComfyUI: {url}")
+    print(f"   Scratch: {tmp}")
+
+    report = {
+        "meta": {
+            "timestamp": datetime.now().isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "jobs": args.jobs,
+            "step_time": args.step_time,
+            "job": JOB,
+        },
+        "results": {},
+    }
+    baseline = {}
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+
+    if not args.skip_app:
+        try:
+            with contextlib.redirect_stdout(io.StringIO()):
+                import app
+                app.start()
+        except ImportError as e:
+            print(f"\n⚠️ Skipping app benchmark ({e})")
+        else:
+            rows = {str(c): bench_app(app, fake, args.jobs, c, f"app{c}") for c in levels}
+            report["results"]["app"] = rows
+            print_table("🎛️ Gradio generator (parallel users)", rows, baseline.get("results", {}).get("app"))
+
+    if not args.skip_batch:
+        import batch
+        batch.COMFYUI_URL = url
+        batch.USE_CACHE = False
+        rows = {str(c): bench_batch(batch, fake, args.workflow, tmp / "outputs", args.jobs, c, args.delay,
+                                    f"batch{c}") for c in levels}
+        report["results"]["batch"] = rows
+        print_table("📦 run_batch (--inflight)", rows, baseline.get("results", {}).get("batch"))
+
+    report["peak_rss_mb"] = round(peak_rss_mb(), 1)
+    print(f"\n💾 Peak RSS: {report['peak_rss_mb']:.0f} MB"
+          + (f" (baseline {baseline['peak_rss_mb']:.0f} MB)" if baseline.get("peak_rss_mb") else ""))
+    fake.stop()
+    scratch.cleanup()
+
+    if args.save:
+        path = Path(args.save)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"   Baseline saved: {path}")
+
+    if args.compare and args.max_regression is not None:
+        found = regressions(report, baseline, args.max_regression / 100)
+        if found:
+            print("\n❌ Overhead regressions:")
+            for line in found:
+                print(f"   {line}")
+            sys.exit(1)
+        print("\n✅ No overhead regressions")
+
+
+if __name__ == "__main__":
+    main()
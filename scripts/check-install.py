@@ -8,6 +8,8 @@ import os
 import sys
 from pathlib import Path
 
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
 # Color output
 GREEN = '\033[92m'
 RED = '\033[91m'
@@ -196,6 +198,28 @@ def main():
         warn(f"InsightFace dir not found: {insightface_path}")
         warnings += 1
     
+    # Check shipped workflows against the running ComfyUI
+    print("\n🧩 Workflows")
+    print("-" * 50)
+    
+    from videogen import config
+    from videogen.inventory import get_inventory
+    from videogen.workflows import WORKFLOW_DIR, load_template
+    
+    url = (config.get("backends", "urls") or ["http://127.0.0.1:8188"])[0]
+    inventory = get_inventory(url, wait=True)
+    if inventory.nodes is None:
+        warn(f"ComfyUI not reachable at {url}; start it to check workflows")
+        warnings += 1
+    else:
+        for path in sorted(WORKFLOW_DIR.glob("*.json")):
+            problems = inventory.validate(load_template(path).api)
+            if not problems:
+                ok(path.stem)
+                continue
+            warn(f"{path.stem}: {problems[0]}" + (f" (+{len(problems) - 1} more)" if len(problems) > 1 else ""))
+            warnings += 1
+    
     # Summary
     print("\n" + "=" * 50)
     print("📊 Summary")
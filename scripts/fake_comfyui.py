@@ -0,0 +1,492 @@
+#!/usr/bin/env python3
+"""
+Fake ComfyUI Server
+Stand-in for ComfyUI's HTTP + websocket API that "renders" synthetic animated
+WebPs, so the app and batch runner can be exercised without a GPU or network.
+"""
+
+import argparse
+import base64
+import hashlib
+import io
+import json
+import struct
+import sys
+import threading
+import time
+import uuid
+from email import policy
+from email.parser import BytesParser
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, urlparse
+
+from PIL import Image
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from videogen.workflows import SAMPLERS, WORKFLOW_DIR, load_template, loader_nodes, model_signature
+
+WS_GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+OUTPUT_NODES = {"SaveAnimatedWEBP": "images", "VHS_VideoCombine": "gifs", "SaveLatent": "latents"}
+# Core nodes that jobs wire into the shipped workflows (latent hand-offs)
+LATENT_NODES = ("SaveLatent", "LoadLatent", "LatentFromBatch", "RepeatLatentBatch", "LatentBatch", "LatentUpscale")
+
+
+class Socket:
+    """One server-side websocket connection (text/binary frames out, close/ping in)"""
+
+    def __init__(self, wfile):
+        self.wfile = wfile
+        self.lock = threading.Lock()
+
+    def send(self, msg: dict):
+        self.send_frame(0x1, json.dumps(msg).encode())
+
+    def send_frame(self, opcode: int, data: bytes):
+        first = 0x80 | opcode
+        if len(data) < 126:
+            header = struct.pack("!BB", first, len(data))
+        elif len(data) < 1 << 16:
+            header = struct.pack("!BBH", first, 126, len(data))
+        else:
+            header = struct.pack("!BBQ", first, 127, len(data))
+        with self.lock:
+            self.wfile.write(header + data)
+            self.wfile.flush()
+
+
+def read_frame(rfile) -> tuple:
+    """(opcode, payload) of one masked client frame"""
+    head = rfile.read(2)
+    if len(head) < 2:
+        return 0x8, b""
+    opcode, length = head[0] & 0x0F, head[1] & 0x7F
+    if length == 126:
+        length = struct.unpack("!H", rfile.read(2))[0]
+    elif length == 127:
+        length = struct.unpack("!Q", rfile.read(8))[0]
+    mask = rfile.read(4) if head[1] & 0x80 else b"\0\0\0\0"
+    payload = bytes(b ^ mask[i % 4] for i, b in enumerate(rfile.read(length)))
+    return opcode, payload
+
+
+class FakeComfyUI:
+    """In-process fake ComfyUI with a single FIFO "GPU" worker.
+
+    Each prompt takes ``load_time`` when its model loaders differ from the
+    previous prompt's, plus ``step_time`` per sampler step, plus however
+    long writing the WebP takes.  Timings per prompt are kept in
+    ``timings`` (received / started / finished, epoch seconds).
+    """
+
+    def __init__(self, output_dir: Path, step_time: float = 0.02, load_time: float = 0.0):
+        self.output_dir = Path(output_dir)
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        self.input_dir = self.output_dir.parent / "input"
+        self.input_dir.mkdir(parents=True, exist_ok=True)
+        self.step_time = step_time
+        self.load_time = load_time
+        self.history = {}
+        self.timings = {}
+        self._pending = []  # [number, prompt_id, workflow, extra, outputs]
+        self._running = None
+        self._number = 0
+        self._counter = 0
+        self._sockets = {}
+        self._lock = threading.Lock()
+        self._work = threading.Condition(self._lock)
+        self._interrupt = threading.Event()
+        self._loaded = None
+        self._httpd = None
+
+    # === Lifecycle ===
+
+    def start(self, host: str = "127.0.0.1", port: int = 0) -> str:
+        """Serve in background threads; returns the base URL"""
+        fake = self
+
+        class Handler(FakeHandler):
+            server_state = fake
+
+        self._httpd = ThreadingHTTPServer((host, port), Handler)
+        self._httpd.daemon_threads = True
+        threading.Thread(target=self._httpd.serve_forever, name="fake-comfy-http", daemon=True).start()
+        threading.Thread(target=self._worker, name="fake-comfy-gpu", daemon=True).start()
+        return f"http://{host}:{self._httpd.server_address[1]}"
+
+    def stop(self):
+        if self._httpd is not None:
+            self._httpd.shutdown()
+            self._httpd.server_close()
+
+    # === Queue ===
+
+    def object_info(self) -> dict:
+        """Node specs for every class the shipped workflows use, plus LATENT_NODES.
+
+        Literal ``*_name``/``scheduler`` inputs become combos listing the
+        values those workflows use, so they validate and anything else
+        doesn't.
+        """
+        info = {}
+        for path in sorted(WORKFLOW_DIR.glob("*.json")):
+            for node in load_template(path).api.values():
+                spec = info.setdefault(node["class_type"], {"input": {"required": {}}, "output_node": False})
+                inputs = spec["input"]["required"]
+                for key, value in node.get("inputs", {}).items():
+                    if isinstance(value, list):
+                        inputs.setdefault(key, ["*"])
+                    elif isinstance(value, str) and (key.endswith("_name") or key == "scheduler"):
+                        choices = inputs.setdefault(key, [[]])[0]
+                        if isinstance(choices, list) and value not in choices:
+                            choices.append(value)
+                    else:
+                        kind = {bool: "BOOLEAN", int: "INT", float: "FLOAT"}.get(type(value), "STRING")
+                        inputs.setdefault(key, [kind])
+        for class_type in LATENT_NODES:
+            info.setdefault(class_type, {"input": {"required": {}}, "output_node": class_type in OUTPUT_NODES})
+        return info
+
+    def queue_prompt(self, workflow: dict, client_id: str = None) -> dict:
+        if not isinstance(workflow, dict) or not workflow:
+            return {"error": {"type": "prompt_no_outputs", "message": "Prompt has no outputs"}}
+        for node_id, node in workflow.items():
+            if node.get("class_type") == "LoadLatent" and not (self.input_dir / node["inputs"].get("latent", "")).is_file():
+                return {"error": {"type": "prompt_outputs_failed_validation", "message": "Prompt outputs failed validation"},
+                        "node_errors": {node_id: {"errors": [{"type": "value_not_in_list"}]}}}
+        prompt_id = str(uuid.uuid4())
+        with self._work:
+            self._number += 1
+            self._pending.append([self._number, prompt_id, workflow, {"client_id": client_id}, []])
+            self.timings[prompt_id] = {"received": time.time()}
+            number = self._number
+            self._work.notify()
+        self._broadcast_status()
+        return {"prompt_id": prompt_id, "number": number, "node_errors": {}}
+
+    def queue(self) -> dict:
+        with self._lock:
+            return {
+                "queue_running": [self._running] if self._running else [],
+                "queue_pending": list(self._pending),
+            }
+
+    def delete(self, prompt_ids: list = None):
+        """Drop pending prompts (all of them if prompt_ids is None)"""
+        with self._lock:
+            self._pending = [] if prompt_ids is None else [
+                item for item in self._pending if item[1] not in prompt_ids
+            ]
+        self._broadcast_status()
+
+    def interrupt(self):
+        self._interrupt.set()
+
+    # === Websocket ===
+
+    def attach(self, client_id: str, sock: Socket):
+        with self._lock:
+            self._sockets[client_id] = sock
+        self._send(sock, self._status_msg())
+
+    def detach(self, client_id: str, sock: Socket):
+        with self._lock:
+            if self._sockets.get(client_id) is sock:
+                del self._sockets[client_id]
+
+    def _status_msg(self) -> dict:
+        with self._lock:
+            remaining = len(self._pending) + (1 if self._running else 0)
+        return {"type": "status", "data": {"status": {"exec_info": {"queue_remaining": remaining}}}}
+
+    def _send(self, sock: Socket, msg: dict):
+        try:
+            sock.send(msg)
+        except OSError:
+            pass
+
+    def _broadcast_status(self):
+        msg = self._status_msg()
+        with self._lock:
+            sockets = list(self._sockets.values())
+        for sock in sockets:
+            self._send(sock, msg)
+
+    def _emit(self, client_id: str, mtype: str, **data):
+        with self._lock:
+            sock = self._sockets.get(client_id)
+        if sock is not None:
+            self._send(sock, {"type": mtype, "data": data})
+
+    def _emit_preview(self, client_id: str, step: int, steps: int):
+        """Binary PREVIEW_IMAGE frame: type 1, format 1 (JPEG), then the image"""
+        with self._lock:
+            sock = self._sockets.get(client_id)
+        if sock is None:
+            return
+        buf = io.BytesIO()
+        shade = 255 * step // max(1, steps)
+        Image.new("RGB", (64, 64), (shade, 96, 255 - shade)).save(buf, "JPEG", quality=70)
+        try:
+            sock.send_frame(0x2, struct.pack(">II", 1, 1) + buf.getvalue())
+        except OSError:
+            pass
+
+    # === Execution ===
+
+    def _worker(self):
+        while True:
+            with self._work:
+                while not self._pending:
+                    self._work.wait()
+                self._running = self._pending.pop(0)
+                item = self._running
+            self._interrupt.clear()
+            self._execute(item[1], item[2], item[3].get("client_id"))
+            with self._lock:
+                self._running = None
+            self._broadcast_status()
+
+    def _execute(self, prompt_id: str, workflow: dict, client_id: str):
+        started = time.time()
+        self.timings[prompt_id]["started"] = started
+        messages = [["execution_start", {"prompt_id": prompt_id, "timestamp": int(started * 1000)}]]
+        emit = lambda mtype, **data: self._emit(client_id, mtype, prompt_id=prompt_id, **data)
+        emit("execution_start", timestamp=int(started * 1000))
+
+        signature = model_signature(workflow)
+        cached = sorted(loader_nodes(workflow)) if signature == self._loaded else []
+        emit("execution_cached", nodes=cached)
+        messages.append(["execution_cached", {"prompt_id": prompt_id, "nodes": cached}])
+        if signature != self._loaded:
+            self._interrupt.wait(self.load_time)
+            self._loaded = signature if loader_nodes(workflow) else None
+
+        outputs, error = {}, None
+        for node_id, node in workflow.items():
+            if node_id in cached:
+                continue
+            if self._interrupt.is_set():
+                error = ("execution_interrupted", node_id, node.get("class_type"))
+                break
+            emit("executing", node=node_id, display_node=node_id)
+            class_type = node.get("class_type")
+            if class_type in SAMPLERS:
+                steps = int(node["inputs"].get("steps", 20))
+                for step in range(1, steps + 1):
+                    if self._interrupt.wait(self.step_time):
+                        break
+                    emit("progress", value=step, max=steps, node=node_id)
+                    self._emit_preview(client_id, step, steps)
+            elif class_type in OUTPUT_NODES:
+                outputs[node_id] = self._render(workflow, node)
+                emit("executed", node=node_id, display_node=node_id, output=outputs[node_id])
+
+        finished = time.time()
+        self.timings[prompt_id]["finished"] = finished
+        if error:
+            mtype, node_id, node_type = error
+            data = {"prompt_id": prompt_id, "node_id": node_id, "node_type": node_type, "executed": []}
+            messages.append([mtype, data])
+            self.history[prompt_id] = {
+                "prompt": [0, prompt_id, workflow, {}, []],
+                "outputs": {},
+                "status": {"status_str": "error", "completed": False, "messages": messages},
+            }
+            emit(mtype, node_id=node_id, node_type=node_type, executed=[])
+        else:
+            messages.append(["execution_success", {"prompt_id": prompt_id, "timestamp": int(finished * 1000)}])
+            self.history[prompt_id] = {
+                "prompt": [0, prompt_id, workflow, {}, list(outputs)],
+                "outputs": outputs,
+                "status": {"status_str": "success", "completed": True, "messages": messages},
+            }
+            emit("execution_success", timestamp=int(finished * 1000))
+        emit("executing", node=None)
+
+    def _render(self, workflow: dict, node: dict) -> dict:
+        """Write a small synthetic animation where the output node would"""
+        width, height, frames = 512, 512, 16
+        for other in workflow.values():
+            if other.get("class_type") == "EmptyLatentImage":
+                inputs = other["inputs"]
+                width = int(inputs.get("width", width))
+                height = int(inputs.get("height", height))
+                frames = int(inputs.get("batch_size", frames))
+        inputs = node["inputs"]
+        if node["class_type"] == "SaveLatent":
+            return self._save_latent(str(inputs.get("filename_prefix", "ComfyUI")), width, height, frames)
+        fps = float(inputs.get("fps", inputs.get("frame_rate", 8)))
+        prefix = str(inputs.get("filename_prefix", "ComfyUI"))
+        with self._lock:
+            self._counter += 1
+            name = f"{prefix}_{self._counter:05}_.webp"
+        path = self.output_dir / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        images = [
+            Image.new("RGB", (width, height), ((i * 255 // max(1, frames - 1)), 64, 160))
+            for i in range(frames)
+        ]
+        images[0].save(path, save_all=True, append_images=images[1:],
+                       duration=int(1000 / fps), quality=50, method=0)
+        subfolder = str(Path(name).parent) if "/" in name else ""
+        item = {"filename": Path(name).name, "subfolder": subfolder, "type": "output"}
+        return {OUTPUT_NODES[node["class_type"]]: [item]}
+
+    def _save_latent(self, prefix: str, width: int, height: int, frames: int) -> dict:
+        """Stand-in .latent file (just the shape; real ones are safetensors)"""
+        with self._lock:
+            self._counter += 1
+            name = f"{prefix}_{self._counter:05}_.latent"
+        path = self.output_dir / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps({"shape": [1, 4, frames, height // 8, width // 8]}))
+        subfolder = str(Path(name).parent) if "/" in name else ""
+        return {"latents": [{"filename": Path(name).name, "subfolder": subfolder, "type": "output"}]}
+
+
+class FakeHandler(BaseHTTPRequestHandler):
+    server_state: FakeComfyUI = None
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def _json(self, payload, status: int = 200):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _body(self) -> dict:
+        length = int(self.headers.get("Content-Length") or 0)
+        try:
+            return json.loads(self.rfile.read(length) or b"{}")
+        except ValueError:
+            return {}
+
+    def _upload(self):
+        filename, data = self._form().get("image", (None, None))
+        if not filename or data is None:
+            return self._json({"error": "no file"}, 400)
+        dest = self.server_state.input_dir / Path(filename).name
+        dest.write_bytes(data)
+        return self._json({"name": dest.name, "subfolder": "", "type": "input"})
+
+    def _form(self) -> dict:
+        """multipart/form-data fields as {name: (filename, bytes)}"""
+        length = int(self.headers.get("Content-Length") or 0)
+        head = f"Content-Type: {self.headers.get('Content-Type', '')}\r\n\r\n".encode()
+        message = BytesParser(policy=policy.default).parsebytes(head + self.rfile.read(length))
+        fields = {}
+        for part in message.iter_parts():
+            name = part.get_param("name", header="content-disposition")
+            fields[name] = (part.get_filename(), part.get_payload(decode=True))
+        return fields
+
+    def do_GET(self):
+        fake = self.server_state
+        url = urlparse(self.path)
+        query = {k: v[0] for k, v in parse_qs(url.query).items()}
+        if url.path == "/ws":
+            return self._websocket(query.get("clientId") or uuid.uuid4().hex)
+        if url.path == "/queue":
+            return self._json(fake.queue())
+        if url.path == "/history":
+            return self._json(fake.history)
+        if url.path.startswith("/history/"):
+            prompt_id = url.path.rsplit("/", 1)[1]
+            entry = fake.history.get(prompt_id)
+            return self._json({prompt_id: entry} if entry else {})
+        if url.path == "/system_stats":
+            return self._json({
+                "system": {"os": sys.platform, "python_version": sys.version, "comfyui_version": "fake"},
+                "devices": [{"name": "Fake GPU", "type": "cpu", "index": 0,
+                             "vram_total": 24 * 2**30, "vram_free": 24 * 2**30}],
+            })
+        if url.path == "/object_info":
+            return self._json(fake.object_info())
+        if url.path == "/view":
+            path = fake.output_dir / query.get("subfolder", "") / query.get("filename", "")
+            if not path.resolve().is_relative_to(fake.output_dir.resolve()) or not path.is_file():
+                return self._json({"error": "not found"}, 404)
+            data = path.read_bytes()
+            self.send_response(200)
+            self.send_header("Content-Type", "image/webp")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+            return
+        self._json({"error": "not found"}, 404)
+
+    def do_POST(self):
+        fake = self.server_state
+        path = urlparse(self.path).path
+        if path == "/upload/image":
+            return self._upload()
+        body = self._body()
+        if path == "/prompt":
+            resp = fake.queue_prompt(body.get("prompt"), body.get("client_id"))
+            return self._json(resp, 400 if "error" in resp else 200)
+        if path == "/queue":
+            if body.get("clear"):
+                fake.delete()
+            if body.get("delete"):
+                fake.delete(body["delete"])
+            return self._json({})
+        if path == "/interrupt":
+            fake.interrupt()
+            return self._json({})
+        self._json({"error": "not found"}, 404)
+
+    def _websocket(self, client_id: str):
+        key = self.headers.get("Sec-WebSocket-Key")
+        if not key:
+            return self._json({"error": "websocket upgrade required"}, 400)
+        accept = base64.b64encode(hashlib.sha1((key + WS_GUID).encode()).digest()).decode()
+        self.send_response(101)
+        self.send_header("Upgrade", "websocket")
+        self.send_header("Connection", "Upgrade")
+        self.send_header("Sec-WebSocket-Accept", accept)
+        self.end_headers()
+        self.wfile.flush()
+        sock = Socket(self.wfile)
+        self.server_state.attach(client_id, sock)
+        try:
+            while True:
+                opcode, _ = read_frame(self.rfile)
+                if opcode == 0x8:
+                    break
+        except OSError:
+            pass
+        finally:
+            self.server_state.detach(client_id, sock)
+            self.close_connection = True
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Fake ComfyUI server for benchmarks and offline testing')
+    parser.add_argument('--host', default='127.0.0.1', help='Bind address')
+    parser.add_argument('--port', type=int, default=8189, help='Port (0 = any free port)')
+    parser.add_argument('--output', '-o', default='/tmp/local-video-gen/fake-comfyui/output',
+                        help='Where synthetic outputs are written')
+    parser.add_argument('--step-time', type=float, default=0.02, help='Seconds per sampler step')
+    parser.add_argument('--load-time', type=float, default=0.0, help='Seconds to "load" a different model')
+    args = parser.parse_args()
+
+    fake = FakeComfyUI(args.output, step_time=args.step_time, load_time=args.load_time)
+    url = fake.start(args.host, args.port)
+    print(f"🧪 Fake ComfyUI on {url}")
+    print(f"   Output: {fake.output_dir}")
+    print(f"   {args.step_time}s/step, {args.load_time}s per model load")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        fake.stop()
+
+
+if __name__ == "__main__":
+    main()
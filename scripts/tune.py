@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Throughput Tuner
+Times a short sweep of jobs on a ComfyUI backend, fits a cost model per
+workflow and saves it to the local profile used for ETAs and presets.
+"""
+
+import argparse
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from videogen import config
+from videogen.comfy import TRANSPORT_ERRORS, get_client
+from videogen.scheduler import format_eta
+from videogen.tuning import calibrate, fit, get_profile, presets, sweep_points
+from videogen.workflows import load_template, role_values
+
+
+def tune_workflow(client, name: str, base: dict, quick: bool, timeout: float, device: str) -> bool:
+    """Calibrate one workflow and store its model in the profile"""
+    template = load_template(name)
+    points = sweep_points(base, quick)
+    print(f"\n🔧 {template.name}: {len(points)} runs around "
+          f"{base['frames']} frames @ {base['width']}x{base['height']}, {base['steps']} steps")
+
+    def show(sample):
+        frames, width, height, steps, seconds = sample
+        print(f"   {frames:>3} frames @ {width}x{height}, {steps:>2} steps: {seconds:7.2f}s")
+
+    try:
+        samples = calibrate(client, template, points, timeout=timeout, on_sample=show)
+    except (RuntimeError, *TRANSPORT_ERRORS) as e:
+        print(f"   ❌ {e}")
+        return False
+    model = fit(samples)
+    profile = get_profile()
+    profile.update(template.name, model, samples, device)
+    print(f"   Fitted: {model.fixed:.1f}s + {model.rate:.1f}s per unit "
+          f"(1 unit = 16 frames @ 512x512, 20 steps)")
+    print(f"   Defaults take ~{format_eta(model.estimate(base['frames'], base['width'], base['height'], base['steps']))}")
+    for budget, fitted, eta in presets(model, base['frames'], base['width'], base['height'], base['steps']):
+        if fitted:
+            width, height, steps = fitted
+            print(f"   ≤{format_eta(budget):>5}: {width}x{height}, {steps} steps (~{format_eta(eta)})")
+        else:
+            print(f"   ≤{format_eta(budget):>5}: out of reach")
+    return True
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Calibrate GPU timings and save a cost profile')
+    parser.add_argument('--workflow', '-w', action='append',
+                        help='Workflow to tune (repeatable, default text-to-video-api)')
+    parser.add_argument('--url', default=(config.get("backends", "urls") or ["http://127.0.0.1:8188"])[0],
+                        help='ComfyUI server URL')
+    parser.add_argument('--quick', action='store_true', help='4 runs instead of 8')
+    parser.add_argument('--timeout', type=float, default=900, help='Seconds to allow per run')
+    for key in ('frames', 'width', 'height', 'steps'):
+        parser.add_argument(f'--{key}', type=int, help=f'Base {key} (default from config.yaml)')
+    args = parser.parse_args()
+
+    client = get_client(args.url)
+    try:
+        stats = client.get_system_stats()
+    except TRANSPORT_ERRORS:
+        print(f"❌ ComfyUI not reachable at {args.url}")
+        sys.exit(1)
+    device = (stats.get("devices") or [{}])[0].get("name", "")
+    print(f"🧪 Tuning against {args.url}" + (f" ({device})" if device else ""))
+
+    tuned = 0
+    for name in args.workflow or ['text-to-video-api']:
+        values = role_values(load_template(name).api)
+        base = {key: getattr(args, key) or values.get(key) or config.get("defaults", key)
+                for key in ('frames', 'width', 'height', 'steps')}
+        tuned += tune_workflow(client, name, base, args.quick, args.timeout, device)
+
+    if tuned:
+        get_profile().save()
+        print(f"\n💾 Profile saved: {get_profile().path}")
+    sys.exit(0 if tuned == len(args.workflow or [1]) else 1)
+
+
+if __name__ == "__main__":
+    main()
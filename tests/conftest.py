@@ -0,0 +1,33 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(ROOT / "scripts"))
+
+from videogen import config
+
+
+@pytest.fixture
+def settings(tmp_path, monkeypatch):
+    """The process config, with every path under tmp_path and the result cache off"""
+    cfg = config.load_config()
+    monkeypatch.setitem(cfg, "paths", {**cfg["paths"], "comfyui": str(tmp_path / "comfyui"),
+                                       "outputs": str(tmp_path / "outputs"),
+                                       "downloads": str(tmp_path / "downloads"),
+                                       "profile": str(tmp_path / "profile.json")})
+    monkeypatch.setitem(cfg, "cache", {**cfg["cache"], "enabled": False})
+    return cfg
+
+
+@pytest.fixture
+def fake_comfyui(settings, tmp_path):
+    """A running fake ComfyUI writing into the configured output folder; yields (fake, url)"""
+    from fake_comfyui import FakeComfyUI
+
+    fake = FakeComfyUI(tmp_path / "comfyui" / "output", step_time=0.001)
+    url = fake.start()
+    yield fake, url
+    fake.stop()
@@ -0,0 +1,149 @@
+import http.client
+import json
+import threading
+
+import pytest
+
+from videogen import api
+from videogen.api import JobError, JobService, build_job, serve
+from videogen.jobs import CANCELLED, QUEUED, JobStore
+from videogen.pool import BackendPool
+from videogen.workflows import role_values
+
+
+@pytest.fixture(autouse=True)
+def isolated(settings, monkeypatch):
+    """Fresh service cost models and config paths under tmp_path for every test"""
+    monkeypatch.setattr(api, "_costs", {})
+
+
+def test_build_job_fills_in_the_template():
+    params, workflow, name, estimate = build_job({"prompt": "a cat", "seed": 7, "frames": 8, "width": 256,
+                                                   "height": 256, "steps": 10})
+    assert name == "text-to-video-api"
+    assert params["seed"] == 7
+    texts = [n["inputs"]["text"] for n in workflow.values() if n["class_type"] == "CLIPTextEncode"]
+    assert "a cat" in texts
+    assert estimate > 0
+
+
+def test_build_job_fixes_a_random_seed():
+    params, *_ = build_job("a cat")
+    assert 0 <= params["seed"] < 2**32
+
+
+@pytest.mark.parametrize("request_body", [
+    {},
+    {"prompt": "   "},
+    ["a cat"],
+    {"prompt": "a cat", "sampler": "euler"},
+    {"prompt": "a cat", "seed": "lucky"},
+    {"prompt": "a cat", "frames": "many"},
+])
+def test_build_job_rejects_bad_requests(request_body):
+    with pytest.raises(JobError) as e:
+        build_job(request_body)
+    assert e.value.status == 400
+
+
+@pytest.mark.parametrize("workflow", ["../config.yaml", "/etc/passwd", "workflows/text-to-video-api.json",
+                                      "text-to-video-api.json", "nope", 3, ["text-to-video-api"]])
+def test_build_job_only_takes_shipped_workflow_names(workflow):
+    with pytest.raises(JobError) as e:
+        build_job({"prompt": "a cat", "workflow": workflow})
+    assert e.value.status == 400
+
+
+def test_oversized_jobs_are_scaled_down_or_refused(settings, monkeypatch):
+    job = {"prompt": "a cat", "frames": 32, "width": 768, "height": 768, "steps": 40}
+    limit = api.cost_model("text-to-video-api").estimate(32, 768, 768, 40) / 2
+    monkeypatch.setitem(settings, "scheduler", {**settings["scheduler"], "max_job_seconds": limit,
+                                                "oversize": "downscale"})
+    params, workflow, _, estimate = build_job(job)
+    assert estimate <= limit
+    assert params["width"] < 768 and role_values(workflow)["width"] == params["width"]
+
+    settings["scheduler"]["oversize"] = "refuse"
+    with pytest.raises(JobError) as e:
+        build_job(job)
+    assert e.value.status == 422
+
+
+def test_estimates_use_the_service_cost_model():
+    model = api.cost_model("text-to-video-api")
+    assert api.cost_model("text-to-video-api") is model
+    *_, before = build_job({"prompt": "a cat", "frames": 16, "width": 512, "height": 512, "steps": 20})
+    for _ in range(50):
+        model.observe(16, 512, 512, 20, before * 3)
+    *_, after = build_job({"prompt": "a cat", "frames": 16, "width": 512, "height": 512, "steps": 20})
+    assert after > before * 2
+
+
+@pytest.fixture
+def server(tmp_path):
+    """Job API over a store in tmp_path, with no backend to dispatch to; yields a request function"""
+    service = JobService(JobStore(tmp_path / "jobs.db"), BackendPool(["http://127.0.0.1:9"]), max_queued=3)
+    httpd = serve(service, "127.0.0.1", 0, max_body_mb=0.01)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+
+    def request(method: str, path: str, body: bytes = None, headers: dict = None) -> tuple:
+        conn = http.client.HTTPConnection("127.0.0.1", httpd.server_port, timeout=10)
+        conn.putrequest(method, path)
+        headers = {"Content-Length": str(len(body or b"")), **(headers or {})}
+        for key, value in headers.items():
+            conn.putheader(key, value)
+        conn.endheaders(body)
+        response = conn.getresponse()
+        data = json.loads(response.read() or b"null")
+        conn.close()
+        return response.status, data, response
+
+    yield request
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def test_submit_status_and_cancel(server):
+    status, body, response = server("POST", "/jobs", json.dumps({"prompt": "a cat"}).encode())
+    assert status == 202 and body["state"] == QUEUED
+    assert response.getheader("Location") == f"/jobs/{body['id']}"
+
+    status, view, _ = server("GET", f"/jobs/{body['id']}")
+    assert status == 200 and view["position"] == 0 and view["params"]["prompt"] == "a cat"
+
+    status, view, _ = server("POST", f"/jobs/{body['id']}:cancel")
+    assert status == 200 and view["state"] == CANCELLED
+
+
+def test_batch_is_all_or_nothing(server):
+    status, body, _ = server("POST", "/jobs:batch", json.dumps(["a cat", {"prompt": ""}]).encode())
+    assert status == 400 and body["error"].startswith("job 1:")
+    status, body, _ = server("GET", "/jobs")
+    assert body["jobs"] == []
+
+
+def test_full_queue_asks_clients_to_retry(server):
+    status, _, _ = server("POST", "/jobs:batch", json.dumps(["a", "b", "c"]).encode())
+    assert status == 202
+    status, body, response = server("POST", "/jobs", json.dumps({"prompt": "d"}).encode())
+    assert status == 429
+    assert int(response.getheader("Retry-After")) == body["retry_after"] >= 1
+
+
+@pytest.mark.parametrize("length", ["abc", "-1"])
+def test_bad_content_length_is_a_client_error(server, length):
+    status, body, _ = server("POST", "/jobs", b"", {"Content-Length": length})
+    assert status == 400
+
+
+def test_oversized_bodies_are_refused(server):
+    status, _, _ = server("POST", "/jobs", json.dumps({"prompt": "x" * 20000}).encode())
+    assert status == 413
+
+
+def test_list_limit_is_clamped(server):
+    server("POST", "/jobs:batch", json.dumps(["a", "b"]).encode())
+    status, body, _ = server("GET", "/jobs?limit=-1")
+    assert status == 200 and len(body["jobs"]) == 1
+    status, _, _ = server("GET", "/jobs?limit=lots")
+    assert status == 400
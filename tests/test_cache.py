@@ -0,0 +1,88 @@
+import os
+import threading
+
+from videogen.cache import ResultCache, workflow_key
+
+WORKFLOW = {"1": {"class_type": "KSampler", "inputs": {"seed": 1}}}
+
+
+def output(tmp_path, name: str, size: int = 100):
+    path = tmp_path / "comfy" / name
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(b"x" * size)
+    return path
+
+
+def test_key_ignores_ui_titles():
+    titled = {"1": {**WORKFLOW["1"], "_meta": {"title": "Sampler"}}}
+    assert workflow_key(titled) == workflow_key(WORKFLOW)
+    assert workflow_key({"1": {"class_type": "KSampler", "inputs": {"seed": 2}}}) != workflow_key(WORKFLOW)
+
+
+def test_put_then_hit(tmp_path):
+    cache = ResultCache(tmp_path / "cache", 10**6)
+    flight, owner = cache.begin(WORKFLOW)
+    assert owner and not flight.hit
+    flight.set_prompt("p1")
+    files = flight.finish([output(tmp_path, "a.webp")])
+    assert files[0].read_bytes() == b"x" * 100
+
+    again, owner = cache.begin(WORKFLOW)
+    assert again.hit and not owner
+    assert again.files == files
+
+
+def test_identical_jobs_share_one_flight(tmp_path):
+    cache = ResultCache(tmp_path / "cache", 10**6)
+    flight, owner = cache.begin(WORKFLOW)
+    follower, follows = cache.begin(WORKFLOW)
+    assert owner and not follows
+    assert follower is flight
+
+    got = []
+    waiter = threading.Thread(target=lambda: got.append(follower.wait(5)))
+    waiter.start()
+    flight.set_prompt("p1")
+    assert follower.wait_prompt(1) == "p1"
+    flight.finish([output(tmp_path, "a.webp")])
+    waiter.join()
+    assert got[0] and got[0][0].name == "a.webp"
+
+
+def test_failed_flight_lets_the_next_caller_retry(tmp_path):
+    cache = ResultCache(tmp_path / "cache", 10**6)
+    flight, _ = cache.begin(WORKFLOW)
+    flight.fail("out of memory")
+    assert flight.wait(0) is None and flight.error == "out of memory"
+    retry, owner = cache.begin(WORKFLOW)
+    assert owner and retry is not flight
+
+
+def test_evicts_least_recently_used(tmp_path):
+    cache = ResultCache(tmp_path / "cache", 10**6)
+    keys = []
+    for n in range(3):
+        workflow = {"1": {"class_type": "KSampler", "inputs": {"seed": n}}}
+        flight, _ = cache.begin(workflow)
+        flight.finish([output(tmp_path, f"{n}.webp", 10_000)])
+        keys.append(workflow_key(workflow))
+        manifest = cache._entry(keys[-1]) / "manifest.json"
+        os.utime(manifest, (1000 + n, 1000 + n))
+    cache.get(keys[0])  # touch the oldest
+    cache.max_bytes = 35_000  # room for three entries
+    flight, _ = cache.begin({"1": {"class_type": "KSampler", "inputs": {"seed": 3}}})
+    flight.finish([output(tmp_path, "3.webp", 10_000)])
+
+    assert cache.get(keys[0]) is not None
+    assert cache.get(keys[1]) is None
+    assert cache.get(keys[2]) is not None
+
+
+def test_storing_a_result_again_counts_it_once(tmp_path):
+    cache = ResultCache(tmp_path / "cache", 10**6)
+    cache.evict()  # scan the (empty) cache so the running total is kept
+    src = output(tmp_path, "a.webp")
+    key = workflow_key(WORKFLOW)
+    cache.put(key, [src])
+    cache.put(key, [src])
+    assert cache._total == 100
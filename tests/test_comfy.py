@@ -0,0 +1,46 @@
+import queue
+
+from videogen.comfy import ComfyClient, format_event, history_error, is_terminal
+
+
+def drain(sink: queue.Queue) -> list:
+    return [sink.get_nowait() for _ in range(sink.qsize())]
+
+
+def test_events_reach_their_prompts_watcher():
+    client = ComfyClient("http://127.0.0.1:9")
+    client._dispatch({"type": "execution_start", "data": {"prompt_id": "a"}})  # before anyone watches
+    sink = queue.Queue()
+    client.watch("a", sink)
+    client._dispatch({"type": "progress", "data": {"prompt_id": "a", "value": 1, "max": 4}})
+    client._dispatch({"type": "progress", "data": {"prompt_id": "b", "value": 1, "max": 4}})
+    client._dispatch({"type": "status", "data": {"status": {"exec_info": {"queue_remaining": 3}}}})
+    assert [e["type"] for e in drain(sink)] == ["execution_start", "progress"]
+    assert client.queue_remaining == 3
+
+    client.unwatch("a")
+    client._dispatch({"type": "executing", "data": {"prompt_id": "a", "node": None}})
+    assert drain(sink) == []
+
+
+def test_terminal_events():
+    assert is_terminal({"type": "execution_success"})
+    assert is_terminal({"type": "executing", "node": None})  # older ComfyUI
+    assert not is_terminal({"type": "executing", "node": "3"})
+    assert not is_terminal({"type": "progress", "value": 1, "max": 2})
+
+
+def test_status_lines():
+    assert format_event({"type": "progress", "value": 3, "max": 20}) == "🎞️ Step 3/20"
+    assert format_event({"type": "execution_cached", "nodes": []}) == ""
+    assert format_event({"type": "executing", "node": "7"}) == "⚙️ Node 7"
+
+
+def test_history_error_prefers_the_execution_error():
+    entry = {"status": {"messages": [
+        ["execution_start", {}],
+        ["execution_error", {"node_type": "KSampler", "exception_message": "out of memory"}],
+        ["execution_interrupted", {}],
+    ]}}
+    assert history_error(entry) == "KSampler: out of memory"
+    assert history_error({}) == "Unknown error"
@@ -0,0 +1,62 @@
+import batch
+from videogen.drafts import draft_params, draft_size, promote, refine, top
+from videogen.workflows import Template, load_template, role_values, start_sampler
+
+
+def test_draft_size_keeps_the_aspect():
+    assert draft_size(512, 288, 256) == (256, 144)
+    assert draft_size(480, 832, 256) == (144, 256)
+    assert draft_size(512, 512, 256) == (256, 256)
+    assert draft_size(192, 128, 256) == (192, 128)  # never scaled up
+
+
+def test_drafts_vary_only_the_seed_and_size():
+    full = {"prompt": "a cat", "negative": "blurry", "cfg": 7.5, "fps": 8,
+            "frames": 16, "width": 512, "height": 288, "steps": 20}
+    drafts = draft_params(full, seeds=[1, 2, 3])
+    assert [d["seed"] for d in drafts] == [1, 2, 3]
+    kept = ("prompt", "negative", "cfg", "fps", "frames")
+    for d in drafts:
+        assert {k: d[k] for k in kept} == {k: full[k] for k in kept}
+        assert d["width"] < full["width"] and d["steps"] <= full["steps"]
+
+    chosen = promote(drafts[1], {"width": 512, "height": 288, "steps": 20})
+    assert chosen == {**full, "seed": 2}
+
+
+def test_refine_upscales_the_draft_latent(settings):
+    workflow = load_template("text-to-video-api").apply(frames=16, width=512, height=288, seed=2)
+    sampler_id, _ = start_sampler(workflow)
+    refined = refine(workflow, "draft.latent")
+    sampler = refined[sampler_id]["inputs"]
+    assert sampler["denoise"] == settings["drafts"]["denoise"] and sampler["seed"] == 2
+    upscale_id = sampler["latent_image"][0]
+    upscale = refined[upscale_id]
+    assert upscale["class_type"] == "LatentUpscale"
+    assert (upscale["inputs"]["width"], upscale["inputs"]["height"]) == (512, 288)
+    assert refined[upscale["inputs"]["samples"][0]] == {"class_type": "LoadLatent",
+                                                         "inputs": {"latent": "draft.latent"}}
+    assert [role_values(refined)[k] for k in ("frames", "width", "height")] == [16, 512, 288]
+
+    # shrinking the job to a budget shrinks the upscale with it
+    smaller = Template("text-to-video-api", refined).apply(width=256, height=144)
+    assert (smaller[upscale_id]["inputs"]["width"], smaller[upscale_id]["inputs"]["height"]) == (256, 144)
+
+
+def test_promoted_drafts_start_from_their_latent(fake_comfyui, tmp_path, monkeypatch):
+    fake, url = fake_comfyui
+    monkeypatch.setattr(batch, "COMFYUI_URL", url)
+    monkeypatch.setattr(batch, "TRANSCODE", False)
+    entry = {"prompt": "a cat", "seed": 1, "frames": 8, "width": 512, "height": 512, "steps": 4}
+    [ranking] = batch.run_drafts([entry], "text-to-video-api", str(tmp_path / "out"), count=2, promote_k=1, delay=0)
+    assert len(ranking["drafts"]) == 2
+    assert all(not d["outputs"][0].endswith(".latent") for d in ranking["drafts"])
+
+    jobs = [record["prompt"][2] for record in fake.history.values()]
+    refined = [w for w in jobs if any(n["class_type"] == "LoadLatent" for n in w.values())]
+    assert len(refined) == 1
+    loaded = next(n["inputs"]["latent"] for n in refined[0].values() if n["class_type"] == "LoadLatent")
+    assert (fake.input_dir / loaded).is_file()
+    values = role_values(refined[0])
+    assert [values[k] for k in ("frames", "width", "height", "steps")] == [8, 512, 512, 4]
+    assert values["seed"] == ranking["drafts"][0]["params"]["seed"]
@@ -0,0 +1,26 @@
+import socket
+import time
+
+from videogen.inventory import get_inventory
+
+
+def test_lookups_never_wait_on_object_info(settings):
+    # A backend that accepts connections but never answers
+    silent = socket.socket()
+    silent.bind(("127.0.0.1", 0))
+    silent.listen()
+    try:
+        started = time.monotonic()
+        inventory = get_inventory(f"http://127.0.0.1:{silent.getsockname()[1]}")
+        assert inventory.validate({"1": {"class_type": "KSampler", "inputs": {}}}) == []
+        assert time.monotonic() - started < 1
+        assert inventory._refreshing
+    finally:
+        silent.close()
+
+
+def test_wait_fills_in_the_snapshot(settings, fake_comfyui):
+    _, url = fake_comfyui
+    inventory = get_inventory(url, wait=True)
+    assert inventory.nodes and "KSampler" in inventory.nodes
+    assert inventory.validate({"1": {"class_type": "NoSuchNode", "inputs": {}}})
@@ -0,0 +1,59 @@
+import batch
+from videogen.comfy import get_client
+from videogen.journal import DONE, FAILED, QUEUED, RUNNING, Journal, replay
+from videogen.workflows import load_template
+
+
+def test_replay_merges_records_per_job(tmp_path):
+    path = tmp_path / "batch.jsonl"
+    with Journal(path, sync_interval=0.01) as journal:
+        journal.record(0, QUEUED, prompt_id="p0", prompt="a cat")
+        journal.record(0, RUNNING, prompt_id="p0")
+        journal.record(0, DONE, prompt_id="p0", outputs=["a.webp"])
+        journal.record(1, FAILED, error="out of memory")
+        journal.record(1, QUEUED, prompt_id="p1b", prompt="a dog")  # retried
+    with open(path, "a") as f:
+        f.write('{"i": 2, "state": "do')  # torn by a crash
+
+    jobs = replay(path)
+    assert jobs[0]["state"] == DONE
+    assert jobs[0]["prompt"] == "a cat" and jobs[0]["outputs"] == ["a.webp"]
+    assert jobs[1]["state"] == QUEUED and "error" not in jobs[1]
+    assert 2 not in jobs
+
+
+def test_resume_collects_finished_and_reattaches_queued_jobs(fake_comfyui, tmp_path, monkeypatch):
+    fake, url = fake_comfyui
+    monkeypatch.setattr(batch, "COMFYUI_URL", url)
+    client = get_client(url)
+    template = load_template("text-to-video-api")
+    prompts = ["a cat", "a dog", "a bird", "a fish", "a horse"]
+    jobs = [(p, template.apply(prompt=p, seed=1)) for p in prompts]
+
+    finished = client.queue_prompt(jobs[0][1])
+    assert [e for e in client.wait(finished, timeout=30)][-1]["type"] == "done"
+    fake.step_time = 0.2  # keep the next job busy while the one after it waits
+    busy = client.queue_prompt(jobs[3][1])
+    waiting = client.queue_prompt(jobs[4][1])
+
+    path = tmp_path / "batch.jsonl"
+    with Journal(path) as journal:
+        journal.record(0, QUEUED, prompt_id=finished, prompt="a cat")  # finished while we were gone
+        journal.record(1, DONE, prompt_id="p1", prompt="a dog", outputs=["dog.webp"])
+        journal.record(2, QUEUED, prompt_id="lost", prompt="a bird")  # ComfyUI restarted since
+        journal.record(3, QUEUED, prompt_id=busy, prompt="a fish")
+        journal.record(4, QUEUED, prompt_id=waiting, prompt="a horse")
+
+    results = [None] * len(jobs)
+    try:
+        with Journal(path) as journal:
+            attached = batch.restore(path, jobs, results, journal)
+    finally:
+        fake.delete()
+        fake.interrupt()
+
+    assert results[0]["resumed"] and results[0]["outputs"]
+    assert results[1]["outputs"] == ["dog.webp"]
+    assert results[2] is None  # runs again
+    assert attached == {busy: 3, waiting: 4}
+    assert replay(path)[0]["state"] == DONE
@@ -0,0 +1,110 @@
+import pytest
+
+import batch
+from videogen.longvideo import _blended, hard_cuts, plan_segments, segment_overrides, segment_workflow
+from videogen.workflows import load_template, role_values, start_sampler
+
+
+def test_short_clips_are_one_segment():
+    assert plan_segments(20, 32, 8) == [(0, 20)]
+
+
+def test_segments_overlap_and_cover_the_clip():
+    plan = plan_segments(80, 32, 8)
+    assert plan == [(0, 32), (24, 32), (48, 32)]
+    # the last segment is pulled back to full length instead of left short
+    assert plan_segments(70, 32, 8) == [(0, 32), (24, 32), (38, 32)]
+    for total in (33, 57, 100, 241):
+        plan = plan_segments(total, 32, 8)
+        assert plan[0][0] == 0 and sum(plan[-1]) == total
+        assert all(frames == 32 for _, frames in plan)
+        assert all(start < prev_start + 32 for (prev_start, _), (start, _) in zip(plan, plan[1:]))
+
+
+def test_overlap_is_capped_below_the_segment_length():
+    plan = plan_segments(10, 4, 10)
+    assert all(b[0] > a[0] for a, b in zip(plan, plan[1:]))
+
+
+def test_hard_cuts_only_without_overlap():
+    assert hard_cuts(plan_segments(64, 32, 0))
+    assert not hard_cuts(plan_segments(64, 32, 8))
+    assert hard_cuts([(0, 16)])
+
+
+def test_segments_share_the_seed_and_get_their_own_context(settings):
+    overrides = segment_overrides([(0, 32), (24, 32), (48, 8)], 2**32 - 1)
+    assert [o["seed"] for o in overrides] == [2**32 - 1] * 3
+    assert overrides[0]["context_length"] == settings["long_video"]["context_length"]
+    assert overrides[2]["context_length"] == 8
+    assert all(o["context_overlap"] < o["context_length"] for o in overrides)
+
+
+def source(workflow: dict, link: list) -> dict:
+    return workflow[link[0]]
+
+
+def test_segments_continue_from_the_previous_latent(settings):
+    template = load_template("text-to-video-api")
+    plan = [(0, 32), (24, 32), (48, 32)]
+    workflow = template.apply(frames=32, seed=5)
+    sampler_id, _ = start_sampler(workflow)
+
+    first = segment_workflow(workflow, plan, 0)
+    saves = [n for n in first.values() if n["class_type"] == "SaveLatent"]
+    assert len(saves) == 1 and saves[0]["inputs"]["samples"] == [sampler_id, 0]
+
+    second = segment_workflow(workflow, plan, 1, "prev.latent")
+    sampler = second[sampler_id]["inputs"]
+    assert sampler["denoise"] == settings["long_video"]["denoise"] and sampler["seed"] == 5
+    joined = source(second, sampler["latent_image"])
+    assert joined["class_type"] == "LatentBatch"
+    tail, hold = source(second, joined["inputs"]["samples1"]), source(second, joined["inputs"]["samples2"])
+    # the 8 overlapping frames start where this segment starts within the last one...
+    assert (tail["inputs"]["batch_index"], tail["inputs"]["length"]) == (24, 8)
+    # ...and its last frame is held for the other 24
+    assert hold["class_type"] == "RepeatLatentBatch" and hold["inputs"]["amount"] == 24
+    last = source(second, hold["inputs"]["samples"])
+    assert (last["inputs"]["batch_index"], last["inputs"]["length"]) == (31, 1)
+    assert source(second, last["inputs"]["samples"]) == {"class_type": "LoadLatent", "inputs": {"latent": "prev.latent"}}
+    assert role_values(second)["frames"] == 32
+
+    assert not any(n["class_type"] == "SaveLatent" for n in segment_workflow(workflow, plan, 2, "x").values())
+
+
+def test_hard_cuts_hold_the_last_frame(settings):
+    workflow = load_template("text-to-video-api").apply(frames=16)
+    sampler_id, _ = start_sampler(workflow)
+    second = segment_workflow(workflow, [(0, 16), (16, 16)], 1, "prev.latent", denoise=0.5)
+    hold = source(second, second[sampler_id]["inputs"]["latent_image"])
+    assert hold["class_type"] == "RepeatLatentBatch" and hold["inputs"]["amount"] == 16
+    assert second[sampler_id]["inputs"]["denoise"] == 0.5
+
+
+def test_long_mode_chains_segments(fake_comfyui, tmp_path, monkeypatch):
+    fake, url = fake_comfyui
+    monkeypatch.setattr(batch, "COMFYUI_URL", url)
+    monkeypatch.setattr(batch, "TRANSCODE", False)
+    [clip_path] = batch.run_long(["a cat"], "text-to-video-api", str(tmp_path / "out"), seconds=7, delay=0)
+    assert clip_path is not None and clip_path.exists()
+
+    loaded = [node["inputs"]["latent"] for entry in fake.history.values()
+              for node in entry["prompt"][2].values() if node["class_type"] == "LoadLatent"]
+    assert len(loaded) == 1 and (fake.input_dir / loaded[0]).is_file()
+
+
+def clip(path, levels: list):
+    """Animated WebP whose frames are flat gray at the given levels"""
+    Image = pytest.importorskip("PIL.Image")
+
+    frames = [Image.new("RGB", (8, 8), (level,) * 3) for level in levels]
+    frames[0].save(path, save_all=True, append_images=frames[1:], lossless=True, duration=125)
+    return path
+
+
+def test_crossfade_blends_the_overlap(tmp_path):
+    plan = [(0, 4), (2, 4)]  # 6 frames, 2 shared
+    files = [clip(tmp_path / "a.webp", [0, 10, 20, 30]), clip(tmp_path / "b.webp", [200, 210, 220, 230])]
+    levels = [frame.getpixel((0, 0))[0] for frame in _blended(files, plan, (8, 8))]
+    # the shared frames fade 1/3 then 2/3 of the way into the second segment
+    assert levels == pytest.approx([0, 10, 80, 150, 220, 230], abs=1)
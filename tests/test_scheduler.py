@@ -0,0 +1,105 @@
+import asyncio
+
+import pytest
+
+from videogen.pool import job_cost
+from videogen.scheduler import CostModel, FairScheduler, fit_budget
+from videogen.tuning import fit
+
+
+def test_fit_recovers_a_linear_cost():
+    points = [(8, 256, 256, 10), (16, 256, 256, 10), (16, 512, 512, 20), (32, 512, 512, 20)]
+    samples = [(*p, 3.0 * job_cost(*p) + 4.0) for p in points]
+    model = fit(samples)
+    assert model.rate == pytest.approx(3.0)
+    assert model.fixed == pytest.approx(4.0)
+
+
+def test_fit_falls_back_to_proportional_when_work_explains_nothing():
+    samples = [(16, 512, 512, 20, 10.0), (16, 512, 512, 20, 12.0)]
+    model = fit(samples)
+    assert model.fixed == 0.0
+    assert model.estimate(16, 512, 512, 20) == pytest.approx(11.0)
+
+
+def test_cost_model_learns_from_finished_jobs():
+    model = CostModel(seconds_per_unit=45.0, fixed=5.0)
+    for _ in range(200):
+        for point in ((8, 256, 256, 10), (16, 512, 512, 20), (32, 512, 512, 30)):
+            model.observe(*point, 2.0 * job_cost(*point) + 1.0)
+    assert model.rate == pytest.approx(2.0, rel=0.01)
+    assert model.fixed == pytest.approx(1.0, abs=0.05)
+
+
+def test_fit_budget_keeps_jobs_that_fit():
+    model = CostModel(seconds_per_unit=10.0, fixed=0.0)
+    assert fit_budget(model, 16, 512, 512, 20, model.estimate(16, 512, 512, 20)) == (512, 512, 20)
+
+
+def test_fit_budget_shrinks_resolution_then_steps():
+    model = CostModel(seconds_per_unit=10.0, fixed=2.0)
+    budget = model.estimate(16, 768, 512, 20) / 2
+    width, height, steps = fit_budget(model, 16, 768, 512, 20, budget)
+    assert width % 64 == 0 and height % 64 == 0
+    assert width > height and steps == 20  # aspect kept, steps untouched
+    assert model.estimate(16, width, height, steps) <= budget
+
+    # Already at the minimum size, only steps can go
+    width, height, steps = fit_budget(model, 16, 256, 256, 40, model.estimate(16, 256, 256, 20))
+    assert (width, height) == (256, 256) and steps <= 20
+
+
+def test_fit_budget_gives_up_below_the_minimum_job():
+    model = CostModel(seconds_per_unit=10.0, fixed=30.0)
+    assert fit_budget(model, 16, 512, 512, 20, 10.0) is None
+
+
+def dispatch_order(quantum: float, jobs: list) -> list:
+    """Labels of (session, cost, label) jobs in the order the scheduler would start them"""
+    async def run():
+        scheduler = FairScheduler(lambda: 0, quantum=quantum)
+        tickets = [scheduler.submit(session, cost, label) for session, cost, label in jobs]
+        return [t.label for t in sorted(tickets, key=lambda t: scheduler.position(t)[0])]
+    return asyncio.run(run())
+
+
+def test_drr_lets_short_jobs_past_a_session_of_long_ones():
+    jobs = [("a", 100, "a1"), ("a", 100, "a2"), ("a", 100, "a3"),
+            ("b", 10, "b1"), ("b", 10, "b2"), ("b", 10, "b3")]
+    assert dispatch_order(60, jobs) == ["b1", "b2", "b3", "a1", "a2", "a3"]
+
+
+def test_drr_alternates_sessions_with_equal_jobs():
+    jobs = [("a", 60, "a1"), ("a", 60, "a2"), ("b", 60, "b1"), ("b", 60, "b2")]
+    assert dispatch_order(60, jobs) == ["a1", "b1", "a2", "b2"]
+
+
+def test_dispatch_respects_capacity():
+    async def run():
+        slots = [1]
+        scheduler = FairScheduler(lambda: slots[0], quantum=60)
+        first, second = scheduler.submit("a", 10), scheduler.submit("b", 10)
+        assert await first.wait_turn(1) and first.state == "running"
+        assert not await second.wait_turn(0.05)
+        scheduler.release(first)
+        assert await second.wait_turn(1) and second.state == "running"
+    asyncio.run(run())
+
+
+@pytest.mark.parametrize("quantum", [0, -5])
+def test_quantum_must_be_positive(quantum):
+    with pytest.raises(ValueError):
+        FairScheduler(lambda: 1, quantum=quantum)
+
+
+def test_cancel_marks_waiting_and_dispatched_tickets():
+    async def run():
+        scheduler = FairScheduler(lambda: 1, quantum=60)
+        running, waiting, other = scheduler.submit("a", 10), scheduler.submit("a", 10), scheduler.submit("b", 10)
+        assert await running.wait_turn(1)
+        assert scheduler.cancel("a") == [running]
+        assert await waiting.wait_turn(1)
+        assert running.state == waiting.state == "cancelled" and other.waiting
+        scheduler.release(running)
+        assert await other.wait_turn(1) and other.state == "running"
+    asyncio.run(run())
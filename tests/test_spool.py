@@ -0,0 +1,76 @@
+import json
+import os
+import time
+
+import batch
+from videogen.spool import Spool, Worker
+
+
+def test_fill_and_claim_each_job_once(tmp_path):
+    spool = Spool(tmp_path / "spool", ttl=60)
+    assert spool.fill(iter(["a cat", "a dog"]), workflow="text-to-video-api") == 2
+    assert spool.meta()["jobs"] == 2
+
+    first, second = spool.claim("w1"), spool.claim("w2")
+    assert {first.job["entry"], second.job["entry"]} == {"a cat", "a dog"}
+    assert first.index != second.index
+    assert spool.claim("w3") is None
+    assert spool.counts() == {"pending": 0, "leased": 2, "done": 0, "failed": 0}
+
+    first.complete({"ok": True})
+    second.fail({"error": "boom"})
+    assert spool.counts() == {"pending": 0, "leased": 0, "done": 1, "failed": 1}
+    assert spool.idle()
+
+
+def test_refill_appends_with_the_new_workflow(tmp_path):
+    spool = Spool(tmp_path / "spool", ttl=60)
+    spool.fill(["a cat"], workflow="text-to-video-api")
+    spool.fill(["a dog"], workflow="wan22-5b-t2v")
+    entries = {}
+    while (lease := spool.claim("w1")) is not None:
+        entries[lease.index] = lease.job["entry"]
+    assert entries == {0: "a cat", 1: {"prompt": "a dog", "workflow": "wan22-5b-t2v"}}
+
+
+def test_expired_leases_are_reclaimed(tmp_path):
+    spool = Spool(tmp_path / "spool", ttl=30)
+    spool.fill(["a cat"], workflow="text-to-video-api")
+    lease = spool.claim("dead-worker")
+    assert spool.reclaim() == 0  # still heartbeating
+
+    old = time.time() - 60
+    os.utime(lease.path, (old, old))
+    assert spool.reclaim() == 1
+    assert not lease.touch() and lease.lost
+
+    again = spool.claim("w2")
+    assert again.index == lease.index
+    again.complete({"ok": True})
+
+    # The first worker finishing late doesn't bring the job back
+    lease.complete({"ok": True})
+    assert spool.counts()["done"] == 1 and spool.idle()
+
+
+def test_worker_streams_results(tmp_path):
+    spool = Spool(tmp_path / "spool", ttl=60)
+    spool.fill(["a cat", "a dog"], workflow="text-to-video-api")
+    with Worker(spool, name="gpu1.local", heartbeat=0.05) as worker:
+        while (lease := worker.claim()) is not None:
+            worker.finish(lease, {"prompt": lease.job["entry"], "success": True})
+        assert not worker.held
+    lines = (tmp_path / "spool" / "results" / "gpu1-local.jsonl").read_text().splitlines()
+    assert sorted(json.loads(line)["i"] for line in lines) == [0, 1]
+    assert all(json.loads(line)["worker"] == "gpu1-local" for line in lines)
+
+
+def test_filler_records_an_absolute_workflow_path(tmp_path, monkeypatch):
+    workflow = tmp_path / "flows" / "mine.json"
+    workflow.parent.mkdir()
+    workflow.write_text("{}")
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr("sys.argv", ["batch.py", "--spool", "spool", "--fill-only",
+                                     "--workflow", "flows/mine.json", "--prompt", "a cat"])
+    batch.main()
+    assert Spool(tmp_path / "spool").meta()["workflow"] == str(workflow.resolve())
@@ -0,0 +1,100 @@
+import pytest
+
+from videogen.workflows import Template, job_size, load_template, ui_to_api
+
+UI_GRAPH = {
+    "nodes": [
+        {"id": 1, "type": "CheckpointLoaderSimple", "widgets_values": ["sd15.safetensors"]},
+        {"id": 2, "type": "CLIPTextEncode", "inputs": [{"name": "clip", "link": 1}], "widgets_values": ["a cat"]},
+        {"id": 3, "type": "CLIPTextEncode", "inputs": [{"name": "clip", "link": 2}], "widgets_values": ["blurry"]},
+        {"id": 4, "type": "EmptyLatentImage", "widgets_values": [512, 288, 16]},
+        {"id": 5, "type": "KSampler", "title": "Sampler",
+         "inputs": [{"name": "model", "link": 3}, {"name": "positive", "link": 4},
+                    {"name": "negative", "link": 5}, {"name": "latent_image", "link": 6}],
+         "widgets_values": [42, "fixed", 20, 7.5, "euler", "normal", 1.0]},
+        {"id": 6, "type": "LoraLoader", "mode": 4, "widgets_values": ["bypassed.safetensors", 1.0, 1.0]},
+    ],
+    "links": [
+        [1, 1, 1, 2, 0, "CLIP"],
+        [2, 1, 1, 3, 0, "CLIP"],
+        [3, 1, 0, 5, 0, "MODEL"],
+        [4, 2, 0, 5, 1, "CONDITIONING"],
+        [5, 3, 0, 5, 2, "CONDITIONING"],
+        [6, 4, 0, 5, 3, "LATENT"],
+    ],
+}
+
+
+def test_ui_to_api_maps_links_and_widgets():
+    api = ui_to_api(UI_GRAPH)
+    assert "6" not in api  # bypassed
+    sampler = api["5"]
+    assert sampler["class_type"] == "KSampler"
+    assert sampler["inputs"]["model"] == ["1", 0]
+    assert sampler["inputs"]["positive"] == ["2", 0]
+    assert sampler["inputs"]["latent_image"] == ["4", 0]
+    # the UI-only "control after generate" widget is skipped
+    assert sampler["inputs"]["seed"] == 42
+    assert sampler["inputs"]["steps"] == 20
+    assert sampler["inputs"]["cfg"] == 7.5
+    assert sampler["_meta"] == {"title": "Sampler"}
+    assert api["4"]["inputs"] == {"width": 512, "height": 288, "batch_size": 16}
+
+
+def test_ui_to_api_rejects_unknown_widget_layouts():
+    graph = {"nodes": [{"id": 1, "type": "SomeCustomNode", "widgets_values": [1]}], "links": []}
+    with pytest.raises(ValueError):
+        ui_to_api(graph)
+
+
+def test_roles_follow_the_sampler_to_its_prompts():
+    template = Template("test", ui_to_api(UI_GRAPH))
+    assert template.roles["prompt"] == [("2", "text")]
+    assert template.roles["negative"] == [("3", "text")]
+    assert template.values("frames") == [16]
+
+
+def test_apply_patches_copies_and_leaves_the_template_alone():
+    template = Template("test", ui_to_api(UI_GRAPH))
+    workflow = template.apply(prompt="a dog", seed=7, steps=30, frames=24, cfg=None)
+    assert workflow["2"]["inputs"]["text"] == "a dog"
+    assert workflow["5"]["inputs"]["seed"] == 7
+    assert workflow["5"]["inputs"]["cfg"] == 7.5  # None leaves a role as it is
+    assert workflow["4"]["inputs"]["batch_size"] == 24
+    assert template.api["2"]["inputs"]["text"] == "a cat"
+    assert template.api["5"]["inputs"]["steps"] == 20
+    assert workflow["1"] is template.api["1"]  # untouched nodes are shared
+
+
+def test_apply_keeps_the_templates_number_types():
+    template = load_template("wan22-t2v-gguf")
+    workflow = template.apply(fps=24, cfg=5)
+    assert workflow["11"]["inputs"]["fps"] == 24.0 and isinstance(workflow["11"]["inputs"]["fps"], float)
+    assert isinstance(workflow["8"]["inputs"]["cfg"], float)
+
+
+def test_apply_rejects_unknown_roles():
+    with pytest.raises(ValueError):
+        Template("test", ui_to_api(UI_GRAPH)).apply(sampler="dpmpp")
+
+
+def test_two_expert_loaders_get_separate_roles():
+    template = load_template("wan22-t2v-gguf")
+    workflow = template.apply(unet="high.gguf", unet_low="low.gguf")
+    assert workflow["3"]["inputs"]["unet_name"] == "high.gguf"
+    assert workflow["4"]["inputs"]["unet_name"] == "low.gguf"
+
+
+def test_steps_rescale_the_expert_hand_off():
+    template = load_template("wan22-t2v-gguf")
+    workflow = template.apply(steps=20)
+    first, second = workflow["8"]["inputs"], workflow["9"]["inputs"]
+    assert (first["start_at_step"], first["end_at_step"], first["steps"]) == (0, 10, 20)
+    assert (second["start_at_step"], second["end_at_step"], second["steps"]) == (10, 20, 20)
+    assert template.api["8"]["inputs"]["end_at_step"] == 15
+
+
+def test_job_size_falls_back_to_config_defaults(settings):
+    template = Template("test", ui_to_api(UI_GRAPH))
+    assert job_size(template.apply(frames=8, steps=12)) == (8, 512, 288, 12)
+    assert job_size({}) == tuple(settings["defaults"][k] for k in ("frames", "width", "height", "steps"))
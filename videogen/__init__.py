@@ -0,0 +1,4 @@
+"""
+Local Video Generator - shared helpers
+Code used by both the Gradio app and the batch scripts
+"""
@@ -0,0 +1,588 @@
+"""
+Job API
+Headless HTTP service in front of ComfyUI: jobs land in the persistent job
+store and are dispatched across the backend pool, with status, results and
+cancel over plain JSON
+"""
+
+import json
+import math
+import mimetypes
+import random
+import re
+import shutil
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, urlparse
+
+from videogen import config, metrics
+from videogen.cache import get_cache
+from videogen.comfy import TRANSPORT_ERRORS, ComfyError, format_event
+from videogen.jobs import CANCELLED, DONE, FAILED, FINISHED, QUEUED, RUNNING, JobStore
+from videogen.outputs import get_index
+from videogen.pool import BackendPool, job_cost
+from videogen.scheduler import CostModel, fit_budget, format_eta
+from videogen.transcode import get_transcoder
+from videogen.tuning import get_profile
+from videogen.workflows import ROLES, Template, job_size, load_template, workflow_names
+
+DEFAULT_WORKFLOW = "text-to-video-api"
+JOB_TIMEOUT = 600  # seconds a job may spend on ComfyUI
+CHUNK = 1 << 20    # bytes per write when streaming results
+
+
+def settings() -> dict:
+    """api config with defaults filled in"""
+    return {
+        "host": config.get("api", "host", "127.0.0.1"),
+        "port": int(config.get("api", "port", 7862)),
+        "max_queued": int(config.get("api", "max_queued", 10000)),
+        "max_body_mb": float(config.get("api", "max_body_mb", 16)),
+    }
+
+
+class JobError(Exception):
+    """A request the API refuses; `status` is the HTTP status to answer with"""
+
+    def __init__(self, message: str, status: int = 400, retry_after: int = None):
+        super().__init__(message)
+        self.status = status
+        self.retry_after = retry_after
+
+
+_costs = {}
+_costs_lock = threading.Lock()
+
+
+def cost_model(name: str) -> CostModel:
+    """The service's cost model for a workflow, seeded from the profile and refined as jobs finish"""
+    with _costs_lock:
+        if name not in _costs:
+            _costs[name] = get_profile().model(name)
+        return _costs[name]
+
+
+def build_job(request) -> tuple:
+    """(params, workflow, workflow name, estimated GPU seconds) for one job request.
+
+    Requests take the same fields as batch.py prompt entries: `prompt`,
+    optional `negative`, `seed` and `workflow` (a name from workflows/),
+    plus any template role (frames, width, height, steps, cfg, fps,
+    checkpoint...).  The seed is fixed at submission, and jobs over
+    scheduler.max_job_seconds are scaled down or refused as in the app.
+    """
+    if isinstance(request, str):
+        request = {"prompt": request}
+    if not isinstance(request, dict) or not str(request.get("prompt") or "").strip():
+        raise JobError("a job needs a non-empty prompt")
+    unknown = sorted(set(request) - ROLES - {"workflow"})
+    if unknown:
+        raise JobError(f"unknown field(s): {', '.join(unknown)}")
+    name = request.get("workflow") or DEFAULT_WORKFLOW
+    # Only bare names from workflows/; never paths a remote caller picks
+    if not isinstance(name, str) or name not in workflow_names():
+        raise JobError(f"unknown workflow: {name}")
+    try:
+        template = load_template(name)
+    except (OSError, ValueError, TypeError, AttributeError, KeyError, IndexError) as e:
+        raise JobError(f"workflow {name} can't be loaded: {e}")
+
+    params = dict(request)
+    try:
+        seed = int(params["seed"]) if params.get("seed") is not None else -1
+    except (TypeError, ValueError):
+        raise JobError("seed must be an integer")
+    params["seed"] = seed if seed >= 0 else random.randint(0, 2**32 - 1)
+    try:
+        workflow = template.apply(**{k: v for k, v in params.items() if k != "workflow"})
+        frames, width, height, steps = job_size(workflow)
+    except (TypeError, ValueError) as e:
+        raise JobError(str(e))
+
+    model = cost_model(template.name)
+    estimate = model.estimate(frames, width, height, steps)
+    limit = config.get("scheduler", "max_job_seconds", 900)
+    if estimate > limit:
+        downscale = config.get("scheduler", "oversize", "downscale") == "downscale"
+        fitted = fit_budget(model, frames, width, height, steps, limit) if downscale else None
+        if fitted is None:
+            raise JobError(f"job too large: ~{format_eta(estimate)} of GPU time (limit {format_eta(limit)})", 422)
+        width, height, steps = fitted
+        params.update(width=width, height=height, steps=steps)
+        workflow = Template(template.name, workflow).apply(width=width, height=height, steps=steps)
+        estimate = model.estimate(frames, width, height, steps)
+    return params, workflow, template.name, estimate
+
+
+class JobService:
+    """Feeds stored jobs to a backend pool, `depth` at a time per healthy backend.
+
+    Each dispatched job gets a thread that submits it (or reuses a cached
+    or identical running result), follows its events and converts its
+    output; the dispatch slot is freed as soon as ComfyUI is done, so
+    encoding overlaps the next job.  Live progress is kept in memory and
+    merged into the stored state by ``status``.
+    """
+
+    def __init__(self, store: JobStore, pool: BackendPool, depth: int = 2, max_queued: int = 10000,
+                 timeout: float = JOB_TIMEOUT):
+        self.store = store
+        self.pool = pool
+        self.depth = depth
+        self.max_queued = max_queued
+        self.timeout = timeout
+        self.index = get_index()
+        self.transcoder = get_transcoder()
+        self.live = {}          # job id -> {"stage", "value", "max"} while running
+        self.cancelled = set()  # running job ids asked to stop
+        self.inflight = 0
+        self._lock = threading.Lock()
+        self._admit = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+
+    # === Dispatch ===
+
+    def start(self):
+        """Re-attach jobs left running by a previous process, then begin dispatching"""
+        if self._thread is not None:
+            return
+        for job in self.store.running():
+            self._recover(job)
+        self._thread = threading.Thread(target=self._dispatch_loop, name="job-dispatch", daemon=True)
+        self._thread.start()
+
+    def capacity(self) -> int:
+        """Jobs kept on ComfyUI at once (none while every backend is down)"""
+        return self.depth * sum(1 for b in self.pool.backends if b.available)
+
+    def _dispatch_loop(self):
+        while True:
+            while self.inflight < self.capacity():
+                job = self.store.claim()
+                if job is None:
+                    break
+                self._launch(job)
+            self._wake.wait(1.0)
+            self._wake.clear()
+
+    def _launch(self, job: dict, attach: tuple = None):
+        with self._lock:
+            self.inflight += 1
+            self.live[job["id"]] = {"stage": job.get("stage") or "submitting"}
+        threading.Thread(target=self._run, args=(job, attach), name=f"job-{job['id'][:8]}", daemon=True).start()
+
+    def _free_slot(self, held: list):
+        if held[0]:
+            held[0] = False
+            with self._lock:
+                self.inflight -= 1
+            self._wake.set()
+
+    def _recover(self, job: dict):
+        """Follow a job a previous process left on ComfyUI, or queue it again"""
+        final, queued = None, False
+        if job["prompt_id"] and job["backend"]:
+            try:
+                client = self.pool.get(job["backend"]).client
+                final = client.lookup(job["prompt_id"])
+                queued = final is None and job["prompt_id"] in client.queued_ids()
+            except (KeyError, *TRANSPORT_ERRORS):
+                pass
+        if final is None and not queued:
+            self.store.requeue(job["id"])
+            return
+        self._launch(job, (job["backend"], job["prompt_id"], final))
+
+    def _stage(self, job_id: str, stage: str, persist: bool = True, **progress):
+        with self._lock:
+            live = self.live.get(job_id)
+            if live is not None:
+                live.update(stage=stage, **progress)
+        if persist:
+            self.store.update(job_id, stage=stage)
+
+    def _end(self, job_id: str, state: str, **fields):
+        self.store.update(job_id, state=state, stage=state, **fields)
+
+    def _run(self, job: dict, attach: tuple = None):
+        """Take one job from submission to stored outputs"""
+        job_id, workflow, name = job["id"], job["workflow"], job["workflow_name"]
+        held = [True]
+        flight, owner = None, True
+        backend = token = None
+        timer = metrics.JobTimer(workflow, name)
+        try:
+            if attach is not None:
+                url, prompt_id, final = attach
+                backend = self.pool.get(url)
+            else:
+                final = None
+                problems = self.pool.validate(workflow)
+                if problems:
+                    self._end(job_id, FAILED, error="; ".join(problems))
+                    timer.finish("invalid")
+                    return
+                cache = get_cache()
+                if cache is not None:
+                    flight, owner = cache.begin(workflow)
+                    if flight.hit:
+                        self._free_slot(held)
+                        self._complete(job, flight.files, None, timer)
+                        return
+                if not owner:
+                    self._free_slot(held)
+                    self._stage(job_id, "attached to an identical job")
+                    deadline = time.time() + self.timeout
+                    while not flight.done and job_id not in self.cancelled and time.time() < deadline:
+                        flight.wait(1.0)
+                    if job_id in self.cancelled:
+                        self._end(job_id, CANCELLED)
+                    elif flight.files:
+                        self._complete(job, flight.files, flight.prompt_id, timer)
+                    else:
+                        self._end(job_id, FAILED, error=flight.error or "identical job never finished")
+                    return
+                if job_id in self.cancelled:
+                    self._end(job_id, CANCELLED)
+                    return
+                timer.stage("submit")
+                try:
+                    backend, token, prompt_id = self.pool.submit(workflow, job_cost(*job_size(workflow)))
+                except (RuntimeError, *TRANSPORT_ERRORS):
+                    # No backend took it; back in line until one is up again
+                    self.store.requeue(job_id)
+                    return
+                timer.stage("queue_wait")
+                if flight is not None:
+                    flight.set_prompt(prompt_id, backend.url)
+                self.store.update(job_id, prompt_id=prompt_id, backend=backend.url, stage="waiting in queue")
+                self._stage(job_id, "waiting in queue", persist=False)
+                if job_id in self.cancelled:
+                    backend.client.cancel(prompt_id)
+
+            client = backend.client
+            exec_start = None
+            events = [final] if final else client.wait(prompt_id, self.timeout)
+            for event in events:
+                timer.observe(event)
+                if job_id in self.cancelled:
+                    if owner and flight is not None:
+                        flight.fail("cancelled")
+                    self._end(job_id, CANCELLED)
+                    timer.finish("cancelled")
+                    return
+                etype = event["type"]
+                if etype == "execution_start":
+                    exec_start = time.time()
+                    self._stage(job_id, "running")
+                elif etype == "progress":
+                    self._stage(job_id, format_event(event) or "sampling", persist=False,
+                                value=event.get("value", 0), max=event.get("max", 0))
+                elif etype == "done":
+                    timer.stage("fetch")
+                    self._free_slot(held)
+                    if exec_start is not None:
+                        cost_model(name).observe(*job_size(workflow), time.time() - exec_start)
+                    originals = client.fetch_outputs(event["history"], config.comfyui_output_dir(),
+                                                     config.get_path("downloads"))
+                    files = flight.finish(originals) if owner and flight is not None else originals
+                    source = originals[0] if originals and files and files[0] != originals[0] else None
+                    self._complete(job, files, prompt_id, timer, source)
+                    return
+                elif etype in ("error", "timeout"):
+                    error = event.get("message", "timed out")
+                    if owner and flight is not None:
+                        flight.fail(error)
+                    self._end(job_id, FAILED, error=error)
+                    timer.finish(etype)
+                    return
+                elif etype != "tick" and format_event(event):
+                    self._stage(job_id, format_event(event), persist=False)
+        except ComfyError as e:
+            self._end(job_id, FAILED, error=str(e))
+        except (*TRANSPORT_ERRORS, KeyError) as e:
+            self._end(job_id, FAILED, error=f"lost contact with ComfyUI: {e}")
+        finally:
+            timer.finish("aborted")
+            self._free_slot(held)
+            if backend is not None and token is not None:
+                self.pool.release(backend, token)
+            if owner and flight is not None and not flight.done:
+                flight.fail("aborted")
+            with self._lock:
+                self.live.pop(job_id, None)
+                self.cancelled.discard(job_id)
+
+    def _complete(self, job: dict, files: list, prompt_id: str, timer, source: Path = None):
+        """Convert a finished job's WebP, index the result and mark it done"""
+        if not files:
+            self._end(job["id"], FAILED, error="ComfyUI finished without outputs")
+            timer.finish("empty")
+            return
+        files = [Path(f) for f in files]
+        converted = []
+        if files[0].suffix.lower() == ".webp":
+            self._stage(job["id"], "converting")
+            timer.stage("transcode")
+            results = self.transcoder.submit(files[0]).result()
+            converted = [path for path in results.values() if path and path.exists()]
+        timer.finish()
+        self.index.record(converted or files[:1], job["workflow"], job["workflow_name"], prompt_id, source)
+        self._end(job["id"], DONE, outputs=converted + files, prompt_id=prompt_id)
+
+    # === Requests ===
+
+    def submit(self, requests: list) -> tuple:
+        """Queue jobs (all or none); returns (ids, queue depth afterwards).
+
+        Raises JobError with the offending job's index for bad requests, and
+        with 429 plus a retry hint when the queue can't take them all.
+        """
+        built = []
+        for i, request in enumerate(requests):
+            try:
+                built.append(build_job(request))
+            except JobError as e:
+                raise JobError(f"job {i}: {e}" if len(requests) > 1 else str(e), e.status)
+        if len(built) > self.max_queued:
+            raise JobError(f"at most {self.max_queued} jobs fit in the queue", 413)
+        with self._admit:
+            queued = self.store.queued()
+            if queued + len(built) > self.max_queued:
+                raise JobError(f"queue full ({queued}/{self.max_queued} jobs waiting)", 429,
+                               self.retry_after(queued + len(built) - self.max_queued))
+            ids = self.store.add(built)
+        self._wake.set()
+        return ids, queued + len(built)
+
+    def retry_after(self, overflow: int) -> int:
+        """Seconds until about `overflow` queued jobs have been dispatched"""
+        stats = self.store.stats()
+        per_job = stats["queued_seconds"] / max(1, stats[QUEUED])
+        backends = max(1, sum(1 for b in self.pool.backends if b.available))
+        return max(1, min(3600, math.ceil(overflow * per_job / backends)))
+
+    def status(self, job_id: str) -> dict:
+        """Public view of a job, or None if unknown"""
+        job = self.store.get(job_id)
+        if job is None:
+            return None
+        view = {
+            "id": job["id"],
+            "state": job["state"],
+            "stage": job["stage"],
+            "workflow": job["workflow_name"],
+            "params": job["params"],
+            "estimate": round(job["estimate"] or 0, 1),
+            "created": job["created"],
+            "started": job["started"],
+            "finished": job["finished"],
+        }
+        with self._lock:
+            live = dict(self.live.get(job_id) or {})
+        if job["state"] == RUNNING and live:
+            view["stage"] = live["stage"]
+            if live.get("max"):
+                view["progress"] = {"value": live["value"], "max": live["max"],
+                                    "percent": round(100 * live["value"] / live["max"], 1)}
+            if job_id in self.cancelled:
+                view["stage"] = "cancelling"
+        elif job["state"] == QUEUED:
+            ahead, seconds = self.store.position(job_id)
+            backends = max(1, sum(1 for b in self.pool.backends if b.available))
+            view.update(position=ahead, eta=round(seconds / backends, 1))
+        elif job["state"] == DONE:
+            view["progress"] = {"value": 1, "max": 1, "percent": 100.0}
+            view["outputs"] = [{"name": Path(p).name, "url": f"/jobs/{job_id}/result?index={i}"}
+                               for i, p in enumerate(job["outputs"] or [])]
+        if job["error"]:
+            view["error"] = job["error"]
+        return view
+
+    def cancel(self, job_id: str) -> dict:
+        """Cancel a queued or running job; returns its status (None if unknown)"""
+        job = self.store.get(job_id)
+        if job is None or job["state"] in FINISHED:
+            return self.status(job_id) if job else None
+        if not self.store.cancel_queued(job_id):
+            with self._lock:
+                self.cancelled.add(job_id)
+            if job["prompt_id"] and job["backend"]:
+                try:
+                    self.pool.get(job["backend"]).client.cancel(job["prompt_id"])
+                except (KeyError, *TRANSPORT_ERRORS):
+                    pass
+        return self.status(job_id)
+
+    def result(self, job_id: str, index: int = 0) -> Path:
+        """Output file of a finished job (converted formats first, then the WebP)"""
+        job = self.store.get(job_id)
+        if job is None:
+            raise JobError("no such job", 404)
+        if job["state"] != DONE:
+            if job["state"] in FINISHED:
+                raise JobError(f"job {job['state']}, no result", 409)
+            raise JobError(f"job {job['state']}, result not ready", 409, 5)
+        outputs = job["outputs"] or []
+        if not 0 <= index < len(outputs):
+            raise JobError(f"job has {len(outputs)} output(s)", 404)
+        path = Path(outputs[index])
+        if not path.is_file():
+            raise JobError("output file no longer exists", 410)
+        return path
+
+    def queue_stats(self) -> dict:
+        """Queue depth, room left and backend health, for clients pacing themselves"""
+        stats = self.store.stats()
+        up = sum(1 for b in self.pool.backends if b.available)
+        return {
+            "jobs": {state: stats[state] for state in (QUEUED, RUNNING, DONE, FAILED, CANCELLED)},
+            "capacity": self.max_queued,
+            "free": max(0, self.max_queued - stats[QUEUED]),
+            "eta": round(stats["queued_seconds"] / max(1, up), 1),
+            "dispatched": self.inflight,
+            "backends": [{"url": b.url, "healthy": b.available, "running": b.running, "pending": b.pending}
+                         for b in self.pool.backends],
+        }
+
+
+JOB_PATH = re.compile(r"^/jobs/([0-9a-f]{32})(/result|:cancel)?$")
+
+
+def make_handler(service: JobService, max_body: int):
+    """HTTP handler class serving `service`"""
+
+    class Handler(BaseHTTPRequestHandler):
+        server_version = "videogen-api"
+
+        def _send_json(self, status: int, body, headers: dict = None):
+            data = json.dumps(body).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            for key, value in (headers or {}).items():
+                self.send_header(key, str(value))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def _send_error(self, e: JobError):
+            headers = {"Retry-After": e.retry_after} if e.retry_after else None
+            body = {"error": str(e)}
+            if e.retry_after:
+                body["retry_after"] = e.retry_after
+            self._send_json(e.status, body, headers)
+
+        def _body(self):
+            try:
+                length = int(self.headers.get("Content-Length") or 0)
+            except ValueError:
+                length = -1
+            if length < 0:
+                raise JobError("bad Content-Length header")
+            if length > max_body:
+                raise JobError(f"request body over {max_body} bytes", 413)
+            try:
+                return json.loads(self.rfile.read(length) or b"null")
+            except ValueError:
+                raise JobError("request body is not valid JSON")
+
+        def _route(self):
+            url = urlparse(self.path)
+            return url.path.rstrip("/") or "/", parse_qs(url.query)
+
+        def do_GET(self):
+            path, query = self._route()
+            match = JOB_PATH.match(path)
+            try:
+                if path == "/jobs":
+                    limit = max(1, min(500, int(query.get("limit", ["50"])[0])))
+                    jobs = service.store.list(query.get("state", [None])[0], limit)
+                    self._send_json(200, {"jobs": [{k: job[k] for k in ("id", "state", "stage", "created", "finished")}
+                                                   for job in jobs]})
+                elif path == "/queue":
+                    self._send_json(200, service.queue_stats())
+                elif path == "/metrics":
+                    data = metrics.REGISTRY.render().encode()
+                    self.send_response(200)
+                    self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                    self.send_header("Content-Length", str(len(data)))
+                    self.end_headers()
+                    self.wfile.write(data)
+                elif match and match.group(2) == "/result":
+                    self._stream(service.result(match.group(1), int(query.get("index", ["0"])[0])))
+                elif match and not match.group(2):
+                    view = service.status(match.group(1))
+                    if view is None:
+                        raise JobError("no such job", 404)
+                    self._send_json(200, view)
+                else:
+                    raise JobError("not found", 404)
+            except JobError as e:
+                self._send_error(e)
+            except ValueError:
+                self._send_error(JobError("bad query parameter"))
+
+        def do_POST(self):
+            path, _ = self._route()
+            match = JOB_PATH.match(path)
+            try:
+                if path == "/jobs":
+                    ids, depth = service.submit([self._body()])
+                    self._send_json(202, {"id": ids[0], "state": QUEUED, "status": f"/jobs/{ids[0]}",
+                                          "queue": {"depth": depth, "capacity": service.max_queued}},
+                                    {"Location": f"/jobs/{ids[0]}"})
+                elif path == "/jobs:batch":
+                    body = self._body()
+                    jobs = body.get("jobs") if isinstance(body, dict) else body
+                    if not isinstance(jobs, list) or not jobs:
+                        raise JobError('expected a list of jobs or {"jobs": [...]}')
+                    ids, depth = service.submit(jobs)
+                    self._send_json(202, {"ids": ids, "state": QUEUED,
+                                          "queue": {"depth": depth, "capacity": service.max_queued}})
+                elif match and match.group(2) == ":cancel":
+                    self._cancel(match.group(1))
+                else:
+                    raise JobError("not found", 404)
+            except JobError as e:
+                self._send_error(e)
+
+        def do_DELETE(self):
+            match = JOB_PATH.match(self._route()[0])
+            if match and not match.group(2):
+                self._cancel(match.group(1))
+            else:
+                self._send_error(JobError("not found", 404))
+
+        def _cancel(self, job_id: str):
+            view = service.cancel(job_id)
+            if view is None:
+                self._send_error(JobError("no such job", 404))
+            elif view["state"] in (DONE, FAILED):
+                self._send_json(409, {**view, "error": f"job already {view['state']}"})
+            else:
+                self._send_json(200 if view["state"] == CANCELLED else 202, view)
+
+        def _stream(self, path: Path):
+            size = path.stat().st_size
+            self.send_response(200)
+            self.send_header("Content-Type", mimetypes.guess_type(path.name)[0] or "application/octet-stream")
+            self.send_header("Content-Length", str(size))
+            self.send_header("Content-Disposition", f'attachment; filename="{path.name}"')
+            self.end_headers()
+            with open(path, "rb") as f:
+                shutil.copyfileobj(f, self.wfile, CHUNK)
+
+        def log_message(self, *args):
+            pass
+
+    return Handler
+
+
+def serve(service: JobService, host: str, port: int, max_body_mb: float = 16) -> ThreadingHTTPServer:
+    """HTTP server for `service` (call serve_forever on it)"""
+    server = ThreadingHTTPServer((host, port), make_handler(service, int(max_body_mb * 2**20)))
+    server.daemon_threads = True
+    return server
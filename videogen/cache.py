@@ -0,0 +1,241 @@
+"""
+Generation result cache
+Content-addressed by the exact API workflow sent to ComfyUI, with in-flight dedup
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+from pathlib import Path
+
+from videogen import config
+
+MANIFEST = "manifest.json"
+
+
+def workflow_key(workflow: dict) -> str:
+    """Canonical hash of an API workflow (UI-only `_meta` is ignored)"""
+    canonical = {
+        node_id: {k: v for k, v in node.items() if k != "_meta"}
+        for node_id, node in workflow.items()
+    }
+    blob = json.dumps(canonical, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(blob.encode()).hexdigest()
+
+
+class Flight:
+    """One generation, shared by every caller that asked for the same workflow.
+
+    The caller that created it (the owner) must call ``set_prompt`` once
+    queued, then ``finish`` or ``fail``.  Everyone else can follow the same
+    prompt_id for progress and ``wait`` for the files.
+    """
+
+    def __init__(self, cache: "ResultCache", key: str):
+        self.cache = cache
+        self.key = key
+        self.prompt_id = None
+        self.url = None
+        self.files = None
+        self.error = None
+        self._queued = threading.Event()
+        self._done = threading.Event()
+
+    @property
+    def done(self) -> bool:
+        return self._done.is_set()
+
+    @property
+    def hit(self) -> bool:
+        """True if the result was already on disk"""
+        return self._done.is_set() and self.files is not None and self.prompt_id is None
+
+    def set_prompt(self, prompt_id: str, url: str = None):
+        """Record where the owner queued the job (url of the ComfyUI backend)"""
+        self.prompt_id = prompt_id
+        self.url = url
+        self._queued.set()
+
+    def finish(self, files: list) -> list:
+        """Store outputs in the cache and wake followers; returns cached paths"""
+        try:
+            self.files = self.cache.put(self.key, files) if files else []
+        except OSError:
+            self.files = list(files)
+        self._end()
+        return self.files
+
+    def fail(self, error: str):
+        self.error = error
+        self._end()
+
+    def _end(self):
+        self.cache._release(self)
+        self._queued.set()
+        self._done.set()
+
+    def wait_prompt(self, timeout: float = None) -> str:
+        """Wait until the owner has queued the job; prompt_id or None"""
+        self._queued.wait(timeout)
+        return self.prompt_id
+
+    def wait(self, timeout: float = None) -> list:
+        """Wait for the owner to finish; files or None on failure/timeout"""
+        if not self._done.wait(timeout):
+            return None
+        return self.files
+
+    async def await_prompt(self, timeout: float = None) -> str:
+        """Async wait_prompt (polls, so no thread is held)"""
+        await _poll(self._queued, timeout)
+        return self.prompt_id
+
+    async def await_files(self, timeout: float = None) -> list:
+        """Async wait"""
+        if not await _poll(self._done, timeout):
+            return None
+        return self.files
+
+
+async def _poll(event: threading.Event, timeout: float = None, interval: float = 0.1) -> bool:
+    """Wait for a threading.Event from a coroutine"""
+    deadline = None if timeout is None else time.monotonic() + timeout
+    while not event.is_set():
+        if deadline is not None and time.monotonic() >= deadline:
+            return False
+        await asyncio.sleep(interval)
+    return True
+
+
+class ResultCache:
+    """Outputs stored under <root>/<key[:2]>/<key>/ with a size budget.
+
+    Entry directories hold hardlinks (or copies) of the ComfyUI outputs
+    plus a manifest; the manifest mtime is the LRU clock.
+    """
+
+    def __init__(self, root: Path, max_bytes: int):
+        self.root = Path(root)
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._inflight = {}
+        self._total = None  # bytes on disk, scanned lazily
+
+    def _entry(self, key: str) -> Path:
+        return self.root / key[:2] / key
+
+    def get(self, key: str) -> list:
+        """Cached files for key (and bump its LRU time), or None"""
+        manifest = self._entry(key) / MANIFEST
+        try:
+            with open(manifest) as f:
+                names = json.load(f)["files"]
+        except (OSError, ValueError, KeyError):
+            return None
+        files = [manifest.parent / name for name in names]
+        if not all(f.exists() for f in files):
+            return None
+        try:
+            os.utime(manifest)
+        except OSError:
+            pass
+        return files
+
+    def put(self, key: str, files: list) -> list:
+        """Link/copy files into the entry for key, return the cached paths"""
+        entry = self._entry(key)
+        entry.mkdir(parents=True, exist_ok=True)
+        names, size, added = [], 0, 0
+        for src in map(Path, files):
+            dest = entry / src.name
+            fresh = not dest.exists()
+            if fresh:
+                try:
+                    os.link(src, dest)
+                except OSError:
+                    shutil.copy2(src, dest)
+            names.append(dest.name)
+            size += dest.stat().st_size
+            if fresh:
+                added += dest.stat().st_size
+        tmp = entry / f".{MANIFEST}.tmp"
+        with open(tmp, "w") as f:
+            json.dump({"files": names, "size": size, "created": time.time()}, f)
+        os.replace(tmp, entry / MANIFEST)
+        with self._lock:
+            if self._total is not None:
+                self._total += added  # files already in the entry were counted when they landed
+        self.evict()
+        return [entry / name for name in names]
+
+    def _entries(self):
+        """(mtime, size, dir) for every complete entry"""
+        for manifest in self.root.glob(f"*/*/{MANIFEST}"):
+            try:
+                st = manifest.stat()
+                size = sum(f.stat().st_size for f in manifest.parent.iterdir() if f.is_file())
+            except OSError:
+                continue
+            yield st.st_mtime, size, manifest.parent
+
+    def evict(self):
+        """Drop least recently used entries until under the size budget"""
+        with self._lock:
+            if self._total is not None and self._total <= self.max_bytes:
+                return
+            entries = sorted(self._entries())
+            total = sum(size for _, size, _ in entries)
+            for _, size, entry in entries:
+                if total <= self.max_bytes:
+                    break
+                if entry.name in self._inflight:
+                    continue
+                shutil.rmtree(entry, ignore_errors=True)
+                total -= size
+            self._total = total
+
+    def begin(self, workflow: dict) -> tuple:
+        """Look up a workflow, returning (flight, is_owner).
+
+        A hit comes back already done; an identical running job comes back
+        as a shared flight to follow; otherwise the caller owns a new one.
+        """
+        key = workflow_key(workflow)
+        with self._lock:
+            files = self.get(key)
+            if files is not None:
+                flight = Flight(self, key)
+                flight.files = files
+                flight._queued.set()
+                flight._done.set()
+                return flight, False
+            flight = self._inflight.get(key)
+            if flight is not None:
+                return flight, False
+            flight = self._inflight[key] = Flight(self, key)
+            return flight, True
+
+    def _release(self, flight: Flight):
+        with self._lock:
+            if self._inflight.get(flight.key) is flight:
+                del self._inflight[flight.key]
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_cache() -> ResultCache:
+    """Process-wide cache from config, or None if disabled"""
+    global _cache
+    if not config.get("cache", "enabled", True):
+        return None
+    with _cache_lock:
+        if _cache is None:
+            max_gb = float(config.get("cache", "max_size_gb", 20))
+            _cache = ResultCache(config.get_path("outputs") / ".cache", int(max_gb * 1e9))
+        return _cache
@@ -0,0 +1,662 @@
+"""
+ComfyUI API client
+One HTTP session and one /ws connection per process, shared by every job
+"""
+
+import asyncio
+import json
+import os
+import queue
+import socket
+import struct
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+
+try:
+    import websocket  # websocket-client
+except ImportError:  # polling-only fallback
+    websocket = None
+
+try:
+    import httpx  # ships with gradio
+except ImportError:  # async calls run the sync ones in a worker thread
+    httpx = None
+
+HTTP_TIMEOUT = 10          # seconds for plain API calls
+RESYNC_INTERVAL = 30       # re-check /history this often even with a live socket
+RECONNECT_DELAY = (1, 30)  # min/max backoff between socket reconnects
+BACKLOG_PROMPTS = 256      # events kept for prompts nobody is watching yet
+DOWNLOAD_CHUNK = 1 << 20   # bytes per write when streaming /view to disk
+DOWNLOAD_WORKERS = 4       # parallel downloads per multi-output job
+PREVIEW_INTERVAL = 0.5     # seconds between live preview frames passed on per prompt
+PREVIEW_FORMATS = {1: "jpeg", 2: "png"}
+
+TERMINAL_EVENTS = {"execution_success", "execution_error", "execution_interrupted"}
+
+# What a failed call to ComfyUI can raise, sync or async (ValueError: bad JSON)
+TRANSPORT_ERRORS = (requests.RequestException, ValueError) + ((httpx.HTTPError,) if httpx else ())
+
+
+class ComfyError(Exception):
+    """Raised when ComfyUI rejects a request"""
+
+
+class ComfyClient:
+    """Thin ComfyUI API wrapper that pushes execution events to waiting jobs.
+
+    Events arrive over a single websocket opened with this client's
+    ``clientId``.  Jobs register a sink (anything with ``put()``) per
+    prompt_id; when the socket is down, ``wait`` falls back to polling
+    ``/history``.
+    """
+
+    def __init__(self, url: str, client_id: str = None):
+        self.url = url.rstrip("/")
+        self.client_id = client_id or uuid.uuid4().hex
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=16)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.queue_remaining = None
+        self.connected = False
+        self._connects = 0
+        self._lock = threading.Lock()
+        self._watchers = {}
+        self._backlog = OrderedDict()
+        self._executing = None   # prompt the server is running for us (previews carry no id)
+        self._preview_at = {}
+        self._ws_thread = None
+        self._ws_ready = threading.Event()
+        self._aclient = None
+        self._aloop = None
+
+    # === HTTP ===
+
+    def queue_prompt(self, workflow: dict) -> str:
+        """Send workflow to ComfyUI, return prompt_id"""
+        self._ensure_socket()
+        r = self.session.post(
+            f"{self.url}/prompt",
+            json={"prompt": workflow, "client_id": self.client_id},
+            timeout=HTTP_TIMEOUT,
+        )
+        resp = r.json()
+        if "error" in resp:
+            raise ComfyError(f"ComfyUI error: {resp['error']}")
+        return resp.get("prompt_id")
+
+    def get_queue(self) -> dict:
+        """Get current queue status"""
+        return self.session.get(f"{self.url}/queue", timeout=HTTP_TIMEOUT).json()
+
+    def get_history(self, prompt_id: str) -> dict:
+        """Get execution history for a prompt"""
+        return self.session.get(f"{self.url}/history/{prompt_id}", timeout=HTTP_TIMEOUT).json()
+
+    def get_system_stats(self) -> dict:
+        """Get device and VRAM info"""
+        return self.session.get(f"{self.url}/system_stats", timeout=HTTP_TIMEOUT).json()
+
+    def get_object_info(self) -> dict:
+        """Every installed node class with its input specs (large; cache it)"""
+        return self.session.get(f"{self.url}/object_info", timeout=HTTP_TIMEOUT * 3).json()
+
+    def interrupt(self):
+        """Interrupt the running job"""
+        self.session.post(f"{self.url}/interrupt", timeout=HTTP_TIMEOUT)
+
+    def clear_queue(self):
+        """Drop all pending jobs"""
+        self.session.post(f"{self.url}/queue", json={"clear": True}, timeout=HTTP_TIMEOUT)
+
+    def delete_queued(self, prompt_ids: list):
+        """Drop specific pending jobs"""
+        self.session.post(f"{self.url}/queue", json={"delete": list(prompt_ids)}, timeout=HTTP_TIMEOUT)
+
+    def cancel(self, prompt_id: str):
+        """Stop one job: interrupt it if it is running, otherwise unqueue it"""
+        q = self.get_queue()
+        if any(item[1] == prompt_id for item in q.get("queue_running", [])):
+            self.interrupt()
+        else:
+            self.delete_queued([prompt_id])
+
+    def upload(self, path: Path, name: str = None) -> str:
+        """Copy a local file into ComfyUI's input folder (as `name`), return its name there"""
+        with open(path, "rb") as f:
+            r = self.session.post(
+                f"{self.url}/upload/image",
+                files={"image": (name or Path(path).name, f)},
+                data={"type": "input", "overwrite": "true"},
+                timeout=HTTP_TIMEOUT * 3,
+            )
+        if r.status_code != 200:
+            raise ComfyError(f"ComfyUI upload failed: {r.status_code} {r.text[:200]}")
+        return r.json().get("name", name)
+
+    # === Outputs ===
+
+    @property
+    def is_local(self) -> bool:
+        """True if this ComfyUI runs on this machine (its output folder is ours)"""
+        host = urlparse(self.url).hostname or ""
+        return host in {"localhost", "127.0.0.1", "::1", "0.0.0.0", socket.gethostname(), socket.getfqdn()}
+
+    def download(self, item: dict, dest_dir: Path) -> Path:
+        """Stream one output from /view into dest_dir (bounded memory, atomic)"""
+        dest = Path(dest_dir) / item.get("subfolder", "") / item["filename"]
+        if dest.exists():
+            return dest
+        dest.parent.mkdir(parents=True, exist_ok=True)
+        part = dest.with_name(f".{dest.name}.{uuid.uuid4().hex[:8]}.part")
+        params = {"filename": item["filename"], "subfolder": item.get("subfolder", ""),
+                  "type": item.get("type", "output")}
+        try:
+            with self.session.get(f"{self.url}/view", params=params, stream=True, timeout=HTTP_TIMEOUT) as r:
+                r.raise_for_status()
+                with open(part, "wb") as f:
+                    for chunk in r.iter_content(DOWNLOAD_CHUNK):
+                        f.write(chunk)
+            os.replace(part, dest)
+        finally:
+            part.unlink(missing_ok=True)
+        return dest
+
+    def fetch_outputs(self, history: dict, local_dir: Path = None, download_dir: Path = None) -> list:
+        """Paths of a finished job's output files, downloading any we can't see.
+
+        Files of a ComfyUI on this machine are used in place (no copy);
+        everything else is fetched via /view into
+        ``download_dir/<host>_<port>/``, several at a time.  Outputs that
+        fail to download are left out.
+        """
+        items = output_items(history)
+        paths = [None] * len(items)
+        remote = []
+        for i, item in enumerate(items):
+            if local_dir is not None and self.is_local:
+                local = Path(local_dir) / item.get("subfolder", "") / item["filename"]
+                if local.exists():
+                    paths[i] = local
+                    continue
+            remote.append(i)
+        if remote and download_dir is not None:
+            parsed = urlparse(self.url)
+            dest = Path(download_dir) / f"{parsed.hostname}_{parsed.port or 80}"
+
+            def fetch(i):
+                try:
+                    return self.download(items[i], dest)
+                except (*TRANSPORT_ERRORS, OSError):
+                    return None
+
+            with ThreadPoolExecutor(min(DOWNLOAD_WORKERS, len(remote))) as ex:
+                for i, path in zip(remote, ex.map(fetch, remote)):
+                    paths[i] = path
+        return [p for p in paths if p is not None]
+
+    # === Event routing ===
+
+    def watch(self, prompt_id: str, sink):
+        """Route events for prompt_id to sink, replaying any already received"""
+        with self._lock:
+            self._watchers.setdefault(prompt_id, []).append(sink)
+            for event in self._backlog.pop(prompt_id, []):
+                sink.put(event)
+
+    def unwatch(self, prompt_id: str, sink=None):
+        """Stop routing events for prompt_id (to sink, or to everyone)"""
+        with self._lock:
+            sinks = self._watchers.get(prompt_id, [])
+            if sink in sinks:
+                sinks.remove(sink)
+            if sink is None or not sinks:
+                self._watchers.pop(prompt_id, None)
+
+    def wait(self, prompt_id: str, timeout: float = 600, poll_interval: float = 2.0):
+        """Yield execution events for a prompt until it finishes.
+
+        Intermediate events are ComfyUI messages (``execution_start``,
+        ``executing``, ``progress``, ``executed``...) flattened to
+        ``{"type": ..., **data}``, plus a ``tick`` every poll_interval so
+        callers can refresh elapsed time.  The last event is ``done``
+        (carrying the ``history`` entry), ``error`` or ``timeout``.
+        """
+        tracker = Tracker(self, poll_interval)
+        tracker.add(prompt_id, timeout)
+        yield from tracker.events()
+
+    def lookup(self, prompt_id: str) -> dict:
+        """Final done/error event for a finished prompt, or None if not finished"""
+        entry = self._history_entry(prompt_id)
+        return self._finish(prompt_id, entry=entry) if entry else None
+
+    def queued_ids(self) -> set:
+        """prompt_ids currently running or pending"""
+        q = self.get_queue()
+        return {item[1] for item in q.get("queue_running", []) + q.get("queue_pending", [])}
+
+    def _history_entry(self, prompt_id: str) -> dict:
+        """History entry for prompt_id, or None if not finished (or unreachable)"""
+        try:
+            return self.get_history(prompt_id).get(prompt_id)
+        except TRANSPORT_ERRORS:
+            return None
+
+    def _finish(self, prompt_id: str, event: dict = None, entry: dict = None) -> dict:
+        """Build the final done/error event for a prompt"""
+        final = _event_result(prompt_id, event)
+        if final is not None:
+            return final
+        # The socket reports completion slightly before history is written
+        delay = 0.05
+        while entry is None and delay < 2:
+            entry = self._history_entry(prompt_id)
+            if entry is None:
+                time.sleep(delay)
+                delay *= 2
+        return _entry_result(prompt_id, entry)
+
+    # === Async ===
+
+    def _async_client(self):
+        """Pooled httpx client for the running event loop"""
+        loop = asyncio.get_running_loop()
+        if self._aclient is None or self._aloop is not loop:
+            self._aclient = httpx.AsyncClient(
+                base_url=self.url,
+                timeout=HTTP_TIMEOUT,
+                limits=httpx.Limits(max_connections=32, max_keepalive_connections=8),
+            )
+            self._aloop = loop
+        return self._aclient
+
+    async def _aget(self, path: str, sync, *args, timeout: float = HTTP_TIMEOUT) -> dict:
+        if httpx is None:
+            return await asyncio.to_thread(sync, *args)
+        r = await self._async_client().get(path, timeout=timeout)
+        return r.json()
+
+    async def _apost(self, path: str, payload: dict = None, timeout: float = HTTP_TIMEOUT):
+        if httpx is None:
+            return await asyncio.to_thread(
+                self.session.post, f"{self.url}{path}", json=payload, timeout=timeout,
+            )
+        return await self._async_client().post(path, json=payload, timeout=timeout)
+
+    async def aqueue_prompt(self, workflow: dict) -> str:
+        """Async queue_prompt"""
+        if websocket is not None and self._ws_thread is None:
+            await asyncio.to_thread(self._ensure_socket)
+        resp = (await self._apost("/prompt", {"prompt": workflow, "client_id": self.client_id})).json()
+        if "error" in resp:
+            raise ComfyError(f"ComfyUI error: {resp['error']}")
+        return resp.get("prompt_id")
+
+    async def aget_queue(self, timeout: float = HTTP_TIMEOUT) -> dict:
+        return await self._aget("/queue", self.get_queue, timeout=timeout)
+
+    async def aget_history(self, prompt_id: str) -> dict:
+        return await self._aget(f"/history/{prompt_id}", self.get_history, prompt_id)
+
+    async def aget_system_stats(self, timeout: float = HTTP_TIMEOUT) -> dict:
+        return await self._aget("/system_stats", self.get_system_stats, timeout=timeout)
+
+    async def ainterrupt(self):
+        await self._apost("/interrupt")
+
+    async def aclear_queue(self):
+        await self._apost("/queue", {"clear": True})
+
+    async def adelete_queued(self, prompt_ids: list):
+        await self._apost("/queue", {"delete": list(prompt_ids)})
+
+    async def acancel(self, prompt_id: str):
+        """Stop one job: interrupt it if it is running, otherwise unqueue it"""
+        q = await self.aget_queue()
+        if any(item[1] == prompt_id for item in q.get("queue_running", [])):
+            await self.ainterrupt()
+        else:
+            await self.adelete_queued([prompt_id])
+
+    async def _ahistory_entry(self, prompt_id: str) -> dict:
+        try:
+            return (await self.aget_history(prompt_id)).get(prompt_id)
+        except TRANSPORT_ERRORS:
+            return None
+
+    async def _afinish(self, prompt_id: str, event: dict = None, entry: dict = None) -> dict:
+        """Async _finish"""
+        final = _event_result(prompt_id, event)
+        if final is not None:
+            return final
+        delay = 0.05
+        while entry is None and delay < 2:
+            entry = await self._ahistory_entry(prompt_id)
+            if entry is None:
+                await asyncio.sleep(delay)
+                delay *= 2
+        return _entry_result(prompt_id, entry)
+
+    async def await_events(self, prompt_id: str, timeout: float = 600, poll_interval: float = 2.0):
+        """Async twin of ``wait``: the same events, without holding a thread.
+
+        Socket events are handed to the event loop as they arrive, and the
+        history fallback (socket down, stale or reconnected) uses the async
+        client.
+        """
+        loop = asyncio.get_running_loop()
+        inbox = asyncio.Queue()
+        sink = _LoopSink(loop, inbox)
+        self.watch(prompt_id, sink)
+        deadline = time.time() + timeout
+        last_poll = time.time()
+        seen_connects = self._connects
+        try:
+            while True:
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    yield {"type": "timeout", "prompt_id": prompt_id}
+                    return
+                try:
+                    event = await asyncio.wait_for(inbox.get(), min(poll_interval, remaining))
+                except asyncio.TimeoutError:
+                    event = None
+
+                if event is None:
+                    stale = time.time() - last_poll >= RESYNC_INTERVAL
+                    if not self.connected or stale or seen_connects != self._connects:
+                        last_poll = time.time()
+                        seen_connects = self._connects
+                        entry = await self._ahistory_entry(prompt_id)
+                        if entry:
+                            yield await self._afinish(prompt_id, entry=entry)
+                            return
+                    yield {"type": "tick", "prompt_id": None}
+                    continue
+
+                if is_terminal(event):
+                    yield await self._afinish(prompt_id, event=event)
+                    return
+                yield event
+        finally:
+            self.unwatch(prompt_id, sink)
+
+    # === Websocket ===
+
+    def _ensure_socket(self):
+        """Start the background socket reader once per client"""
+        if websocket is None or self._ws_thread is not None:
+            return
+        with self._lock:
+            if self._ws_thread is not None:
+                return
+            self._ws_thread = threading.Thread(target=self._socket_loop, name="comfy-ws", daemon=True)
+            self._ws_thread.start()
+        # Give the first connect a moment so early events aren't missed
+        self._ws_ready.wait(1.0)
+
+    def _socket_loop(self):
+        """Read events forever, reconnecting with backoff"""
+        ws_url = self.url.replace("http://", "ws://", 1).replace("https://", "wss://", 1)
+        ws_url = f"{ws_url}/ws?clientId={self.client_id}"
+        delay = RECONNECT_DELAY[0]
+        while True:
+            try:
+                ws = websocket.create_connection(ws_url, timeout=HTTP_TIMEOUT)
+                ws.settimeout(None)
+                self.connected = True
+                self._connects += 1
+                self._ws_ready.set()
+                delay = RECONNECT_DELAY[0]
+                while True:
+                    msg = ws.recv()
+                    if isinstance(msg, str):
+                        self._dispatch(json.loads(msg))
+                    elif msg:
+                        self._dispatch_preview(msg)
+            except Exception:
+                pass
+            self.connected = False
+            self._ws_ready.set()
+            time.sleep(delay)
+            delay = min(delay * 2, RECONNECT_DELAY[1])
+
+    def _dispatch(self, msg: dict):
+        """Hand one socket message to whoever is waiting on its prompt"""
+        mtype = msg.get("type")
+        data = msg.get("data") or {}
+        if mtype == "status":
+            self.queue_remaining = data.get("status", {}).get("exec_info", {}).get("queue_remaining")
+            return
+        prompt_id = data.get("prompt_id")
+        if not prompt_id:
+            return
+        event = dict(data, type=mtype)
+        if mtype == "execution_start" or (mtype == "executing" and data.get("node") is not None):
+            self._executing = prompt_id
+        elif is_terminal(event):
+            self._executing = None
+            self._preview_at.pop(prompt_id, None)
+        with self._lock:
+            sinks = self._watchers.get(prompt_id)
+            if sinks:
+                for sink in sinks:
+                    sink.put(event)
+                return
+            self._backlog.setdefault(prompt_id, []).append(event)
+            while len(self._backlog) > BACKLOG_PROMPTS:
+                self._backlog.popitem(last=False)
+
+    def _dispatch_preview(self, data: bytes):
+        """Pass a binary preview frame to the running prompt's watchers, at most every PREVIEW_INTERVAL.
+
+        Previews are never backlogged: a frame nobody is watching is dropped.
+        """
+        parsed = parse_preview(data)
+        if parsed is None:
+            return
+        prompt_id, fmt, image = parsed
+        prompt_id = prompt_id or self._executing
+        now = time.monotonic()
+        with self._lock:
+            sinks = self._watchers.get(prompt_id)
+            if not sinks or now - self._preview_at.get(prompt_id, 0.0) < PREVIEW_INTERVAL:
+                return
+            self._preview_at[prompt_id] = now
+            event = {"type": "preview", "prompt_id": prompt_id, "format": fmt, "image": image}
+            for sink in sinks:
+                sink.put(event)
+
+
+class _LoopSink:
+    """Sink that forwards socket-thread events into an asyncio.Queue"""
+
+    def __init__(self, loop, inbox: asyncio.Queue):
+        self.loop = loop
+        self.inbox = inbox
+
+    def put(self, event: dict):
+        try:
+            self.loop.call_soon_threadsafe(self.inbox.put_nowait, event)
+        except RuntimeError:  # loop already closed
+            pass
+
+
+class Tracker:
+    """Follow several prompts at once on a single event queue.
+
+    ``events()`` yields the same events as ``ComfyClient.wait`` for every
+    tracked prompt and returns once none are pending.  Prompts may be
+    added between yields, which is how windowed submission keeps the
+    ComfyUI queue topped up.
+    """
+
+    def __init__(self, client: ComfyClient, poll_interval: float = 2.0):
+        self.client = client
+        self.poll_interval = poll_interval
+        self.sink = queue.Queue()
+        self.pending = {}  # prompt_id -> deadline
+
+    def add(self, prompt_id: str, timeout: float = 600):
+        """Start tracking a queued prompt"""
+        self.pending[prompt_id] = time.time() + timeout
+        self.client.watch(prompt_id, self.sink)
+
+    def _drop(self, prompt_id: str):
+        self.pending.pop(prompt_id, None)
+        self.client.unwatch(prompt_id, self.sink)
+
+    def events(self):
+        """Yield events until every tracked prompt has finished"""
+        client = self.client
+        last_poll = time.time()
+        seen_connects = client._connects
+        try:
+            while self.pending:
+                now = time.time()
+                for prompt_id, deadline in list(self.pending.items()):
+                    if deadline <= now:
+                        self._drop(prompt_id)
+                        yield {"type": "timeout", "prompt_id": prompt_id}
+                if not self.pending:
+                    continue
+
+                wait = min(self.poll_interval, min(self.pending.values()) - now)
+                try:
+                    event = self.sink.get(timeout=max(wait, 0))
+                except queue.Empty:
+                    event = None
+
+                if event is None:
+                    stale = time.time() - last_poll >= RESYNC_INTERVAL
+                    if not client.connected or stale or seen_connects != client._connects:
+                        last_poll = time.time()
+                        seen_connects = client._connects
+                        for prompt_id in list(self.pending):
+                            entry = client._history_entry(prompt_id)
+                            if entry:
+                                self._drop(prompt_id)
+                                yield client._finish(prompt_id, entry=entry)
+                    yield {"type": "tick", "prompt_id": None}
+                    continue
+
+                prompt_id = event["prompt_id"]
+                if prompt_id not in self.pending:
+                    continue
+                if is_terminal(event):
+                    self._drop(prompt_id)
+                    yield client._finish(prompt_id, event=event)
+                else:
+                    yield event
+        finally:
+            for prompt_id in list(self.pending):
+                self._drop(prompt_id)
+
+
+def output_items(history: dict) -> list:
+    """/view descriptors (filename, subfolder, type) of a job's saved outputs, videos before latents"""
+    items = []
+    for key in ["gifs", "images", "latents"]:
+        for node_output in history.get("outputs", {}).values():
+            for item in node_output.get(key, []):
+                if item.get("type", "output") == "output":
+                    items.append(item)
+    return items
+
+
+def _event_result(prompt_id: str, event: dict) -> dict:
+    """Final error event straight from a terminal socket event, or None"""
+    if event is not None and event["type"] == "execution_error":
+        node = event.get("node_type", "")
+        msg = event.get("exception_message", "Unknown error").strip()
+        return {"type": "error", "prompt_id": prompt_id, "message": f"{node}: {msg}" if node else msg}
+    if event is not None and event["type"] == "execution_interrupted":
+        return {"type": "error", "prompt_id": prompt_id, "message": "Interrupted"}
+    return None
+
+
+def _entry_result(prompt_id: str, entry: dict) -> dict:
+    """Final done/error event from a history entry"""
+    if entry is None:
+        return {"type": "error", "prompt_id": prompt_id, "message": "Finished but no history entry"}
+    status = entry.get("status", {})
+    if status.get("status_str") == "error":
+        return {"type": "error", "prompt_id": prompt_id, "message": history_error(entry)}
+    return {"type": "done", "prompt_id": prompt_id, "history": entry}
+
+
+def is_terminal(event: dict) -> bool:
+    """True if event ends a prompt's execution"""
+    if event["type"] in TERMINAL_EVENTS:
+        return True
+    # Older ComfyUI signals completion with executing(node=None)
+    return event["type"] == "executing" and event.get("node") is None
+
+
+def history_error(entry: dict) -> str:
+    """Best-effort error message from a failed history entry"""
+    msgs = entry.get("status", {}).get("messages", [])
+    for name, data in reversed(msgs):
+        if name == "execution_error":
+            return f"{data.get('node_type', '')}: {data.get('exception_message', '')}".strip(": ")
+    return str(msgs[-1]) if msgs else "Unknown error"
+
+
+def parse_preview(data: bytes) -> tuple:
+    """(prompt_id or None, "jpeg"/"png", image bytes) of a binary socket message, or None.
+
+    ComfyUI frames start with a big-endian event type: 1 is a preview
+    image (then a 4-byte format code), 4 a preview with a JSON metadata
+    block (length-prefixed) that names its prompt.
+    """
+    if len(data) < 8:
+        return None
+    kind, word = struct.unpack(">II", data[:8])
+    if kind == 1:
+        return None, PREVIEW_FORMATS.get(word, "jpeg"), data[8:]
+    if kind == 4:
+        try:
+            meta = json.loads(data[8:8 + word])
+        except ValueError:
+            return None
+        fmt = str(meta.get("image_type", "image/jpeg")).rsplit("/", 1)[-1]
+        return meta.get("prompt_id"), fmt, data[8 + word:]
+    return None
+
+
+def format_event(event: dict) -> str:
+    """One-line human status for a progress event, or '' if not worth showing"""
+    etype = event["type"]
+    if etype == "execution_start":
+        return "🚀 Started"
+    if etype == "execution_cached":
+        cached = len(event.get("nodes", []))
+        return f"♻️ Reusing {cached} cached nodes" if cached else ""
+    if etype == "progress":
+        return f"🎞️ Step {event.get('value', 0)}/{event.get('max', 0)}"
+    if etype == "executing" and event.get("node") is not None:
+        return f"⚙️ Node {event['node']}"
+    return ""
+
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def get_client(url: str) -> ComfyClient:
+    """Shared client for a ComfyUI URL (one socket per process)"""
+    url = url.rstrip("/")
+    with _clients_lock:
+        client = _clients.get(url)
+        if client is None:
+            client = _clients[url] = ComfyClient(url)
+        return client
@@ -0,0 +1,128 @@
+"""
+User configuration
+Reads config.local.yaml (or config.yaml) once, layered over built-in defaults
+"""
+
+import copy
+from functools import lru_cache
+from pathlib import Path
+
+try:
+    import yaml
+except ImportError:  # fall back to defaults only
+    yaml = None
+
+ROOT = Path(__file__).resolve().parent.parent
+
+DEFAULTS = {
+    "paths": {
+        "comfyui": "~/ComfyUI",
+        "models": "~/ComfyUI/models",
+        "outputs": "./outputs",
+        "downloads": "./outputs/downloads",
+        "profile": "./outputs/profile.json",
+        "temp": "/tmp/local-video-gen",
+    },
+    "defaults": {
+        "width": 512,
+        "height": 288,
+        "frames": 16,
+        "fps": 8,
+        "steps": 20,
+        "cfg_scale": 7.5,
+        "seed": -1,
+    },
+    "output": {
+        "format": "mp4",
+        "quality": 23,
+        "transcode_workers": 0,
+    },
+    "backends": {
+        "urls": ["http://127.0.0.1:8188"],
+        "health_interval": 5,
+    },
+    "cache": {
+        "enabled": True,
+        "max_size_gb": 20,
+    },
+    "scheduler": {
+        "depth": 2,
+        "quantum": 60,
+        "max_job_seconds": 900,
+        "oversize": "downscale",
+        "seconds_per_unit": 45,
+    },
+    "drafts": {
+        "count": 8,
+        "size": 256,
+        "steps": 8,
+        "denoise": 0.6,
+    },
+    "interpolation": {
+        "keyframe_fps": 8,
+        "mode": "mci",
+    },
+    "long_video": {
+        "segment_frames": 32,
+        "overlap": 8,
+        "context_length": 16,
+        "context_overlap": 4,
+        "denoise": 0.75,
+    },
+    "spool": {
+        "lease_ttl": 120,
+        "heartbeat": 15,
+    },
+    "api": {
+        "host": "127.0.0.1",
+        "port": 7862,
+        "max_queued": 10000,
+        "max_body_mb": 16,
+    },
+    "metrics": {
+        "enabled": True,
+        "host": "127.0.0.1",
+        "port": 7861,
+    },
+}
+
+
+def _merge(base: dict, override: dict) -> dict:
+    """Recursively layer override on top of base"""
+    for key, value in override.items():
+        if isinstance(value, dict) and isinstance(base.get(key), dict):
+            _merge(base[key], value)
+        else:
+            base[key] = value
+    return base
+
+
+@lru_cache(maxsize=1)
+def load_config() -> dict:
+    """Load user config once per process"""
+    config = copy.deepcopy(DEFAULTS)
+    if yaml is None:
+        return config
+    for name in ("config.local.yaml", "config.yaml"):
+        path = ROOT / name
+        if path.exists():
+            with open(path) as f:
+                _merge(config, yaml.safe_load(f) or {})
+            break
+    return config
+
+
+def get(section: str, key: str, default=None):
+    """Single config value, e.g. get("output", "format")"""
+    return load_config().get(section, {}).get(key, default)
+
+
+def comfyui_output_dir() -> Path:
+    """Where ComfyUI writes its outputs"""
+    return get_path("comfyui") / "output"
+
+
+def get_path(key: str) -> Path:
+    """A `paths:` entry resolved against the repo root"""
+    path = Path(get("paths", key, DEFAULTS["paths"].get(key, "."))).expanduser()
+    return path if path.is_absolute() else ROOT / path
@@ -0,0 +1,108 @@
+"""
+Drafts
+Cheap low-resolution variants of a prompt for exploring seeds, ranked on the
+CPU and promoted by refining the chosen draft's latent at full quality
+"""
+
+import random
+
+from videogen import config
+from videogen.workflows import new_ids, renoise, start_sampler
+
+
+def settings() -> dict:
+    """drafts config with defaults filled in"""
+    return {
+        "count": int(config.get("drafts", "count", 8)),
+        "size": int(config.get("drafts", "size", 256)),
+        "steps": int(config.get("drafts", "steps", 8)),
+        "denoise": float(config.get("drafts", "denoise", 0.6)),
+    }
+
+
+def draft_size(width: int, height: int, size: int = None) -> tuple:
+    """(width, height) scaled so the longer side is at most `size`, in multiples of 16 near the same aspect"""
+    size = size or settings()["size"]
+    width, height = int(width), int(height)
+    scale = min(1.0, size / max(width, height))
+    return max(64, round(width * scale / 16) * 16), max(64, round(height * scale / 16) * 16)
+
+
+def draft_params(params: dict, count: int = None, seeds: list = None) -> list:
+    """Draft versions of a full job's params (prompt, width, height, frames, steps, ...), one per seed.
+
+    Everything besides resolution and step count (prompt, negative, cfg,
+    fps, frames, model) is kept, so a draft ranks seeds for exactly these
+    settings and has every frame the promoted render refines.  Explicit
+    `seeds` are used as given; otherwise `count` random ones are drawn.
+    """
+    cfg = settings()
+    if seeds is None:
+        seeds = [random.randint(0, 2**32 - 1) for _ in range(count or cfg["count"])]
+    width, height = draft_size(params.get("width") or 512, params.get("height") or 512, cfg["size"])
+    steps = min(int(params.get("steps") or cfg["steps"]), cfg["steps"])
+    return [{**params, "width": width, "height": height, "steps": steps, "seed": int(seed)} for seed in seeds]
+
+
+def promote(draft: dict, full: dict) -> dict:
+    """Full-quality params for a chosen draft: its seed, frames, prompt and settings at full size and steps.
+
+    Render them with ``refine`` so the result is the draft itself,
+    upscaled and re-sampled, rather than a new roll of the same seed.
+    """
+    keep = {k: v for k, v in draft.items() if k not in ("width", "height", "steps")}
+    return {**full, **keep}
+
+
+def refine(workflow: dict, latent: str, denoise: float = None) -> dict:
+    """Copy of a full-size workflow that starts from a draft's latent instead of from noise.
+
+    The draft (uploaded to ComfyUI's input folder as `latent`) is
+    upscaled in latent space to the workflow's size, then re-noised only
+    part way (``denoise``) so the sampler adds detail but keeps the
+    draft's composition and motion.
+    """
+    denoise = settings()["denoise"] if denoise is None else denoise
+    _, empty_id = start_sampler(workflow)
+    empty = workflow[empty_id]["inputs"]
+    load_id, upscale_id = new_ids(workflow, 2)
+    nodes = {
+        load_id: {"class_type": "LoadLatent", "inputs": {"latent": latent}},
+        upscale_id: {"class_type": "LatentUpscale",
+                     "inputs": {"samples": [load_id, 0], "upscale_method": "bislerp",
+                                "width": empty["width"], "height": empty["height"], "crop": "disabled"}},
+    }
+    return renoise({**workflow, **nodes}, [upscale_id, 0], denoise)
+
+
+def score(path) -> float:
+    """Cheap CPU proxy for how promising a draft is (higher is better, 0..1).
+
+    Rewards detail (mean edge strength) and visible motion, and penalizes
+    near-static clips and flicker.  Frames are decoded one at a time.
+    """
+    from PIL import Image, ImageChops, ImageFilter, ImageSequence, ImageStat
+
+    detail = motion = 0.0
+    count = 0
+    prev = None
+    with Image.open(path) as img:
+        for frame in ImageSequence.Iterator(img):
+            gray = frame.convert("L")
+            detail += ImageStat.Stat(gray.filter(ImageFilter.FIND_EDGES)).mean[0] / 255
+            if prev is not None:
+                motion += ImageStat.Stat(ImageChops.difference(gray, prev)).mean[0] / 255
+            prev = gray
+            count += 1
+    if not count:
+        return 0.0
+    detail /= count
+    motion /= max(1, count - 1)
+    lively = motion / (motion + 0.01)                   # ~0 when static, ~1 once things move
+    steady = 1.0 if motion < 0.15 else 0.15 / motion    # big jumps between frames are flicker
+    return round(min(1.0, detail * 4) * lively * steady, 4)
+
+
+def top(scored: list, k: int) -> list:
+    """The k best (score, item) pairs, best first"""
+    return sorted(scored, key=lambda pair: pair[0], reverse=True)[:max(0, k)]
@@ -0,0 +1,38 @@
+"""
+Frame interpolation
+Render a clip's keyframes at a low frame rate on the GPU and let ffmpeg's
+motion-compensated minterpolate fill in the rest on the CPU while encoding
+"""
+
+import math
+
+from videogen import config
+
+MODES = ("mci", "blend", "dup")  # minterpolate mi_mode: motion-compensated, crossfade, repeat
+
+
+def keyframe_fps() -> float:
+    """Frame rate the GPU renders at when interpolating (interpolation.keyframe_fps)"""
+    return float(config.get("interpolation", "keyframe_fps", 8))
+
+
+def keyframes(duration: float, rate: float = None) -> int:
+    """Frames to render for `duration` seconds at the keyframe rate (at least 2)"""
+    return max(2, math.ceil(float(duration) * (rate or keyframe_fps())))
+
+
+def minterpolate(fps: float, mode: str = None) -> str:
+    """ffmpeg filter raising a stream to `fps` with synthesized in-between frames"""
+    mode = mode or config.get("interpolation", "mode", "mci")
+    if mode not in MODES:
+        raise ValueError(f"Unknown interpolation mode: {mode}")
+    if mode == "mci":
+        return f"minterpolate=fps={fps:g}:mi_mode=mci:mc_mode=aobmc:me_mode=bidir:vsbmc=1"
+    return f"minterpolate=fps={fps:g}:mi_mode={mode}"
+
+
+def gpu_seconds_saved(model, duration: float, fps: float, width: int, height: int, steps: int,
+                      rate: float = None) -> float:
+    """Estimated GPU time saved by rendering keyframes instead of every frame at `fps`"""
+    full = model.estimate(max(1, math.ceil(float(duration) * fps)), width, height, steps)
+    return max(0.0, full - model.estimate(keyframes(duration, rate), width, height, steps))
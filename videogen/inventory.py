@@ -0,0 +1,204 @@
+"""
+Install inventory
+Node classes and their choices from ComfyUI's /object_info plus the model
+files on disk, cached and used to reject broken workflows before queuing
+"""
+
+import os
+import threading
+import time
+from pathlib import Path
+
+from videogen import config
+from videogen.comfy import TRANSPORT_ERRORS, get_client
+
+OBJECT_INFO_TTL = 300   # seconds before /object_info is fetched again
+RETRY_DELAY = 30        # seconds before retrying after a failed fetch
+MODEL_EXTS = {".safetensors", ".ckpt", ".pt", ".pth", ".bin", ".gguf", ".sft"}
+
+# Loader input -> model folders it may read from (relative to paths.models)
+MODEL_INPUTS = {
+    "ckpt_name": ("checkpoints",),
+    "unet_name": ("unet", "diffusion_models"),
+    "vae_name": ("vae",),
+    "clip_name": ("clip", "text_encoders"),
+    "clip_name1": ("clip", "text_encoders"),
+    "clip_name2": ("clip", "text_encoders"),
+    "lora_name": ("loras",),
+    "control_net_name": ("controlnet",),
+    "model_name": ("animatediff_models", "upscale_models"),
+}
+
+# Inputs naming files we upload just before queuing (newer than any cached /object_info)
+UPLOADED_INPUTS = {("LoadLatent", "latent")}
+
+
+class Inventory:
+    """What one ComfyUI install can run.
+
+    Node specs, including the model files each loader can see, come from
+    ``/object_info`` (refetched after OBJECT_INFO_TTL).  While that is
+    unavailable, a local install's ``models_dir`` is walked instead,
+    listing only directories whose mtime changed.  ``validate`` works
+    purely on the cached data, so it costs microseconds per workflow;
+    ``refresh_soon`` keeps that data current without making callers wait.
+    """
+
+    def __init__(self, url: str, models_dir: Path = None):
+        self.client = get_client(url)
+        self.models_dir = Path(models_dir) if models_dir else None
+        self.nodes = None        # class_type -> {input: frozenset of choices or None}
+        self.next_fetch = 0.0
+        self._dirs = {}          # directory -> (mtime_ns, model files under its folder root, subdirs)
+        self._lock = threading.Lock()
+        self._refreshing = False
+
+    # === Refresh ===
+
+    def refresh_soon(self):
+        """Refresh on a background thread when due (one at a time); returns at once"""
+        with self._lock:
+            if self._refreshing or (time.time() < self.next_fetch and self.nodes is not None):
+                return
+            self._refreshing = True
+        threading.Thread(target=self._background_refresh, name="inventory", daemon=True).start()
+
+    def _background_refresh(self):
+        try:
+            self.refresh()
+        finally:
+            with self._lock:
+                self._refreshing = False
+
+    def refresh(self, force: bool = False):
+        """Bring both halves of the inventory up to date (cheap when nothing changed)"""
+        if force or time.time() >= self.next_fetch:
+            try:
+                nodes = parse_object_info(self.client.get_object_info())
+            except TRANSPORT_ERRORS:
+                nodes = None  # keep the last good copy
+            with self._lock:
+                if nodes is not None:
+                    self.nodes = nodes
+                self.next_fetch = time.time() + (OBJECT_INFO_TTL if nodes is not None else RETRY_DELAY)
+        if self.nodes is None and self.models_dir is not None and self.client.is_local:
+            self._scan_models()  # only needed while ComfyUI can't tell us itself
+
+    def _scan_models(self):
+        seen = {}
+        for folder in {f for folders in MODEL_INPUTS.values() for f in folders}:
+            root = self.models_dir / folder
+            stack = [root]
+            while stack:
+                directory = stack.pop()
+                try:
+                    mtime_ns = directory.stat().st_mtime_ns
+                except OSError:
+                    continue
+                cached = self._dirs.get(directory)
+                if cached and cached[0] == mtime_ns:
+                    files, subdirs = cached[1], cached[2]
+                else:
+                    files, subdirs = set(), []
+                    try:
+                        with os.scandir(directory) as it:
+                            for entry in it:
+                                if entry.is_dir():
+                                    subdirs.append(Path(entry.path))
+                                elif Path(entry.name).suffix.lower() in MODEL_EXTS:
+                                    files.add(Path(entry.path).relative_to(root).as_posix())
+                    except OSError:
+                        continue
+                seen[directory] = (mtime_ns, files, subdirs)
+                stack.extend(subdirs)
+        with self._lock:
+            self._dirs = seen
+
+    def model_files(self, folder: str) -> set:
+        """Model files under models_dir/folder (names as ComfyUI lists them)"""
+        root = self.models_dir / folder
+        with self._lock:
+            dirs = list(self._dirs.items())
+        return {name for directory, (_, files, _) in dirs if directory.is_relative_to(root) for name in files}
+
+    # === Validation ===
+
+    def validate(self, workflow: dict) -> list:
+        """Problems that would make ComfyUI reject or fail this workflow (empty if none found)"""
+        with self._lock:
+            nodes, dirs = self.nodes, self._dirs
+        problems = []
+        files = None
+        for node_id, node in workflow.items():
+            class_type = node.get("class_type")
+            label = f"node {node_id} ({class_type})"
+            if nodes is not None:
+                spec = nodes.get(class_type)
+                if spec is None:
+                    problems.append(f"{label}: node type not installed")
+                    continue
+                for key, value in node.get("inputs", {}).items():
+                    choices = spec.get(key)
+                    if (class_type, key) in UPLOADED_INPUTS:
+                        continue
+                    if choices is not None and isinstance(value, (str, int, float)) and value not in choices:
+                        kind = "model file" if key in MODEL_INPUTS else "value"
+                        problems.append(f"{label}: {kind} {value!r} for {key} not available")
+            elif dirs:
+                # ComfyUI unreachable: fall back to the files we can see
+                for key, value in node.get("inputs", {}).items():
+                    folders = MODEL_INPUTS.get(key)
+                    if not folders or not isinstance(value, str):
+                        continue
+                    if files is None:
+                        files = {f: self.model_files(f) for fs in MODEL_INPUTS.values() for f in fs}
+                    if not any(value.replace("\\", "/") in files[f] for f in folders):
+                        problems.append(f"{label}: model file {value!r} not found under {', '.join(folders)}")
+        return problems
+
+
+def parse_object_info(info: dict) -> dict:
+    """class_type -> {input name: frozenset of allowed values, or None if free-form}"""
+    nodes = {}
+    for class_type, spec in info.items():
+        inputs = {}
+        for group in ("required", "optional"):
+            for name, definition in (spec.get("input", {}).get(group) or {}).items():
+                inputs[name] = _choices(definition)
+        nodes[class_type] = inputs
+    return nodes
+
+
+def _choices(definition) -> frozenset:
+    """Allowed values of a combo input (old list form or COMBO + options), else None"""
+    if not isinstance(definition, (list, tuple)) or not definition:
+        return None
+    kind = definition[0]
+    if isinstance(kind, list):
+        return frozenset(kind)
+    if kind == "COMBO" and len(definition) > 1 and isinstance(definition[1], dict):
+        return frozenset(definition[1].get("options", ()))
+    return None
+
+
+_inventories = {}
+_inventories_lock = threading.Lock()
+
+
+def get_inventory(url: str, wait: bool = False) -> Inventory:
+    """Shared inventory for a ComfyUI backend.
+
+    Returns the cached snapshot straight away and refreshes it in the
+    background when due, so request paths never wait on /object_info;
+    pass ``wait`` to refresh in the caller first (startup checks, CLIs).
+    """
+    url = url.rstrip("/")
+    with _inventories_lock:
+        inventory = _inventories.get(url)
+        if inventory is None:
+            inventory = _inventories[url] = Inventory(url, config.get_path("models"))
+    if wait:
+        inventory.refresh()
+    else:
+        inventory.refresh_soon()
+    return inventory
@@ -0,0 +1,174 @@
+"""
+Job store
+SQLite-backed queue of API jobs, so thousands of submissions are accepted
+instantly and survive restarts while ComfyUI works through them
+"""
+
+import json
+import sqlite3
+import threading
+import time
+import uuid
+from pathlib import Path
+
+from videogen import config
+
+QUEUED, RUNNING, DONE, FAILED, CANCELLED = "queued", "running", "done", "failed", "cancelled"
+FINISHED = (DONE, FAILED, CANCELLED)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    id TEXT UNIQUE NOT NULL,
+    state TEXT NOT NULL,
+    stage TEXT,
+    created REAL NOT NULL,
+    started REAL,
+    finished REAL,
+    params TEXT NOT NULL,
+    workflow TEXT NOT NULL,
+    workflow_name TEXT,
+    estimate REAL,
+    prompt_id TEXT,
+    backend TEXT,
+    outputs TEXT,
+    error TEXT
+);
+CREATE INDEX IF NOT EXISTS jobs_state ON jobs (state, seq);
+"""
+
+COLUMNS = ("id", "state", "stage", "created", "started", "finished", "params", "workflow",
+           "workflow_name", "estimate", "prompt_id", "backend", "outputs", "error")
+
+
+def _row(row: sqlite3.Row) -> dict:
+    job = dict(row)
+    for key in ("params", "workflow", "outputs"):
+        if job.get(key) is not None:
+            job[key] = json.loads(job[key])
+    return job
+
+
+class JobStore:
+    """Jobs with their workflow, state and results, oldest first.
+
+    ``add`` takes many jobs in one transaction; ``claim`` hands the oldest
+    queued job to exactly one dispatcher.  Every state change is written
+    through, so a restarted service picks up where it stopped.
+    """
+
+    def __init__(self, db_path: Path):
+        db_path = Path(db_path)
+        db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(db_path, check_same_thread=False, timeout=10)
+        self._db.row_factory = sqlite3.Row
+        self._lock = threading.Lock()
+        with self._lock, self._db:
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.executescript(SCHEMA)
+
+    def add(self, jobs: list) -> list:
+        """Queue jobs given as (params, workflow, workflow name, estimated seconds); returns their ids"""
+        now = time.time()
+        rows = [(uuid.uuid4().hex, QUEUED, "queued", now, json.dumps(params), json.dumps(workflow), name, estimate)
+                for params, workflow, name, estimate in jobs]
+        with self._lock, self._db:
+            self._db.executemany(
+                "INSERT INTO jobs (id, state, stage, created, params, workflow, workflow_name, estimate) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows)
+        return [row[0] for row in rows]
+
+    def get(self, job_id: str) -> dict:
+        """A job by id, or None"""
+        with self._lock:
+            row = self._db.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return _row(row) if row else None
+
+    def list(self, state: str = None, limit: int = 50) -> list:
+        """Most recent jobs (in one state, if given), without their workflows"""
+        columns = ", ".join(c for c in COLUMNS if c != "workflow")
+        where, args = ("WHERE state = ?", (state,)) if state else ("", ())
+        with self._lock:
+            rows = self._db.execute(f"SELECT {columns} FROM jobs {where} ORDER BY seq DESC LIMIT ?",
+                                    (*args, limit)).fetchall()
+        return [_row(row) for row in rows]
+
+    def claim(self) -> dict:
+        """Mark the oldest queued job running and return it, or None if none is queued"""
+        with self._lock, self._db:
+            row = self._db.execute("SELECT * FROM jobs WHERE state = ? ORDER BY seq LIMIT 1", (QUEUED,)).fetchone()
+            if row is None:
+                return None
+            now = time.time()
+            self._db.execute("UPDATE jobs SET state = ?, stage = ?, started = ? WHERE seq = ?",
+                             (RUNNING, "submitting", now, row["seq"]))
+        job = _row(row)
+        job.update(state=RUNNING, stage="submitting", started=now)
+        return job
+
+    def update(self, job_id: str, **fields):
+        """Set columns of a job (outputs are stored as JSON)"""
+        if "outputs" in fields and fields["outputs"] is not None:
+            fields["outputs"] = json.dumps([str(p) for p in fields["outputs"]])
+        if fields.get("state") in FINISHED:
+            fields.setdefault("finished", time.time())
+        assignments = ", ".join(f"{key} = ?" for key in fields)
+        with self._lock, self._db:
+            self._db.execute(f"UPDATE jobs SET {assignments} WHERE id = ?", (*fields.values(), job_id))
+
+    def cancel_queued(self, job_id: str) -> bool:
+        """Cancel a job that hasn't been handed to ComfyUI yet; False if it already was"""
+        with self._lock, self._db:
+            cur = self._db.execute("UPDATE jobs SET state = ?, stage = ?, finished = ? WHERE id = ? AND state = ?",
+                                   (CANCELLED, CANCELLED, time.time(), job_id, QUEUED))
+        return cur.rowcount > 0
+
+    def requeue(self, job_id: str):
+        """Put a job back at its place in the queue"""
+        with self._lock, self._db:
+            self._db.execute("UPDATE jobs SET state = ?, stage = ?, started = NULL, prompt_id = NULL, "
+                             "backend = NULL WHERE id = ?", (QUEUED, "queued", job_id))
+
+    def running(self) -> list:
+        """Jobs marked running (after a restart: those to re-attach or requeue)"""
+        with self._lock:
+            rows = self._db.execute("SELECT * FROM jobs WHERE state = ? ORDER BY seq", (RUNNING,)).fetchall()
+        return [_row(row) for row in rows]
+
+    def position(self, job_id: str) -> tuple:
+        """(queued jobs ahead of this one, their estimated GPU seconds)"""
+        with self._lock:
+            ahead, seconds = self._db.execute(
+                "SELECT COUNT(*), SUM(estimate) FROM jobs WHERE state = ? AND seq < "
+                "(SELECT seq FROM jobs WHERE id = ?)", (QUEUED, job_id)).fetchone()
+        return ahead, seconds or 0.0
+
+    def queued(self) -> int:
+        """How many jobs are waiting"""
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM jobs WHERE state = ?", (QUEUED,)).fetchone()[0]
+
+    def stats(self) -> dict:
+        """{state: count} plus the estimated GPU seconds still queued"""
+        with self._lock:
+            rows = self._db.execute("SELECT state, COUNT(*), SUM(estimate) FROM jobs GROUP BY state").fetchall()
+        counts = {state: 0 for state in (QUEUED, RUNNING, DONE, FAILED, CANCELLED)}
+        queued_seconds = 0.0
+        for state, count, seconds in rows:
+            counts[state] = count
+            if state == QUEUED:
+                queued_seconds = seconds or 0.0
+        return {**counts, "queued_seconds": queued_seconds}
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_store() -> JobStore:
+    """Process-wide job store next to the output index"""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = JobStore(config.get_path("outputs") / "jobs.db")
+        return _store
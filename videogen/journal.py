@@ -0,0 +1,89 @@
+"""
+Batch journal
+Append-only JSONL of job state transitions, written and fsynced off the submission thread
+"""
+
+import json
+import os
+import threading
+import time
+from pathlib import Path
+
+# Job states, in the order a job normally moves through them
+QUEUED, RUNNING, DONE, FAILED = "queued", "running", "done", "failed"
+
+
+class Journal:
+    """Buffered append-only job log.
+
+    ``record`` only appends to an in-memory buffer; a background thread
+    writes and fsyncs whatever has accumulated every ``sync_interval``
+    seconds (or sooner once ``batch_size`` records are waiting).  A crash
+    loses at most that window, and replay tolerates a torn last line.
+    """
+
+    def __init__(self, path: Path, sync_interval: float = 1.0, batch_size: int = 256):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.sync_interval = sync_interval
+        self.batch_size = batch_size
+        self._file = open(self.path, "a", encoding="utf-8")
+        self._buffer = []
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._closed = False
+        self._writer = threading.Thread(target=self._write_loop, name="journal", daemon=True)
+        self._writer.start()
+
+    def record(self, index: int, state: str, **fields):
+        """Note a state transition for job `index`"""
+        line = json.dumps({"i": index, "state": state, "t": round(time.time(), 3), **fields})
+        with self._lock:
+            self._buffer.append(line)
+            if len(self._buffer) >= self.batch_size:
+                self._wake.set()
+
+    def flush(self):
+        """Write and fsync everything recorded so far"""
+        with self._lock:
+            lines, self._buffer = self._buffer, []
+        if not lines:
+            return
+        self._file.write("\n".join(lines) + "\n")
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def _write_loop(self):
+        while not self._closed:
+            self._wake.wait(self.sync_interval)
+            self._wake.clear()
+            self.flush()
+
+    def close(self):
+        """Flush remaining records and stop the writer"""
+        self._closed = True
+        self._wake.set()
+        self._writer.join()
+        self.flush()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def replay(path: Path) -> dict:
+    """Latest state per job index, with fields merged across its records"""
+    jobs = {}
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                rec = json.loads(line)
+            except ValueError:
+                continue  # torn write from a crash
+            if rec["state"] == QUEUED:
+                jobs[rec["i"]] = {}  # a fresh attempt supersedes earlier ones
+            jobs.setdefault(rec["i"], {}).update(rec)
+    return jobs
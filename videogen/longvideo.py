@@ -0,0 +1,226 @@
+"""
+Long video
+Splits a clip longer than one job into overlapping segments, each rendered
+as its own ComfyUI job starting from the previous one's last latent frames,
+and joins them with crossfades or a stream copy
+"""
+
+import os
+import subprocess
+import uuid
+from pathlib import Path
+
+from videogen import config
+from videogen.transcode import FORMATS, encode_frames, frame_rate, output_formats
+from videogen.workflows import keep_latent, new_ids, renoise, start_sampler
+
+STREAM_COPY_FORMATS = ("mp4", "webm")  # containers ffmpeg's concat demuxer joins cleanly
+
+
+def settings() -> dict:
+    """long_video config with defaults filled in"""
+    return {
+        "segment_frames": int(config.get("long_video", "segment_frames", 32)),
+        "overlap": int(config.get("long_video", "overlap", 8)),
+        "context_length": int(config.get("long_video", "context_length", 16)),
+        "context_overlap": int(config.get("long_video", "context_overlap", 4)),
+        "denoise": float(config.get("long_video", "denoise", 0.75)),
+    }
+
+
+def plan_segments(total_frames: int, segment_frames: int = None, overlap: int = None) -> list:
+    """[(first frame, frame count)] covering total_frames in overlapping segments.
+
+    Segments advance by ``segment_frames - overlap``; the last one is
+    pulled back to full length rather than left as a short stub, so it
+    overlaps its neighbour by more.
+    """
+    cfg = settings()
+    segment = max(1, int(segment_frames or cfg["segment_frames"]))
+    overlap = cfg["overlap"] if overlap is None else int(overlap)
+    overlap = max(0, min(overlap, segment - 1))
+    total = max(1, int(total_frames))
+    if total <= segment:
+        return [(0, total)]
+    plan, start = [], 0
+    while start + segment < total:
+        plan.append((start, segment))
+        start += segment - overlap
+    plan.append((total - segment, segment))
+    return plan
+
+
+def segment_overrides(plan: list, seed: int) -> list:
+    """Per-segment template values: frame count, seed and AnimateDiff context window.
+
+    Segments share the seed; what carries the clip on is the latent each
+    one continues from (see ``continue_from``).
+    """
+    cfg = settings()
+    overrides = []
+    for _, frames in plan:
+        context = min(cfg["context_length"], frames)
+        overrides.append({
+            "frames": frames,
+            "seed": int(seed) % 2**32,
+            "context_length": context,
+            "context_overlap": min(cfg["context_overlap"], max(0, context - 1)),
+        })
+    return overrides
+
+
+def can_continue(workflow: dict) -> bool:
+    """True if a workflow's frames are an EmptyLatentImage batch a segment can be continued from"""
+    return start_sampler(workflow) is not None
+
+
+def segment_workflow(workflow: dict, plan: list, k: int, latent: str = None, denoise: float = None) -> dict:
+    """Workflow for segment k of a plan: continued from the previous segment's latent
+    (uploaded to ComfyUI's input folder as `latent`), and saving its own for the next.
+    """
+    if k + 1 < len(plan):
+        workflow = keep_latent(workflow, "segment")
+    if k > 0:
+        (before, frames_before), (start, _) = plan[k - 1], plan[k]
+        workflow = continue_from(workflow, latent, start - before, frames_before, denoise)
+    return workflow
+
+
+def continue_from(workflow: dict, latent: str, offset: int, frames_before: int, denoise: float = None) -> dict:
+    """Start a segment from the end of the previous one instead of from noise.
+
+    The previous segment's latent frames from `offset` on (the ones this
+    segment overlaps) open the new one and its last frame is held for the
+    rest; the sampler re-noises that only part way (``denoise``), so the
+    segment picks up the look and motion where the last one left off.
+    """
+    denoise = settings()["denoise"] if denoise is None else denoise
+    _, empty_id = start_sampler(workflow)
+    frames = int(workflow[empty_id]["inputs"]["batch_size"])
+    overlap = max(0, min(frames, frames_before - offset))
+    load_id, tail_id, last_id, hold_id, batch_id = new_ids(workflow, 5)
+    nodes = {load_id: {"class_type": "LoadLatent", "inputs": {"latent": latent}}}
+    if overlap:
+        nodes[tail_id] = {"class_type": "LatentFromBatch",
+                          "inputs": {"samples": [load_id, 0], "batch_index": offset, "length": overlap}}
+        start = [tail_id, 0]
+    if overlap < frames:
+        nodes[last_id] = {"class_type": "LatentFromBatch",
+                          "inputs": {"samples": [load_id, 0], "batch_index": frames_before - 1, "length": 1}}
+        nodes[hold_id] = {"class_type": "RepeatLatentBatch",
+                          "inputs": {"samples": [last_id, 0], "amount": frames - overlap}}
+        start = [hold_id, 0]
+        if overlap:
+            nodes[batch_id] = {"class_type": "LatentBatch",
+                               "inputs": {"samples1": [tail_id, 0], "samples2": [hold_id, 0]}}
+            start = [batch_id, 0]
+    return renoise({**workflow, **nodes}, start, denoise)
+
+
+def hard_cuts(plan: list) -> bool:
+    """True if no segment overlaps the next (outputs can be concatenated as-is)"""
+    return all(start + frames == plan[i + 1][0] for i, (start, frames) in enumerate(plan[:-1]))
+
+
+def _blended(files: list, plan: list, size: tuple):
+    """Yield the stitched clip's frames as RGB images, one at a time.
+
+    Only the previous segment's overlapping tail is held in memory; each
+    of its frames is faded into the matching frame of the next segment.
+    """
+    from PIL import Image, ImageSequence
+
+    tail = []
+    for k, (path, (start, frames)) in enumerate(zip(files, plan)):
+        handover = plan[k + 1][0] - start if k + 1 < len(plan) else frames
+        next_tail = []
+        with Image.open(path) as img:
+            for j, frame in enumerate(ImageSequence.Iterator(img)):
+                if j >= frames:
+                    break
+                frame = frame.convert("RGB")
+                if frame.size != size:
+                    frame = frame.resize(size)
+                if j < len(tail):
+                    frame = Image.blend(tail[j], frame, (j + 1) / (len(tail) + 1))
+                if j >= handover:
+                    next_tail.append(frame)
+                else:
+                    yield frame
+        tail = next_tail
+    yield from tail
+
+
+def stitch(files: list, plan: list, dest: Path, fmt: str = None, quality: int = None,
+           fps: float = None) -> Path:
+    """Crossfade segment outputs (animated WebPs, in plan order) into one video.
+
+    Frames stream straight into ffmpeg, so memory stays at one overlap's
+    worth of frames however long the clip.  Without ffmpeg an animated
+    WebP is written instead, which does hold every frame.  Returns the
+    written path, or None if nothing could be written.
+    """
+    from PIL import Image
+
+    fmt = (fmt or output_formats()[0]).lower()
+    dest = Path(dest).with_suffix(FORMATS[fmt][0])
+    with Image.open(files[0]) as first:
+        size = first.size
+        rate = fps or frame_rate(first)
+
+    written = encode_frames((frame.tobytes() for frame in _blended(files, plan, size)),
+                            size, rate, dest, fmt, quality)
+    if written is not None:
+        return written
+
+    frames = list(_blended(files, plan, size))
+    if not frames:
+        return None
+    dest = dest.with_suffix(".webp")
+    part = dest.with_name(f".{dest.name}.{uuid.uuid4().hex[:8]}.part")
+    frames[0].save(part, format="WEBP", save_all=True, append_images=frames[1:],
+                   duration=round(1000 / rate), loop=0, quality=90)
+    os.replace(part, dest)
+    return dest
+
+
+def concat_copy(parts: list, dest: Path) -> Path:
+    """Join already-encoded segments back to back without re-encoding (None on failure)"""
+    dest = Path(dest)
+    fmt = next((f for f, (ext, _, _) in FORMATS.items() if ext == dest.suffix.lower()), None)
+    if fmt not in STREAM_COPY_FORMATS:
+        return None
+    tag = uuid.uuid4().hex[:8]
+    listing = dest.with_name(f".{dest.name}.{tag}.txt")
+    part = dest.with_name(f".{dest.name}.{tag}.part")
+    quote = lambda p: Path(p).resolve().as_posix().replace("'", "'\\''")
+    listing.write_text("".join(f"file '{quote(p)}'\n" for p in parts))
+    cmd = [
+        "ffmpeg", "-y", "-loglevel", "error",
+        "-f", "concat", "-safe", "0", "-i", str(listing),
+        "-c", "copy", "-f", FORMATS[fmt][1], str(part),
+    ]
+    try:
+        result = subprocess.run(cmd, capture_output=True)
+    except FileNotFoundError:
+        return None
+    finally:
+        listing.unlink(missing_ok=True)
+    if result.returncode != 0 or not part.exists():
+        part.unlink(missing_ok=True)
+        return None
+    os.replace(part, dest)
+    return dest
+
+
+def join(files: list, plan: list, dest: Path, converted: list = None, fmt: str = None,
+         quality: int = None, fps: float = None) -> Path:
+    """Stream-copy concat when segments meet without overlap and are already
+    encoded (``converted``, in plan order), else a crossfaded re-encode"""
+    fmt = (fmt or output_formats()[0]).lower()
+    dest = Path(dest).with_suffix(FORMATS[fmt][0])
+    if converted and hard_cuts(plan) and all(converted) and all(Path(p).suffix == dest.suffix for p in converted):
+        copied = concat_copy(converted, dest)
+        if copied is not None:
+            return copied
+    return stitch(files, plan, dest, fmt, quality, fps)
@@ -0,0 +1,221 @@
+"""
+Pipeline metrics
+Per-stage latency histograms (by workflow and resolution), served as
+Prometheus text and summarised at the end of batch runs
+"""
+
+import bisect
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from videogen.workflows import LOADERS, SAMPLERS, role_values
+
+# Histogram upper bounds in seconds (+Inf is implicit)
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+
+# Stages in pipeline order; node stages come from ComfyUI execution events
+STAGES = (
+    "submit", "queue_wait", "model_load", "text_encode", "sampling", "vae_decode",
+    "save", "other_nodes", "execution", "fetch", "transcode",
+)
+NODE_STAGES = {
+    **{class_type: "model_load" for class_type in LOADERS},
+    **{class_type: "sampling" for class_type in SAMPLERS},
+    "CLIPTextEncode": "text_encode",
+    "VAEDecode": "vae_decode",
+    "VAEDecodeTiled": "vae_decode",
+    "SaveAnimatedWEBP": "save",
+    "VHS_VideoCombine": "save",
+    "SaveImage": "save",
+}
+
+
+def resolution_bucket(width, height) -> str:
+    """Coarse resolution label from the short side (e.g. 512x288 -> "360p")"""
+    try:
+        short = min(int(width), int(height))
+    except (TypeError, ValueError):
+        return "unknown"
+    for limit in (360, 540, 720, 1080):
+        if short <= limit:
+            return f"{limit}p"
+    return ">1080p"
+
+
+class Histogram:
+    """Cumulative-bucket histogram, Prometheus style"""
+
+    __slots__ = ("counts", "sum", "count")
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(BUCKETS, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q: float) -> float:
+        """Estimate by linear interpolation inside the matching bucket"""
+        if not self.count:
+            return 0.0
+        rank, seen = q * self.count, 0
+        for i, n in enumerate(self.counts):
+            if n and seen + n >= rank:
+                lower = BUCKETS[i - 1] if i else 0.0
+                upper = BUCKETS[i] if i < len(BUCKETS) else lower * 2 or 1.0
+                return lower + (upper - lower) * (rank - seen) / n
+            seen += n
+        return BUCKETS[-1]
+
+
+class Registry:
+    """Stage histograms keyed by (stage, workflow, resolution) plus job counters"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.stages = {}
+        self.jobs = {}
+
+    def observe(self, stage: str, workflow: str, res: str, seconds: float):
+        with self._lock:
+            hist = self.stages.get((stage, workflow, res))
+            if hist is None:
+                hist = self.stages[(stage, workflow, res)] = Histogram()
+            hist.observe(seconds)
+
+    def count_job(self, workflow: str, res: str, status: str):
+        with self._lock:
+            key = (workflow, res, status)
+            self.jobs[key] = self.jobs.get(key, 0) + 1
+
+    def render(self) -> str:
+        """Prometheus text exposition format"""
+        lines = [
+            "# HELP videogen_stage_seconds Time spent per pipeline stage",
+            "# TYPE videogen_stage_seconds histogram",
+        ]
+        with self._lock:
+            stages = sorted(self.stages.items())
+            jobs = sorted(self.jobs.items())
+            for (stage, workflow, res), hist in stages:
+                labels = f'stage="{stage}",workflow="{_escape(workflow)}",res="{res}"'
+                total = 0
+                for bound, n in zip(BUCKETS + ("+Inf",), hist.counts):
+                    total += n
+                    lines.append(f'videogen_stage_seconds_bucket{{{labels},le="{bound}"}} {total}')
+                lines.append(f"videogen_stage_seconds_sum{{{labels}}} {hist.sum:.6f}")
+                lines.append(f"videogen_stage_seconds_count{{{labels}}} {hist.count}")
+        lines += ["# HELP videogen_jobs_total Finished jobs by outcome", "# TYPE videogen_jobs_total counter"]
+        for (workflow, res, status), n in jobs:
+            lines.append(f'videogen_jobs_total{{workflow="{_escape(workflow)}",res="{res}",status="{status}"}} {n}')
+        return "\n".join(lines) + "\n"
+
+    def summary(self) -> str:
+        """Human-readable per-stage table across all workflows"""
+        merged = {}
+        with self._lock:
+            for (stage, _, _), hist in self.stages.items():
+                into = merged.setdefault(stage, Histogram())
+                into.counts = [a + b for a, b in zip(into.counts, hist.counts)]
+                into.sum += hist.sum
+                into.count += hist.count
+        if not merged:
+            return ""
+        total = sum(h.sum for h in merged.values()) or 1.0
+        lines = [f"   {'stage':<12} {'jobs':>5} {'mean':>8} {'p50':>8} {'p95':>8} {'share':>6}"]
+        for stage in STAGES:
+            h = merged.get(stage)
+            if h is None:
+                continue
+            lines.append(
+                f"   {stage:<12} {h.count:>5} {h.sum / h.count:>7.2f}s {h.quantile(0.5):>7.2f}s "
+                f"{h.quantile(0.95):>7.2f}s {h.sum / total:>6.0%}"
+            )
+        return "\n".join(lines)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+REGISTRY = Registry()
+
+
+class JobTimer:
+    """Stage clock for one job.
+
+    Call ``stage`` at each boundary you own (submit, fetch, transcode) and
+    feed ComfyUI events to ``observe`` for the node stages in between;
+    ``finish`` records everything in one go.  A job whose events never
+    arrived (socket down) reports its ComfyUI time as ``execution``.
+    """
+
+    def __init__(self, workflow: dict, workflow_name: str = None, registry: Registry = None):
+        values = role_values(workflow)
+        self.workflow = workflow
+        self.workflow_name = workflow_name or "unknown"
+        self.res = resolution_bucket(values.get("width"), values.get("height"))
+        self.registry = registry or REGISTRY
+        self.durations = {}
+        self.current = "submit"
+        self.started = self.mark = time.monotonic()
+        self.done = False
+
+    def stage(self, name: str):
+        """Close the running stage and start `name`"""
+        now = time.monotonic()
+        current = self.current
+        if current == "queue_wait" and name in ("fetch", None):
+            current = "execution"  # no execution events seen
+        self.durations[current] = self.durations.get(current, 0.0) + now - self.mark
+        self.current, self.mark = name, now
+
+    def observe(self, event: dict):
+        """Advance on a ComfyUI execution event"""
+        etype = event["type"]
+        if etype == "execution_start" and self.current == "queue_wait":
+            self.stage("other_nodes")
+        elif etype == "executing" and event.get("node") is not None:
+            node = self.workflow.get(str(event["node"]), {})
+            self.stage(NODE_STAGES.get(node.get("class_type"), "other_nodes"))
+        elif etype in ("execution_success", "executing", "done") and self.current != "queue_wait":
+            self.stage("fetch")
+
+    def finish(self, status: str = "done"):
+        """Record the job's stage times (once)"""
+        if self.done:
+            return
+        self.done = True
+        self.stage(None)
+        for stage, seconds in self.durations.items():
+            self.registry.observe(stage, self.workflow_name, self.res, seconds)
+        self.registry.count_job(self.workflow_name, self.res, status)
+
+
+def serve(port: int, host: str = "0.0.0.0", registry: Registry = None) -> ThreadingHTTPServer:
+    """Serve GET /metrics in a background thread"""
+    registry = registry or REGISTRY
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = registry.render().encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="metrics", daemon=True).start()
+    return server
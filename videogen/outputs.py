@@ -0,0 +1,225 @@
+"""
+Output index
+SQLite catalogue of generated files, recorded as jobs finish and reconciled
+with the output directory by an incremental scan
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+from videogen import config
+from videogen.workflows import role_values
+
+MEDIA = {".mp4", ".webm", ".gif", ".webp"}
+SETTLE = 2.0  # seconds; directories modified more recently are rescanned next time
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS outputs (
+    path TEXT PRIMARY KEY,
+    dir TEXT NOT NULL,
+    name TEXT NOT NULL,
+    created REAL NOT NULL,
+    size INTEGER NOT NULL,
+    duration REAL,
+    prompt TEXT,
+    negative TEXT,
+    seed INTEGER,
+    workflow TEXT,
+    params TEXT,
+    prompt_id TEXT,
+    source TEXT
+);
+CREATE INDEX IF NOT EXISTS outputs_created ON outputs (created);
+CREATE INDEX IF NOT EXISTS outputs_dir ON outputs (dir);
+CREATE INDEX IF NOT EXISTS outputs_source ON outputs (source);
+CREATE TABLE IF NOT EXISTS dirs (
+    path TEXT PRIMARY KEY,
+    parent TEXT,
+    mtime_ns INTEGER
+);
+"""
+
+
+class OutputIndex:
+    """Outputs under `root` (plus any recorded elsewhere, e.g. the result cache).
+
+    ``record`` stores a finished job's files with the prompt and parameters
+    that made them.  ``scan`` picks up files added or removed behind our
+    back, listing only directories whose mtime changed since the last scan.
+    A transcoded file hides the WebP it was made from.
+    """
+
+    def __init__(self, db_path: Path, root: Path):
+        self.root = Path(root)
+        db_path = Path(db_path)
+        db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(db_path, check_same_thread=False, timeout=10)
+        self._db.row_factory = sqlite3.Row
+        self._lock = threading.Lock()
+        self._scanning = threading.Lock()
+        with self._lock, self._db:
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.executescript(SCHEMA)
+
+    def record(self, files: list, workflow: dict = None, workflow_name: str = None,
+               prompt_id: str = None, source: Path = None):
+        """Add (or refresh) a finished job's output files"""
+        values = role_values(workflow) if workflow else {}
+        params = {k: values[k] for k in ("width", "height", "frames", "fps", "steps", "cfg") if k in values}
+        duration = None
+        if params.get("frames") and params.get("fps"):
+            duration = round(params["frames"] / params["fps"], 2)
+        rows = []
+        for path in map(Path, files):
+            if path.suffix.lower() not in MEDIA:
+                continue  # e.g. a latent saved for the next job
+            try:
+                st = path.stat()
+            except OSError:
+                continue
+            rows.append((
+                str(path), str(path.parent), path.name, st.st_mtime, st.st_size, duration,
+                values.get("prompt"), values.get("negative"), values.get("seed"), workflow_name,
+                json.dumps(params) if params else None, prompt_id, str(source) if source else _sibling(path),
+            ))
+        with self._lock, self._db:
+            self._db.executemany(
+                "INSERT OR REPLACE INTO outputs VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", rows,
+            )
+
+    def scan(self) -> int:
+        """Reconcile with the files on disk; returns how many rows changed"""
+        if not self.root.is_dir() or not self._scanning.acquire(blocking=False):
+            return 0  # another thread is already scanning
+        try:
+            return self._scan()
+        finally:
+            self._scanning.release()
+
+    def _scan(self) -> int:
+        with self._lock:
+            seen = {row[0]: row[1] for row in self._db.execute("SELECT path, mtime_ns FROM dirs")}
+        changed = 0
+        now_ns = time.time_ns()
+        stack = [self.root]
+        while stack:
+            folder = stack.pop()
+            try:
+                mtime_ns = folder.stat().st_mtime_ns
+                with os.scandir(folder) as it:
+                    entries = list(it) if seen.get(str(folder)) != mtime_ns else None
+            except OSError:
+                continue
+            if entries is None:
+                # Unchanged: no files came or went, but subdirectories may have
+                with self._lock:
+                    subdirs = [row[0] for row in self._db.execute(
+                        "SELECT path FROM dirs WHERE parent = ?", (str(folder),),
+                    )]
+                stack.extend(Path(d) for d in subdirs)
+                continue
+            changed += self._sync_dir(folder, entries)
+            stack.extend(Path(e.path) for e in entries
+                         if e.is_dir(follow_symlinks=False) and not e.name.startswith("."))
+            # A directory touched just now may still be gaining files at the same mtime
+            settled = mtime_ns if now_ns - mtime_ns > SETTLE * 1e9 else None
+            with self._lock, self._db:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO dirs VALUES (?, ?, ?)", (str(folder), str(folder.parent), settled),
+                )
+        with self._lock, self._db:
+            gone = [row[0] for row in self._db.execute("SELECT path FROM dirs")
+                    if not Path(row[0]).is_dir()]
+            for d in gone:
+                changed += self._db.execute("DELETE FROM outputs WHERE dir = ?", (d,)).rowcount
+                self._db.execute("DELETE FROM dirs WHERE path = ?", (d,))
+        return changed
+
+    def _sync_dir(self, folder: Path, entries: list) -> int:
+        """Add new and drop vanished media files in one directory"""
+        with self._lock:
+            known = {row[0] for row in self._db.execute("SELECT name FROM outputs WHERE dir = ?", (str(folder),))}
+        present = {e.name: e for e in entries
+                   if e.is_file() and Path(e.name).suffix.lower() in MEDIA and not e.name.startswith(".")}
+        rows = []
+        for name in present.keys() - known:
+            try:
+                st = present[name].stat()
+            except OSError:
+                continue
+            path = folder / name
+            rows.append((str(path), str(folder), name, st.st_mtime, st.st_size, _sibling(path)))
+        missing = known - present.keys()
+        with self._lock, self._db:
+            self._db.executemany(
+                "INSERT OR IGNORE INTO outputs (path, dir, name, created, size, source) VALUES (?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+            self._db.executemany(
+                "DELETE FROM outputs WHERE dir = ? AND name = ?", [(str(folder), name) for name in missing],
+            )
+        return len(rows) + len(missing)
+
+    def query(self, text: str = None, workflow: str = None, since: float = None, until: float = None,
+              page: int = 1, per_page: int = 20) -> tuple:
+        """One page of outputs, newest first: (rows as dicts, total matches)"""
+        where = ["path NOT IN (SELECT source FROM outputs WHERE source IS NOT NULL)"]
+        args = []
+        if text:
+            where.append("(prompt LIKE ? OR name LIKE ?)")
+            args += [f"%{text}%"] * 2
+        if workflow:
+            where.append("workflow = ?")
+            args.append(workflow)
+        if since is not None:
+            where.append("created >= ?")
+            args.append(since)
+        if until is not None:
+            where.append("created < ?")
+            args.append(until)
+        clause = " AND ".join(where)
+        offset = max(0, page - 1) * per_page
+        with self._lock:
+            total = self._db.execute(f"SELECT COUNT(*) FROM outputs WHERE {clause}", args).fetchone()[0]
+            rows = self._db.execute(
+                f"SELECT * FROM outputs WHERE {clause} ORDER BY created DESC LIMIT ? OFFSET ?",
+                args + [per_page, offset],
+            ).fetchall()
+        return [dict(row) for row in rows], total
+
+    def workflows(self) -> list:
+        """Distinct workflow names seen so far"""
+        with self._lock:
+            return [row[0] for row in self._db.execute(
+                "SELECT DISTINCT workflow FROM outputs WHERE workflow IS NOT NULL ORDER BY workflow"
+            )]
+
+    def forget(self, paths: list):
+        """Drop rows for files that turned out to be gone"""
+        with self._lock, self._db:
+            self._db.executemany("DELETE FROM outputs WHERE path = ?", [(str(p),) for p in paths])
+
+
+def _sibling(path: Path) -> str:
+    """The WebP a transcoded file was made from, if it sits next to it"""
+    if path.suffix.lower() == ".webp":
+        return None
+    webp = path.with_suffix(".webp")
+    return str(webp) if webp.exists() else None
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_index() -> OutputIndex:
+    """Process-wide index of the ComfyUI output directory"""
+    global _index
+    with _index_lock:
+        if _index is None:
+            _index = OutputIndex(config.get_path("outputs") / "outputs.db", config.comfyui_output_dir())
+        return _index
@@ -0,0 +1,246 @@
+"""
+ComfyUI backend pool
+Health-checks several ComfyUI servers and routes each job to the least loaded one
+"""
+
+import asyncio
+import itertools
+import threading
+import time
+
+from videogen.comfy import TRANSPORT_ERRORS, ComfyClient, get_client
+from videogen.inventory import get_inventory
+
+PROBE_TIMEOUT = 3   # seconds per health-check request
+FAIL_LIMIT = 2      # consecutive failed checks before a backend is taken out
+REFERENCE_COST = 512 * 512 * 16 * 20  # 16 frames @ 512x512, 20 steps == 1.0
+
+
+def job_cost(frames: int, width: int, height: int, steps: int) -> float:
+    """Relative GPU work of a job (1.0 = 16 frames @ 512x512, 20 steps)"""
+    return frames * width * height * steps / REFERENCE_COST
+
+
+class Backend:
+    """One ComfyUI server as seen by the pool"""
+
+    def __init__(self, url: str):
+        self.url = url.rstrip("/")
+        self.client: ComfyClient = get_client(self.url)
+        self.healthy = None  # unknown until the first check
+        self.failures = 0
+        self.device = ""
+        self.vram_gb = 0.0
+        self.running = 0
+        self.pending = 0
+        self.checked_at = 0.0
+        self.jobs = {}  # our outstanding jobs: token -> cost
+
+    @property
+    def available(self) -> bool:
+        return self.healthy is not False
+
+    @property
+    def age(self) -> float:
+        """Seconds since the last health check finished (inf if never)"""
+        return time.time() - self.checked_at if self.checked_at else float("inf")
+
+    def load(self, default_cost: float = 1.0) -> float:
+        """Estimated pending work: our jobs by cost, anyone else's at default_cost"""
+        ours = sum(self.jobs.values())
+        foreign = max(0, self.running + self.pending - len(self.jobs))
+        return ours + foreign * default_cost
+
+    def check(self):
+        """Probe /system_stats and /queue; update health and queue depth"""
+        try:
+            session = self.client.session
+            stats = session.get(f"{self.url}/system_stats", timeout=PROBE_TIMEOUT).json()
+            queue = session.get(f"{self.url}/queue", timeout=PROBE_TIMEOUT).json()
+        except TRANSPORT_ERRORS:
+            self.mark_failed()
+            return
+        self._update(stats, queue)
+
+    async def acheck(self):
+        """Async check"""
+        try:
+            stats, queue = await asyncio.gather(
+                self.client.aget_system_stats(timeout=PROBE_TIMEOUT),
+                self.client.aget_queue(timeout=PROBE_TIMEOUT),
+            )
+        except TRANSPORT_ERRORS:
+            self.mark_failed()
+            return
+        self._update(stats, queue)
+
+    def _update(self, stats: dict, queue: dict):
+        devices = stats.get("devices") or [{}]
+        self.device = devices[0].get("name", "Unknown")
+        self.vram_gb = devices[0].get("vram_total", 0) / 1e9
+        self.running = len(queue.get("queue_running", []))
+        self.pending = len(queue.get("queue_pending", []))
+        self.failures = 0
+        self.healthy = True
+        self.checked_at = time.time()
+
+    def mark_failed(self):
+        """Count a failed request; take the backend out after FAIL_LIMIT in a row"""
+        self.failures += 1
+        self.checked_at = time.time()
+        if self.failures >= FAIL_LIMIT or self.healthy is None:
+            self.healthy = False
+
+
+class BackendPool:
+    """Routes jobs across ComfyUI servers by least estimated pending work.
+
+    A background thread re-checks every backend each `interval` seconds,
+    which is also how a dead backend gets re-admitted once it answers
+    again.  Its results are the cache status readers use, so nothing on
+    the UI path has to wait on a slow server.
+    """
+
+    def __init__(self, urls: list, interval: float = 5.0):
+        self.backends = [Backend(url) for url in dict.fromkeys(urls)]
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._tokens = itertools.count()
+        self._thread = None
+        self._wake = threading.Event()
+
+    def start(self):
+        """Begin background health checks (idempotent)"""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._check_loop, name="comfy-pool", daemon=True)
+            self._thread.start()
+
+    def _check_loop(self):
+        while True:
+            self.refresh()
+            self._wake.wait(self.interval)
+            self._wake.clear()
+
+    def poke(self):
+        """Have the background thread check again now"""
+        self._wake.set()
+
+    async def arefresh(self, max_age: float = 0.0):
+        """Async refresh of backends not checked within `max_age` seconds"""
+        await asyncio.gather(*(b.acheck() for b in self.backends if b.age > max_age))
+
+    def refresh(self):
+        """Check every backend now, in parallel"""
+        threads = [threading.Thread(target=b.check, daemon=True) for b in self.backends]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join(PROBE_TIMEOUT * 2 + 1)
+
+    def _default_cost(self) -> float:
+        costs = [c for b in self.backends for c in b.jobs.values()]
+        return sum(costs) / len(costs) if costs else 1.0
+
+    def acquire(self, cost: float, exclude: set = ()) -> tuple:
+        """Reserve the least loaded healthy backend for a job; returns (backend, token)"""
+        with self._lock:
+            candidates = [b for b in self.backends if b.available and b.url not in exclude]
+            if not candidates:
+                raise RuntimeError("No ComfyUI backend available")
+            default = self._default_cost()
+            backend = min(candidates, key=lambda b: b.load(default))
+            token = next(self._tokens)
+            backend.jobs[token] = cost
+            return backend, token
+
+    def release(self, backend: Backend, token: int):
+        """Forget a finished job's reservation"""
+        with self._lock:
+            backend.jobs.pop(token, None)
+
+    def submit(self, workflow: dict, cost: float) -> tuple:
+        """Queue workflow on the best backend, failing over once per backend.
+
+        Returns (backend, token, prompt_id); call release() when done.
+        """
+        tried = set()
+        while True:
+            backend, token = self.acquire(cost, exclude=tried)
+            try:
+                return backend, token, backend.client.queue_prompt(workflow)
+            except TRANSPORT_ERRORS:
+                self._failover(backend, token, tried)
+
+    async def asubmit(self, workflow: dict, cost: float) -> tuple:
+        """Async submit"""
+        tried = set()
+        while True:
+            backend, token = self.acquire(cost, exclude=tried)
+            try:
+                return backend, token, await backend.client.aqueue_prompt(workflow)
+            except TRANSPORT_ERRORS:
+                self._failover(backend, token, tried)
+
+    def _failover(self, backend: Backend, token: int, tried: set):
+        """Take a backend that refused a job out; re-raise once all have"""
+        self.release(backend, token)
+        backend.mark_failed()
+        backend.healthy = False
+        tried.add(backend.url)
+        if len(tried) == len(self.backends):
+            raise
+
+    def get(self, url: str) -> Backend:
+        """Backend by URL"""
+        for backend in self.backends:
+            if backend.url == url.rstrip("/"):
+                return backend
+        raise KeyError(url)
+
+    def validate(self, workflow: dict) -> list:
+        """Why no backend could run this workflow (empty if one can, or we can't tell)"""
+        problems = []
+        for backend in self.backends:
+            if not backend.available:
+                continue
+            found = get_inventory(backend.url).validate(workflow)
+            if not found:
+                return []
+            problems = problems or found
+        return problems
+
+    def totals(self) -> tuple:
+        """(running, pending, healthy backends, all backends) across the pool"""
+        up = [b for b in self.backends if b.healthy]
+        return (
+            sum(b.running for b in up),
+            sum(b.pending for b in up),
+            len(up),
+            len(self.backends),
+        )
+
+    def cancel_all(self):
+        """Interrupt and clear every backend"""
+        def cancel(backend):
+            try:
+                backend.client.interrupt()
+                backend.client.clear_queue()
+            except TRANSPORT_ERRORS:
+                backend.mark_failed()
+
+        threads = [threading.Thread(target=cancel, args=(b,), daemon=True) for b in self.backends]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join(PROBE_TIMEOUT * 4)
+
+    async def acancel_all(self):
+        """Async cancel_all"""
+        async def cancel(backend):
+            try:
+                await backend.client.ainterrupt()
+                await backend.client.aclear_queue()
+            except TRANSPORT_ERRORS:
+                backend.mark_failed()
+
+        await asyncio.gather(*(cancel(b) for b in self.backends))
@@ -0,0 +1,239 @@
+"""
+Job scheduler
+Cost-based admission and fair per-session queueing in front of ComfyUI
+"""
+
+import asyncio
+import math
+import threading
+import time
+from collections import OrderedDict, deque
+
+from videogen.pool import job_cost
+
+MIN_SIDE = 256   # down-scaling never goes below this
+MIN_STEPS = 10
+
+
+class CostModel:
+    """Predicts GPU seconds as ``rate * job_cost + fixed``.
+
+    Starts from a prior and refits by exponentially weighted least squares
+    as jobs finish, so old hardware/model timings fade out.
+    """
+
+    def __init__(self, seconds_per_unit: float = 45.0, fixed: float = 5.0, decay: float = 0.95):
+        self.rate = seconds_per_unit
+        self.fixed = fixed
+        self.decay = decay
+        self._lock = threading.Lock()
+        # Prior as two pseudo-observations (at 0.5 and 2 units)
+        self._n = 2.0
+        self._sx = 2.5
+        self._sy = 2 * fixed + 2.5 * seconds_per_unit
+        self._sxx = 4.25
+        self._sxy = 2.5 * fixed + 4.25 * seconds_per_unit
+
+    def estimate(self, frames: int, width: int, height: int, steps: int) -> float:
+        return self.fixed + self.rate * job_cost(frames, width, height, steps)
+
+    def observe(self, frames: int, width: int, height: int, steps: int, seconds: float):
+        """Fold in a finished job's measured execution time"""
+        x = job_cost(frames, width, height, steps)
+        with self._lock:
+            d = self.decay
+            self._n = self._n * d + 1
+            self._sx = self._sx * d + x
+            self._sy = self._sy * d + seconds
+            self._sxx = self._sxx * d + x * x
+            self._sxy = self._sxy * d + x * seconds
+            var = self._n * self._sxx - self._sx ** 2
+            if var > 1e-9:
+                rate = (self._n * self._sxy - self._sx * self._sy) / var
+                if rate > 0:
+                    self.rate = rate
+                    self.fixed = max(0.0, (self._sy - rate * self._sx) / self._n)
+
+
+def fit_budget(model: CostModel, frames: int, width: int, height: int, steps: int,
+               budget: float) -> tuple:
+    """Largest job under `budget` seconds: (width, height, steps), or None.
+
+    Resolution shrinks first (keeping aspect, multiples of 64), then steps;
+    frame count is left alone since it changes the clip itself.
+    """
+    if model.estimate(frames, width, height, steps) <= budget:
+        return width, height, steps
+    work = max(budget - model.fixed, 0) / model.rate
+    scale = math.sqrt(work / max(job_cost(frames, width, height, steps), 1e-9))
+    w = max(MIN_SIDE, int(width * scale) // 64 * 64)
+    h = max(MIN_SIDE, int(height * scale) // 64 * 64)
+    if model.estimate(frames, w, h, steps) <= budget:
+        return w, h, steps
+    for s in range(steps - 1, MIN_STEPS - 1, -1):
+        if model.estimate(frames, w, h, s) <= budget:
+            return w, h, s
+    return None
+
+
+class Ticket:
+    """One job's place in the scheduler"""
+
+    def __init__(self, session: str, cost: float, label: str = ""):
+        self.session = session
+        self.cost = cost          # estimated GPU seconds
+        self.label = label
+        self.state = "waiting"    # waiting -> running -> finished | cancelled
+        self.prompt_id = None
+        self.backend = None
+        self.enqueued = time.time()
+        self.started = None
+        self._loop = asyncio.get_running_loop()
+        self._turn = self._loop.create_future()
+
+    @property
+    def waiting(self) -> bool:
+        return self.state == "waiting"
+
+    async def wait_turn(self, timeout: float) -> bool:
+        """True once dispatched (or cancelled), False if still waiting after timeout"""
+        try:
+            await asyncio.wait_for(asyncio.shield(self._turn), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+    def _wake(self):
+        def wake():
+            if not self._turn.done():
+                self._turn.set_result(self.state)
+        self._loop.call_soon_threadsafe(wake)
+
+
+class FairScheduler:
+    """Deficit round robin over per-session queues, weighted by estimated cost.
+
+    Each round a session with work earns ``quantum`` seconds of credit and
+    dispatches jobs while its credit covers their estimated cost, so a
+    session submitting long jobs can't starve one submitting short ones.
+    At most ``capacity()`` jobs are handed to ComfyUI at once; the rest
+    wait here, where the order can still be fair.
+    """
+
+    def __init__(self, capacity, quantum: float = 60.0):
+        if not quantum > 0:
+            raise ValueError(f"scheduler quantum must be positive, got {quantum}")
+        self.capacity = capacity
+        self.quantum = quantum
+        self._lock = threading.Lock()
+        self._queues = OrderedDict()  # session -> deque of waiting tickets
+        self._deficit = {}
+        self._running = []
+
+    def submit(self, session: str, cost: float, label: str = "") -> Ticket:
+        """Queue a job; await ``ticket.wait_turn`` before sending it to ComfyUI"""
+        ticket = Ticket(session, cost, label)
+        with self._lock:
+            self._queues.setdefault(session, deque()).append(ticket)
+            self._deficit.setdefault(session, 0.0)
+        self._dispatch()
+        return ticket
+
+    def release(self, ticket: Ticket):
+        """A dispatched job finished (or failed); frees its slot"""
+        with self._lock:
+            if ticket in self._running:
+                self._running.remove(ticket)
+            if ticket.state == "running":
+                ticket.state = "finished"
+        self._dispatch()
+
+    def cancel(self, session: str) -> list:
+        """Cancel a session's jobs; returns its dispatched tickets to stop.
+
+        Waiting tickets are dropped; dispatched ones keep their slot until
+        released but are marked cancelled too, so callers that haven't
+        submitted theirs yet can tell not to.
+        """
+        with self._lock:
+            for ticket in self._queues.pop(session, ()):
+                ticket.state = "cancelled"
+                ticket._wake()
+            self._deficit.pop(session, None)
+            dispatched = [t for t in self._running if t.session == session]
+            for ticket in dispatched:
+                ticket.state = "cancelled"
+            return dispatched
+
+    def cancel_all(self) -> list:
+        """Cancel every job; returns all dispatched tickets"""
+        with self._lock:
+            sessions = list(self._queues) + [t.session for t in self._running]
+        for session in dict.fromkeys(sessions):
+            self.cancel(session)
+        with self._lock:
+            return list(self._running)
+
+    def _next(self, queues: OrderedDict, deficit: dict) -> Ticket:
+        """Pop the ticket DRR serves next from these queues, or None"""
+        while queues:
+            session, q = next(iter(queues.items()))
+            if deficit[session] < q[0].cost:
+                deficit[session] += self.quantum
+                queues.move_to_end(session)
+                continue
+            ticket = q.popleft()
+            deficit[session] -= ticket.cost
+            if not q:
+                del queues[session]
+                deficit[session] = 0.0
+            return ticket
+        return None
+
+    def _order(self) -> list:
+        """Waiting tickets in the order they will be dispatched (lock held)"""
+        queues = OrderedDict((s, deque(q)) for s, q in self._queues.items())
+        deficit = dict(self._deficit)
+        order = []
+        while queues:
+            order.append(self._next(queues, deficit))
+        return order
+
+    def _dispatch(self):
+        with self._lock:
+            free = self.capacity() - len(self._running)
+            while free > 0 and self._queues:
+                ticket = self._next(self._queues, self._deficit)
+                ticket.state = "running"
+                ticket.started = time.time()
+                self._running.append(ticket)
+                ticket._wake()
+                free -= 1
+
+    def position(self, ticket: Ticket) -> tuple:
+        """(jobs ahead, estimated seconds until it starts) for a waiting ticket"""
+        with self._lock:
+            order = self._order()
+            running = list(self._running)
+            slots = max(1, self.capacity())
+        if ticket not in order:
+            return 0, 0.0
+        ahead = order[:order.index(ticket)]
+        now = time.time()
+        busy = sum(max(0.0, t.cost - (now - t.started)) for t in running)
+        return len(ahead), (busy + sum(t.cost for t in ahead)) / slots
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "running": len(self._running),
+                "waiting": sum(len(q) for q in self._queues.values()),
+                "sessions": len(self._queues),
+            }
+
+
+def format_eta(seconds: float) -> str:
+    seconds = int(seconds)
+    if seconds < 60:
+        return f"{seconds}s"
+    return f"{seconds // 60}m{seconds % 60:02d}s"
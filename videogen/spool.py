@@ -0,0 +1,253 @@
+"""
+Spool queue
+A directory of one-file jobs that any number of worker processes (on any
+hosts sharing the directory) claim with atomic renames and keep with
+heartbeats
+"""
+
+import json
+import os
+import socket
+import threading
+import time
+import uuid
+from pathlib import Path
+
+from videogen import config
+
+META = "spool.json"
+STATES = ("pending", "leased", "done", "failed")
+
+
+def settings() -> dict:
+    """spool config with defaults filled in"""
+    return {
+        "lease_ttl": float(config.get("spool", "lease_ttl", 120)),
+        "heartbeat": float(config.get("spool", "heartbeat", 15)),
+    }
+
+
+def _write_json(path: Path, data: dict):
+    """Write JSON so readers only ever see the complete file"""
+    part = path.with_name(f".{path.name}.{uuid.uuid4().hex[:8]}.part")
+    with open(part, "w", encoding="utf-8") as f:
+        json.dump(data, f)
+    os.replace(part, path)
+
+
+class Spool:
+    """Jobs as files moving pending/ -> leased/ -> done/ or failed/.
+
+    A worker claims a job by renaming ``pending/<job>`` to
+    ``leased/<job>.<worker>``; exactly one rename succeeds, so no locks
+    are needed.  The lease file's mtime is its heartbeat: leases not
+    touched for ``ttl`` seconds belong to a dead worker and are renamed
+    back to pending/ by whoever notices.
+    """
+
+    def __init__(self, root: Path, ttl: float = None):
+        self.root = Path(root)
+        self.ttl = ttl or settings()["lease_ttl"]
+        self.dirs = {state: self.root / state for state in STATES}
+
+    @property
+    def exists(self) -> bool:
+        return (self.root / META).is_file()
+
+    def meta(self) -> dict:
+        """Spool settings (workflow, job count)"""
+        with open(self.root / META, encoding="utf-8") as f:
+            return json.load(f)
+
+    def fill(self, entries, workflow: str = None) -> int:
+        """Add jobs from an iterable of prompt entries, one file each; returns how many.
+
+        Entries are written as they are read, so the input is never held
+        in memory.  Only one process should fill a spool at a time.
+        """
+        for directory in self.dirs.values():
+            directory.mkdir(parents=True, exist_ok=True)
+        meta = self.meta() if self.exists else {"workflow": workflow, "created": time.time(), "jobs": 0}
+        if workflow and workflow != meta["workflow"]:
+            # later jobs carry their own workflow; the ones already queued keep theirs
+            entries = ({"prompt": e, "workflow": workflow} if isinstance(e, str) else {"workflow": workflow, **e}
+                       for e in entries)
+        start = index = meta["jobs"]
+        try:
+            for entry in entries:
+                _write_json(self.dirs["pending"] / f"{index:09d}.json", {"i": index, "entry": entry})
+                index += 1
+        finally:
+            meta["jobs"] = index
+            _write_json(self.root / META, meta)
+        return index - start
+
+    def claim(self, worker: str) -> "Lease":
+        """Take one pending job, or None if none is left"""
+        try:
+            it = os.scandir(self.dirs["pending"])
+        except FileNotFoundError:
+            return None
+        with it:
+            for entry in it:
+                if not entry.name.endswith(".json"):
+                    continue
+                leased = self.dirs["leased"] / f"{entry.name}.{worker}"
+                try:
+                    os.utime(entry.path)  # fresh mtime before it can be seen as a lease
+                    os.rename(entry.path, leased)
+                except FileNotFoundError:
+                    continue  # another worker got it first
+                if (self.dirs["done"] / entry.name).exists():
+                    leased.unlink(missing_ok=True)  # finished by a worker whose lease had expired
+                    continue
+                try:
+                    with open(leased, encoding="utf-8") as f:
+                        job = json.load(f)
+                except (OSError, ValueError):
+                    continue
+                return Lease(self, entry.name, leased, job)
+        return None
+
+    def reclaim(self) -> int:
+        """Return leases whose holder stopped heartbeating to pending/; returns how many"""
+        returned = 0
+        cutoff = time.time() - self.ttl
+        try:
+            it = os.scandir(self.dirs["leased"])
+        except FileNotFoundError:
+            return 0
+        with it:
+            for entry in it:
+                try:
+                    if entry.stat().st_mtime >= cutoff:
+                        continue
+                except FileNotFoundError:
+                    continue
+                name = entry.name.rsplit(".", 1)[0]
+                try:
+                    if (self.dirs["done"] / name).exists():
+                        os.unlink(entry.path)
+                    else:
+                        os.rename(entry.path, self.dirs["pending"] / name)
+                        returned += 1
+                except FileNotFoundError:
+                    pass  # reclaimed or finished by someone else meanwhile
+        return returned
+
+    def counts(self) -> dict:
+        """Jobs per state (walks the directories; call sparingly on big spools)"""
+        counts = {}
+        for state, directory in self.dirs.items():
+            try:
+                with os.scandir(directory) as it:
+                    counts[state] = sum(1 for entry in it if not entry.name.startswith("."))
+            except FileNotFoundError:
+                counts[state] = 0
+        return counts
+
+    def idle(self) -> bool:
+        """True once nothing is pending or leased"""
+        for state in ("pending", "leased"):
+            try:
+                with os.scandir(self.dirs[state]) as it:
+                    if any(not entry.name.startswith(".") for entry in it):
+                        return False
+            except FileNotFoundError:
+                pass
+        return True
+
+
+class Lease:
+    """One claimed job; ``job["entry"]`` is the prompt entry, ``job["i"]`` its index"""
+
+    def __init__(self, spool: Spool, name: str, path: Path, job: dict):
+        self.spool = spool
+        self.name = name
+        self.path = path
+        self.job = job
+        self.lost = False
+
+    @property
+    def index(self) -> int:
+        return self.job["i"]
+
+    def touch(self) -> bool:
+        """Heartbeat; False if the lease was reclaimed from us"""
+        try:
+            os.utime(self.path)
+            return True
+        except FileNotFoundError:
+            self.lost = True
+            return False
+
+    def _close(self, state: str, record: dict):
+        _write_json(self.spool.dirs[state] / self.name, {**self.job, "result": record})
+        try:
+            os.unlink(self.path)
+        except FileNotFoundError:
+            self.lost = True
+
+    def complete(self, record: dict):
+        self._close("done", record)
+
+    def fail(self, record: dict):
+        self._close("failed", record)
+
+
+class Worker:
+    """A process working on a spool: claims leases, heartbeats them, streams results.
+
+    Results are appended to ``results/<worker>.jsonl`` (one file per
+    worker, so appends never interleave across hosts).
+    """
+
+    def __init__(self, spool: Spool, name: str = None, heartbeat: float = None):
+        self.spool = spool
+        # the name ends lease file names, so it can't contain the separator
+        self.name = (name or f"{socket.gethostname()}-{os.getpid()}").replace(".", "-")
+        self.heartbeat = heartbeat or settings()["heartbeat"]
+        self.held = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._results = None
+
+    def __enter__(self):
+        results = self.spool.root / "results"
+        results.mkdir(parents=True, exist_ok=True)
+        self._results = open(results / f"{self.name}.jsonl", "a", encoding="utf-8")
+        self._thread = threading.Thread(target=self._beat, name="spool-heartbeat", daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self._results.close()
+
+    def _beat(self):
+        while not self._stop.wait(self.heartbeat):
+            with self._lock:
+                leases = list(self.held.values())
+            for lease in leases:
+                lease.touch()
+            self.spool.reclaim()
+
+    def claim(self) -> Lease:
+        """Next job for this worker (reclaiming dead leases if the queue looks empty)"""
+        lease = self.spool.claim(self.name)
+        if lease is None and self.spool.reclaim():
+            lease = self.spool.claim(self.name)
+        if lease is not None:
+            with self._lock:
+                self.held[lease.name] = lease
+        return lease
+
+    def finish(self, lease: Lease, record: dict, ok: bool = True):
+        """Close a lease as done (or failed) and append its result"""
+        (lease.complete if ok else lease.fail)(record)
+        with self._lock:
+            self.held.pop(lease.name, None)
+            self._results.write(json.dumps({"i": lease.index, "worker": self.name, **record}) + "\n")
+            self._results.flush()
@@ -0,0 +1,157 @@
+"""
+Staged sampling
+Runs a two-expert workflow (a high-noise KSamplerAdvanced handing its
+leftover noise to a low-noise one) as two jobs joined by a cached latent
+"""
+
+from typing import NamedTuple
+
+from videogen.cache import get_cache, workflow_key
+from videogen.comfy import TRANSPORT_ERRORS, ComfyError, Tracker
+from videogen.workflows import LATENT_SUBFOLDER, new_ids
+
+
+class Stages(NamedTuple):
+    key: str      # content hash of the first stage (prompt, seed, size, steps, model...)
+    first: dict   # everything up to the hand-off, ending in SaveLatent
+    second: dict  # LoadLatent onwards to the original outputs
+    latent: str   # file the second stage loads from ComfyUI's input folder
+
+
+def _links(node: dict):
+    for value in node.get("inputs", {}).values():
+        if isinstance(value, list) and len(value) == 2 and isinstance(value[0], str):
+            yield value[0]
+
+
+def ancestors(workflow: dict, roots) -> set:
+    """Ids of roots and every node they (transitively) read from"""
+    seen, stack = set(), list(roots)
+    while stack:
+        node_id = stack.pop()
+        if node_id in seen or node_id not in workflow:
+            continue
+        seen.add(node_id)
+        stack.extend(_links(workflow[node_id]))
+    return seen
+
+
+def handoff(workflow: dict) -> tuple:
+    """(first sampler id, second sampler id) where leftover noise is passed on, or None"""
+    for first_id, node in workflow.items():
+        if node.get("class_type") != "KSamplerAdvanced":
+            continue
+        if node["inputs"].get("return_with_leftover_noise") != "enable":
+            continue
+        for second_id, other in workflow.items():
+            if other.get("class_type") == "KSamplerAdvanced" and other["inputs"].get("latent_image") == [first_id, 0]:
+                return first_id, second_id
+    return None
+
+
+def split(workflow: dict) -> Stages:
+    """Cut a workflow at its sampler hand-off, or None if it has none.
+
+    Each half keeps only the nodes it needs, so the first loads just the
+    high-noise model and the second just the low-noise one.  Everything
+    after the hand-off (second sampler, decode, save) can change without
+    changing the key.
+    """
+    found = handoff(workflow)
+    if found is None:
+        return None
+    first_id, second_id = found
+    save_id, load_id = new_ids(workflow, 2)
+
+    first = {node_id: workflow[node_id] for node_id in workflow if node_id in ancestors(workflow, [first_id])}
+    key = workflow_key(first)
+    first[save_id] = {
+        "class_type": "SaveLatent",
+        "inputs": {"filename_prefix": f"{LATENT_SUBFOLDER}/stage1", "samples": [first_id, 0]},
+    }
+
+    latent = f"{key}.latent"
+    consumed = {ref for node in workflow.values() for ref in _links(node)}
+    outputs = [node_id for node_id in workflow if node_id not in consumed]
+    rewired = dict(workflow)
+    node = workflow[second_id]
+    rewired[second_id] = {**node, "inputs": {**node["inputs"], "latent_image": [load_id, 0]}}
+    rewired[load_id] = {"class_type": "LoadLatent", "inputs": {"latent": latent}}
+    keep = ancestors(rewired, outputs)
+    second = {node_id: rewired[node_id] for node_id in rewired if node_id in keep}
+    return Stages(key, first, second, latent)
+
+
+def prepare_latents(client, stages: list, local_dir=None, download_dir=None, inflight: int = 1,
+                    timeout: float = 600, on_done=None, use_cache: bool = True) -> dict:
+    """Make the first-stage latent of each distinct key available on client's backend.
+
+    Latents come from the result cache (unless ``use_cache`` is off)
+    when an identical first stage ran before; the rest are rendered
+    (``inflight`` at a time), cached and uploaded to ComfyUI's input
+    folder for LoadLatent.  ``on_done(stages, ok, cached)`` is called per
+    key.  Returns {key: True if ready}.
+    """
+    cache = get_cache() if use_cache else None
+    distinct = list({s.key: s for s in stages}.values())
+    pending = iter(distinct)
+    tracker = Tracker(client)
+    running = {}   # prompt_id -> (stages, flight)
+    riders = []    # (stages, flight) rendered by another caller
+    ready = {}
+
+    def finish(s, files, cached=False):
+        latent = next((f for f in files or () if f.suffix == ".latent"), None)
+        ok = False
+        if latent is not None:
+            try:
+                client.upload(latent, s.latent)
+                ok = True
+            except (*TRANSPORT_ERRORS, ComfyError, OSError):
+                pass
+        ready[s.key] = ok
+        if on_done is not None:
+            on_done(s, ok, cached)
+
+    def top_up():
+        while len(running) < inflight:
+            s = next(pending, None)
+            if s is None:
+                return
+            flight, owner = cache.begin(s.first) if cache is not None else (None, True)
+            if flight is not None and flight.hit:
+                finish(s, flight.files, cached=True)
+                continue
+            if not owner:
+                riders.append((s, flight))
+                continue
+            try:
+                prompt_id = client.queue_prompt(s.first)
+            except (*TRANSPORT_ERRORS, ComfyError) as e:
+                if flight is not None:
+                    flight.fail(str(e))
+                finish(s, None)
+                continue
+            if flight is not None:
+                flight.set_prompt(prompt_id, client.url)
+            running[prompt_id] = (s, flight)
+            tracker.add(prompt_id, timeout)
+
+    top_up()
+    for event in tracker.events():
+        if event["type"] not in ("done", "error", "timeout"):
+            continue
+        s, flight = running.pop(event["prompt_id"])
+        files = None
+        if event["type"] == "done":
+            files = client.fetch_outputs(event["history"], local_dir, download_dir)
+            if flight is not None:
+                files = flight.finish(files)
+        elif flight is not None:
+            flight.fail(event.get("message", "timeout"))
+        finish(s, files)
+        top_up()
+
+    for s, flight in riders:
+        finish(s, flight.wait(timeout), cached=True)
+    return ready
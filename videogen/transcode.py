@@ -0,0 +1,267 @@
+"""
+Streaming video transcoder
+Decodes animated WebP frames lazily and pipes raw RGB into ffmpeg's stdin,
+in a pool of worker processes so callers never wait on the encoder
+"""
+
+import multiprocessing
+import os
+import subprocess
+import threading
+import uuid
+from concurrent.futures import Future, ProcessPoolExecutor
+from pathlib import Path
+
+from videogen import config
+from videogen.interpolate import minterpolate
+
+# format -> (extension, ffmpeg muxer, codec args; {q} is the quality value)
+FORMATS = {
+    "mp4": (".mp4", "mp4", [
+        "-c:v", "libx264", "-crf", "{q}", "-pix_fmt", "yuv420p",
+        "-vf", "scale=trunc(iw/2)*2:trunc(ih/2)*2",
+        "-movflags", "+faststart",
+    ]),
+    "webm": (".webm", "webm", [
+        "-c:v", "libvpx-vp9", "-crf", "{q}", "-b:v", "0", "-pix_fmt", "yuv420p",
+        "-row-mt", "1",
+    ]),
+    "gif": (".gif", "gif", [
+        "-filter_complex", "split[a][b];[a]palettegen[p];[b][p]paletteuse",
+        "-loop", "0",
+    ]),
+}
+
+
+def output_formats() -> list:
+    """Configured output formats (``output.format`` may be one name or a list)"""
+    formats = config.get("output", "format", "mp4")
+    if isinstance(formats, str):
+        formats = [formats]
+    return [fmt.lower() for fmt in formats] or ["mp4"]
+
+
+def transcode_suffix(fmt: str = None) -> str:
+    """File extension transcode() will produce for fmt (default: configured)"""
+    fmt = (fmt or output_formats()[0]).lower()
+    return FORMATS[fmt][0]
+
+
+def transcode_dest(src: Path, fmt: str, interpolate: float = None) -> Path:
+    """Where transcode() writes src as fmt (interpolated copies get an _<fps>fps suffix)"""
+    src = Path(src)
+    if interpolate:
+        return src.with_name(f"{src.stem.rstrip('_')}_{interpolate:g}fps{FORMATS[fmt][0]}")
+    return src.with_suffix(FORMATS[fmt][0])
+
+
+def codec_args(fmt: str, quality: int, interpolate: float = None) -> list:
+    """ffmpeg output args for fmt, with frame interpolation spliced into its filters"""
+    args = [arg.format(q=quality) for arg in FORMATS[fmt][2]]
+    if not interpolate:
+        return args
+    motion = minterpolate(interpolate)
+    for flag in ("-vf", "-filter_complex"):
+        if flag in args:
+            i = args.index(flag) + 1
+            args[i] = f"{motion},{args[i]}"
+            return args
+    return ["-vf", motion] + args
+
+
+def frame_rate(img, fallback: float = None) -> float:
+    """Frame rate from the per-frame duration stored in an animated image"""
+    img.load()  # WebP only reports duration once a frame is decoded
+    duration = img.info.get("duration")
+    if duration:
+        rate = 1000.0 / duration
+        # Durations are whole milliseconds; snap 41ms back to 24fps etc.
+        return float(round(rate)) if abs(rate - round(rate)) < 0.02 * rate else rate
+    return float(fallback or config.get("defaults", "fps", 8))
+
+
+def iter_frames(img):
+    """Yield each frame as packed RGB bytes, one at a time"""
+    from PIL import ImageSequence
+
+    for frame in ImageSequence.Iterator(img):
+        yield frame.convert("RGB").tobytes()
+
+
+def encode_frames(frames, size: tuple, rate: float, dest: Path, fmt: str = None, quality: int = None,
+                  interpolate: float = None) -> Path:
+    """Pipe an iterable of packed RGB frames through ffmpeg into dest; returns dest or None.
+
+    Frames are consumed one at a time and the output appears atomically.
+    With `interpolate` (fps), ffmpeg synthesizes in-between frames up to
+    that rate as it encodes.  None means ffmpeg is missing or failed.
+    """
+    fmt = (fmt or output_formats()[0]).lower()
+    if fmt not in FORMATS:
+        raise ValueError(f"Unsupported output format: {fmt}")
+    muxer = FORMATS[fmt][1]
+    quality = quality if quality is not None else config.get("output", "quality", 23)
+    dest = Path(dest)
+    part = dest.with_name(f".{dest.name}.{uuid.uuid4().hex[:8]}.part")
+    width, height = size
+    cmd = [
+        "ffmpeg", "-y", "-loglevel", "error",
+        "-f", "rawvideo", "-pix_fmt", "rgb24",
+        "-s", f"{width}x{height}", "-r", f"{rate:g}",
+        "-i", "-",
+        *codec_args(fmt, quality, interpolate if interpolate and interpolate > rate else None),
+        "-f", muxer, str(part),
+    ]
+    try:
+        proc = subprocess.Popen(cmd, stdin=subprocess.PIPE, stderr=subprocess.DEVNULL)
+    except FileNotFoundError:
+        return None
+    try:
+        for frame in frames:
+            proc.stdin.write(frame)
+    except BrokenPipeError:
+        pass
+    finally:
+        proc.stdin.close()
+    proc.wait()
+
+    if proc.returncode != 0 or not part.exists():
+        part.unlink(missing_ok=True)
+        return None
+    os.replace(part, dest)
+    return dest
+
+
+def transcode(src: Path, fmt: str = None, quality: int = None, fps: float = None,
+              dest: Path = None, interpolate: float = None) -> Path:
+    """Convert an animated WebP to fmt (mp4/webm/gif), return the new path or None.
+
+    Memory stays at about one decoded frame regardless of clip length, and
+    the output appears atomically so concurrent readers never see a
+    partial file.  `interpolate` raises the frame rate to that many fps
+    with motion-compensated in-between frames.
+    """
+    from PIL import Image  # only needed in the encoder processes
+
+    fmt = (fmt or output_formats()[0]).lower()
+    if fmt not in FORMATS:
+        raise ValueError(f"Unsupported output format: {fmt}")
+    src = Path(src)
+    dest = Path(dest) if dest else transcode_dest(src, fmt, interpolate)
+
+    with Image.open(src) as img:
+        if getattr(img, "n_frames", 1) < 1:
+            return None
+        rate = fps or frame_rate(img)
+        return encode_frames(iter_frames(img), img.size, rate, dest, fmt, quality, interpolate)
+
+
+def _warm():
+    return os.getpid()
+
+
+class TranscodePool:
+    """Converts finished WebPs in worker processes, off the request path.
+
+    ``submit`` returns a future resolving to ``{format: path or None}``;
+    every format is encoded in its own worker, and a file submitted again
+    while converting shares the first conversion.  Up-to-date outputs
+    from an earlier run are reused without encoding.
+    """
+
+    def __init__(self, formats: list = None, quality: int = None, workers: int = None):
+        self.formats = formats or output_formats()
+        self.quality = quality if quality is not None else config.get("output", "quality", 23)
+        self.workers = workers or max(1, min(4, (os.cpu_count() or 2) // 2))
+        self._lock = threading.Lock()
+        self._executor = None
+        self._jobs = {}  # (source path, interpolation fps) -> Future
+
+    def start(self):
+        """Start the workers now (before the process grows other threads)"""
+        with self._lock:
+            executor = self._ensure()
+        executor.submit(_warm).result()
+
+    def _ensure(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            # fork is cheapest and doesn't re-import the app in each worker
+            method = "fork" if "fork" in multiprocessing.get_all_start_methods() else "spawn"
+            self._executor = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context(method))
+        return self._executor
+
+    def submit(self, src: Path, interpolate: float = None) -> Future:
+        """Convert src to every configured format in the background (interpolated to that fps if given)"""
+        src = Path(src)
+        key = (src, interpolate or None)
+        with self._lock:
+            job = self._jobs.get(key)
+            if job is not None:
+                return job
+            job = self._jobs[key] = Future()
+            results, parts = {}, {}
+            for fmt in self.formats:
+                dest = transcode_dest(src, fmt, interpolate) if fmt in FORMATS else None
+                if dest is not None and _fresh(dest, src):
+                    results[fmt] = dest
+                    continue
+                try:
+                    parts[fmt] = self._ensure().submit(transcode, src, fmt, self.quality, None, None, interpolate)
+                except RuntimeError:  # pool broken or shut down
+                    results[fmt] = None
+            remaining = [len(parts)]
+
+        def finish():
+            with self._lock:
+                self._jobs.pop(key, None)
+            job.set_result({fmt: results.get(fmt) for fmt in self.formats})
+
+        def part_done(fmt, part):
+            try:
+                path = part.result()
+            except Exception:
+                path = None
+            with self._lock:
+                results[fmt] = path
+                remaining[0] -= 1
+                last = remaining[0] == 0
+            if last:
+                finish()
+
+        if not parts:
+            finish()
+        for fmt, part in parts.items():
+            part.add_done_callback(lambda part, fmt=fmt: part_done(fmt, part))
+        return job
+
+    def run(self, fn, *args) -> Future:
+        """Run another encoding task (a module-level function) in the pool"""
+        with self._lock:
+            return self._ensure().submit(fn, *args)
+
+    def shutdown(self, wait: bool = True):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=wait)
+
+
+def _fresh(dest: Path, src: Path) -> bool:
+    """dest exists and is newer than src"""
+    try:
+        return dest.stat().st_mtime >= src.stat().st_mtime
+    except OSError:
+        return False
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_transcoder() -> TranscodePool:
+    """Process-wide transcode pool for the configured formats"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = TranscodePool(workers=config.get("output", "transcode_workers"))
+        return _pool
@@ -0,0 +1,178 @@
+"""
+Throughput tuning
+Calibration sweeps against a ComfyUI backend, per-workflow cost models kept
+in a local profile, and "best settings within N seconds" presets
+"""
+
+import json
+import os
+import threading
+import time
+import uuid
+from datetime import datetime
+from pathlib import Path
+
+from videogen import config
+from videogen.pool import job_cost
+from videogen.scheduler import CostModel, fit_budget
+from videogen.workflows import Template, role_values
+
+PRESETS = (30, 60, 120, 300)   # budgets offered in the UI, seconds
+CALIBRATION_PROMPT = "a calm lake at sunrise, calibration"
+
+
+def sweep_points(base: dict, quick: bool = False) -> list:
+    """(frames, width, height, steps) to time, spread around `base`.
+
+    Each of frames, resolution and steps is tried at half and full size
+    (resolution in multiples of 64), so the fit sees the work vary over
+    about 8x; ``quick`` keeps the two ends and two midpoints.
+    """
+    frames, width, height, steps = (int(base[k]) for k in ("frames", "width", "height", "steps"))
+    half = {
+        "frames": max(4, frames // 2),
+        "width": max(256, width // 2 // 64 * 64),
+        "height": max(256, height // 2 // 64 * 64),
+        "steps": max(4, steps // 2),
+    }
+    points = []
+    for f in (half["frames"], frames):
+        for w, h in ((half["width"], half["height"]), (width, height)):
+            for s in (half["steps"], steps):
+                if (f, w, h, s) not in points:
+                    points.append((f, w, h, s))
+    if quick:
+        points = [points[0], points[len(points) // 2 - 1], points[len(points) // 2], points[-1]]
+    return points
+
+
+def fit(samples: list) -> CostModel:
+    """Least-squares ``seconds = rate * job_cost + fixed`` over (frames, w, h, steps, seconds)"""
+    xs = [job_cost(f, w, h, s) for f, w, h, s, _ in samples]
+    ys = [seconds for *_, seconds in samples]
+    n = len(samples)
+    mx, my = sum(xs) / n, sum(ys) / n
+    var = sum((x - mx) ** 2 for x in xs)
+    rate = sum((x - mx) * (y - my) for x, y in zip(xs, ys)) / var if var > 1e-12 else 0.0
+    if rate <= 0:
+        # Work didn't explain the times (or too few points): proportional fit
+        rate, fixed = sum(ys) / max(sum(xs), 1e-9), 0.0
+    else:
+        fixed = max(0.0, my - rate * mx)
+    return CostModel(seconds_per_unit=rate, fixed=fixed)
+
+
+def calibrate(client, template: Template, points: list, timeout: float = 900, on_sample=None) -> list:
+    """Run one job per point and time its execution: [(frames, w, h, steps, seconds)].
+
+    A throwaway job runs first so model loading isn't billed to the sweep,
+    and every prompt is made unique so no job is served from ComfyUI's
+    cache.
+    """
+    samples = []
+    warmup = min(points, key=lambda p: job_cost(*p))
+    for n, point in enumerate([warmup] + list(points)):
+        frames, width, height, steps = point
+        workflow = template.apply(
+            prompt=f"{CALIBRATION_PROMPT} {uuid.uuid4().hex[:6]}",
+            seed=1234, frames=frames, width=width, height=height, steps=steps,
+        )
+        values = role_values(workflow)
+        prompt_id = client.queue_prompt(workflow)
+        queued = time.time()
+        started = None
+        for event in client.wait(prompt_id, timeout=timeout):
+            if event["type"] == "execution_start":
+                started = time.time()
+            elif event["type"] in ("error", "timeout"):
+                raise RuntimeError(f"calibration job failed: {event.get('message', 'timeout')}")
+            elif event["type"] == "done":
+                break
+        if n == 0:
+            continue  # warm-up
+        sample = (
+            int(values.get("frames", frames)), int(values.get("width", width)),
+            int(values.get("height", height)), int(values.get("steps", steps)),
+            time.time() - (started or queued),
+        )
+        samples.append(sample)
+        if on_sample is not None:
+            on_sample(sample)
+    return samples
+
+
+class Profile:
+    """Fitted cost models per workflow, stored as JSON next to the outputs.
+
+    Anything not tuned yet falls back to the ``scheduler.seconds_per_unit``
+    prior from the config.
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self.workflows = {}
+        try:
+            with open(self.path) as f:
+                self.workflows = json.load(f).get("workflows", {})
+        except (OSError, ValueError):
+            pass
+
+    def tuned(self, workflow: str) -> bool:
+        return workflow in self.workflows
+
+    def model(self, workflow: str) -> CostModel:
+        """Cost model for a workflow (fitted if tuned, else the configured prior)"""
+        entry = self.workflows.get(workflow)
+        if entry is None:
+            return CostModel(config.get("scheduler", "seconds_per_unit", 45))
+        return CostModel(entry["seconds_per_unit"], entry["fixed"])
+
+    def update(self, workflow: str, model: CostModel, samples: list, device: str = ""):
+        with self._lock:
+            self.workflows[workflow] = {
+                "seconds_per_unit": round(model.rate, 4),
+                "fixed": round(model.fixed, 4),
+                "device": device,
+                "tuned": datetime.now().isoformat(timespec="seconds"),
+                "samples": [list(s[:4]) + [round(s[4], 3)] for s in samples],
+            }
+
+    def save(self):
+        """Write the profile atomically"""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        part = self.path.with_name(f".{self.path.name}.{uuid.uuid4().hex[:8]}.part")
+        with self._lock:
+            data = {"version": 1, "workflows": self.workflows}
+        with open(part, "w") as f:
+            json.dump(data, f, indent=2)
+        os.replace(part, self.path)
+
+
+def presets(model: CostModel, frames: int, width: int, height: int, steps: int,
+            budgets: tuple = PRESETS) -> list:
+    """[(budget, (width, height, steps) or None, estimated seconds)] for each budget.
+
+    Each preset is the requested job shrunk just enough to finish within
+    its budget (see ``fit_budget``); None means even the smallest version
+    won't.
+    """
+    found = []
+    for budget in budgets:
+        fitted = fit_budget(model, frames, width, height, steps, budget)
+        eta = model.estimate(frames, *fitted) if fitted else None
+        found.append((budget, fitted, eta))
+    return found
+
+
+_profile = None
+_profile_lock = threading.Lock()
+
+
+def get_profile() -> Profile:
+    """Process-wide tuning profile (paths.profile)"""
+    global _profile
+    with _profile_lock:
+        if _profile is None:
+            _profile = Profile(config.get_path("profile"))
+        return _profile
@@ -0,0 +1,377 @@
+"""
+Workflow templates
+Each workflow is loaded once, converted to API format and indexed by parameter role
+"""
+
+import hashlib
+import json
+import threading
+from pathlib import Path
+
+from videogen import config
+from videogen.config import ROOT
+
+WORKFLOW_DIR = ROOT / "workflows"
+LATENT_SUBFOLDER = "videogen_latents"  # where SaveLatent writes, under ComfyUI's output folder
+
+# widgets_values order per node type for UI-format graphs (None = UI-only widget)
+WIDGETS = {
+    "CheckpointLoaderSimple": ["ckpt_name"],
+    "CLIPLoader": ["clip_name", "type", "device"],
+    "VAELoader": ["vae_name"],
+    "UNETLoader": ["unet_name", "weight_dtype"],
+    "UnetLoaderGGUF": ["unet_name"],
+    "LoraLoader": ["lora_name", "strength_model", "strength_clip"],
+    "ControlNetLoader": ["control_net_name"],
+    "ControlNetApplyAdvanced": ["strength", "start_percent", "end_percent"],
+    "CLIPTextEncode": ["text"],
+    "EmptyLatentImage": ["width", "height", "batch_size"],
+    "RepeatLatentBatch": ["amount"],
+    "LoadImage": ["image", None],
+    "KSampler": ["seed", None, "steps", "cfg", "sampler_name", "scheduler", "denoise"],
+    "KSamplerAdvanced": [
+        "add_noise", "noise_seed", None, "steps", "cfg", "sampler_name", "scheduler",
+        "start_at_step", "end_at_step", "return_with_leftover_noise",
+    ],
+    "ADE_AnimateDiffLoaderWithContext": ["model_name", "beta_schedule", None],
+    "SaveAnimatedWEBP": ["filename_prefix", "fps", "lossless", "quality", "method"],
+    "VHS_VideoCombine": ["frame_rate", "loop_count", "format", "filename_prefix", None, "pingpong", "save_output"],
+}
+
+SAMPLERS = {"KSampler", "KSamplerAdvanced"}
+
+# role -> [(class_type, input)] bound wherever the input is a literal value
+ROLE_INPUTS = {
+    "seed": [("KSampler", "seed"), ("KSamplerAdvanced", "noise_seed")],
+    "steps": [("KSampler", "steps"), ("KSamplerAdvanced", "steps")],
+    "cfg": [("KSampler", "cfg"), ("KSamplerAdvanced", "cfg")],
+    "width": [("EmptyLatentImage", "width"), ("LatentUpscale", "width")],
+    "height": [("EmptyLatentImage", "height"), ("LatentUpscale", "height")],
+    "frames": [("EmptyLatentImage", "batch_size"), ("RepeatLatentBatch", "amount")],
+    "fps": [("SaveAnimatedWEBP", "fps"), ("VHS_VideoCombine", "frame_rate")],
+    "checkpoint": [("CheckpointLoaderSimple", "ckpt_name")],
+    "unet": [("UnetLoaderGGUF", "unet_name"), ("UNETLoader", "unet_name")],
+    "motion_module": [("ADE_AnimateDiffLoaderWithContext", "model_name"), ("ADE_AnimateDiffLoaderGen1", "model_name")],
+    "image": [("LoadImage", "image")],
+    "context_length": [("ADE_AnimateDiffUniformContextOptions", "context_length")],
+    "context_overlap": [("ADE_AnimateDiffUniformContextOptions", "context_overlap")],
+}
+# In two-expert workflows the "unet" loaders feeding only the later sampler are bound to this instead
+LOW_NOISE_ROLE = "unet_low"
+ROLES = {"prompt", "negative", LOW_NOISE_ROLE, *ROLE_INPUTS}
+
+# Nodes whose outputs are model weights; re-running one means a model swap
+LOADERS = {
+    "CheckpointLoaderSimple", "CLIPLoader", "VAELoader", "UNETLoader", "UnetLoaderGGUF",
+    "LoraLoader", "ControlNetLoader", "ADE_AnimateDiffLoaderWithContext", "ADE_AnimateDiffLoaderGen1",
+}
+
+
+def ui_to_api(graph: dict) -> dict:
+    """Convert a UI-format graph (nodes/links/widgets_values) to API format"""
+    links = {link[0]: (str(link[1]), link[2]) for link in graph.get("links") or []}
+    nodes = [n for n in graph["nodes"] if n.get("mode", 0) not in (2, 4)]  # muted/bypassed
+    live = {str(n["id"]) for n in nodes}
+    api = {}
+    for node in nodes:
+        class_type = node["type"]
+        inputs = {}
+        for inp in node.get("inputs", []):
+            ref = links.get(inp.get("link"))
+            if ref and ref[0] in live:
+                inputs[inp["name"]] = [ref[0], ref[1]]
+
+        values = node.get("widgets_values") or []
+        if isinstance(values, dict):  # some custom nodes store widgets by name
+            for name, value in values.items():
+                inputs.setdefault(name, value)
+        elif values:
+            names = WIDGETS.get(class_type)
+            if names is None:
+                raise ValueError(f"Unknown widget layout for node type {class_type}")
+            for name, value in zip(names, values):
+                if name is not None and name not in inputs:
+                    inputs[name] = value
+
+        api[str(node["id"])] = {"class_type": class_type, "inputs": inputs}
+        title = node.get("title")
+        if title:
+            api[str(node["id"])]["_meta"] = {"title": title}
+    return api
+
+
+def _trace_text(workflow: dict, ref, polarity: str, depth: int = 0) -> str:
+    """Follow a conditioning link back to the CLIPTextEncode that feeds it"""
+    if not isinstance(ref, list) or depth > 8:
+        return None
+    node_id = ref[0]
+    node = workflow.get(node_id, {})
+    if node.get("class_type") == "CLIPTextEncode":
+        return node_id
+    inputs = node.get("inputs", {})
+    # e.g. ControlNetApplyAdvanced passes positive/negative through
+    for key in (polarity, "conditioning"):
+        if key in inputs:
+            return _trace_text(workflow, inputs[key], polarity, depth + 1)
+    return None
+
+
+def _trace_model(workflow: dict, ref, depth: int = 0) -> set:
+    """Ids of the model loaders behind a sampler's model input (through LoRAs, patches...)"""
+    if not isinstance(ref, list) or depth > 8:
+        return set()
+    node = workflow.get(ref[0], {})
+    if node.get("class_type") in LOADERS:
+        return {ref[0]}
+    found = set()
+    for value in node.get("inputs", {}).values():
+        found |= _trace_model(workflow, value, depth + 1)
+    return found
+
+
+def _low_noise_loaders(workflow: dict) -> set:
+    """Loaders only used by samplers that continue another sampler's latent (the low-noise expert)"""
+    early, late = set(), set()
+    for node in workflow.values():
+        if node.get("class_type") not in SAMPLERS:
+            continue
+        latent = node["inputs"].get("latent_image")
+        chained = isinstance(latent, list) and workflow.get(latent[0], {}).get("class_type") in SAMPLERS
+        (late if chained else early).update(_trace_model(workflow, node["inputs"].get("model")))
+    return late - early
+
+
+def index_roles(workflow: dict) -> dict:
+    """Map each role to the (node_id, input) pairs that carry it"""
+    roles = {}
+    for node_id, node in workflow.items():
+        inputs = node.get("inputs", {})
+        for role, targets in ROLE_INPUTS.items():
+            for class_type, key in targets:
+                if node.get("class_type") == class_type and key in inputs and not isinstance(inputs[key], list):
+                    roles.setdefault(role, []).append((node_id, key))
+
+    # A second expert gets its own role, so unet= doesn't load the high-noise model twice
+    low = _low_noise_loaders(workflow)
+    if low and "unet" in roles:
+        roles[LOW_NOISE_ROLE] = [target for target in roles["unet"] if target[0] in low]
+        roles["unet"] = [target for target in roles["unet"] if target[0] not in low]
+        for role in ("unet", LOW_NOISE_ROLE):
+            if not roles[role]:
+                del roles[role]
+
+    # Prompt nodes are whatever the samplers' positive/negative inputs trace back to
+    for polarity, role in (("positive", "prompt"), ("negative", "negative")):
+        found = []
+        for node_id, node in workflow.items():
+            if node.get("class_type") in SAMPLERS:
+                text_id = _trace_text(workflow, node["inputs"].get(polarity), polarity)
+                if text_id and (text_id, "text") not in found:
+                    found.append((text_id, "text"))
+        if not found:
+            for node_id, node in workflow.items():
+                title = str(node.get("_meta", {}).get("title", "")).lower()
+                if node.get("class_type") == "CLIPTextEncode" and polarity in title:
+                    found.append((node_id, "text"))
+        if found:
+            roles[role] = found
+    return roles
+
+
+def role_values(workflow: dict) -> dict:
+    """First literal value of every role a workflow binds (prompt, seed, steps, ...)"""
+    values = {}
+    for role, targets in index_roles(workflow).items():
+        node_id, key = targets[0]
+        values[role] = workflow[node_id]["inputs"][key]
+    return values
+
+
+def job_size(workflow: dict) -> tuple:
+    """(frames, width, height, steps) a workflow will run with (config defaults where unbound)"""
+    values = role_values(workflow)
+    defaults = config.load_config()["defaults"]
+    return tuple(int(values.get(k) or defaults[k]) for k in ("frames", "width", "height", "steps"))
+
+
+def _literals(node: dict) -> tuple:
+    """Hashable view of a node's non-link inputs"""
+    return tuple(sorted(
+        (k, json.dumps(v, sort_keys=True)) for k, v in node.get("inputs", {}).items()
+        if not isinstance(v, list)
+    ))
+
+
+def loader_nodes(workflow: dict) -> set:
+    """Ids of the model-loading nodes in a workflow"""
+    return {node_id for node_id, node in workflow.items() if node.get("class_type") in LOADERS}
+
+
+def model_signature(workflow: dict) -> tuple:
+    """Which weights a workflow loads; equal signatures reuse ComfyUI's loaded models"""
+    return tuple(sorted(
+        (node["class_type"], _literals(node)) for node in workflow.values()
+        if node.get("class_type") in LOADERS
+    ))
+
+
+def text_signature(workflow: dict) -> tuple:
+    """Which prompts a workflow encodes; equal signatures reuse cached conditioning"""
+    return tuple(sorted(
+        _literals(node) for node in workflow.values()
+        if node.get("class_type") == "CLIPTextEncode"
+    ))
+
+
+def _rescale_steps(inputs: dict, old: int, new: int):
+    """Move a KSamplerAdvanced's start/end_at_step with a changed step count, keeping stage splits"""
+    for key in ("start_at_step", "end_at_step"):
+        at = inputs.get(key)
+        if isinstance(at, int) and not isinstance(at, bool) and 0 < at <= old:
+            # e.g. 15 of 30 -> 10 of 20; "until the end" values past `old` stay as they are
+            inputs[key] = new if at == old else min(new, max(1, round(at * new / old)))
+
+
+def _like(current, value):
+    """value cast to the template's numeric type (ComfyUI rejects 8 for a FLOAT fps)"""
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        return value
+    if isinstance(current, float):
+        return float(value)
+    if isinstance(current, int) and not isinstance(current, bool) and float(value).is_integer():
+        return int(value)
+    return value
+
+
+class Template:
+    """A compiled API workflow plus its role bindings.
+
+    ``apply`` returns a new workflow that shares every untouched node with
+    the template, so callers must treat the result as read-only.
+    """
+
+    def __init__(self, name: str, api: dict):
+        self.name = name
+        self.api = api
+        self.roles = index_roles(api)
+
+    def apply(self, **params) -> dict:
+        """Patch role values into a cheap copy of the template"""
+        workflow = dict(self.api)
+        touched = set()
+        for role, value in params.items():
+            if role not in ROLES:
+                raise ValueError(f"Unknown workflow parameter: {role}")
+            if value is None:
+                continue
+            for node_id, key in self.roles.get(role, ()):
+                if node_id not in touched:
+                    node = workflow[node_id]
+                    workflow[node_id] = {**node, "inputs": dict(node["inputs"])}
+                    touched.add(node_id)
+                inputs = workflow[node_id]["inputs"]
+                old = inputs.get(key)
+                inputs[key] = _like(old, value)
+                if role == "steps" and workflow[node_id]["class_type"] == "KSamplerAdvanced" and old != inputs[key]:
+                    _rescale_steps(inputs, int(old), int(inputs[key]))
+        return workflow
+
+    def values(self, role: str) -> list:
+        """Current template values bound to a role"""
+        return [self.api[node_id]["inputs"][key] for node_id, key in self.roles.get(role, ())]
+
+
+_templates = {}
+_templates_lock = threading.Lock()
+
+
+def workflow_names() -> list:
+    """Names of the workflows shipped in WORKFLOW_DIR"""
+    return sorted(path.stem for path in WORKFLOW_DIR.glob("*.json"))
+
+
+def resolve(name) -> Path:
+    """Path for a workflow name ("text-to-video-api") or file path"""
+    path = Path(name)
+    if path.suffix != ".json" and len(path.parts) == 1:
+        path = WORKFLOW_DIR / f"{name}.json"
+    return path.resolve()
+
+
+def load_template(name) -> Template:
+    """Compiled template for a workflow, re-read only when the file changes"""
+    path = resolve(name)
+    mtime = path.stat().st_mtime
+    with _templates_lock:
+        cached = _templates.get(path)
+        if cached and cached[0] == mtime:
+            return cached[1]
+    with open(path) as f:
+        data = json.load(f)
+    api = ui_to_api(data) if "nodes" in data else data
+    template = Template(path.stem, api)
+    with _templates_lock:
+        _templates[path] = (mtime, template)
+    return template
+
+
+def new_ids(workflow: dict, count: int) -> list:
+    """`count` unused node ids, numbered after the workflow's highest"""
+    numeric = [int(node_id) for node_id in workflow if node_id.isdigit()]
+    first = max(numeric, default=len(workflow)) + 1
+    return [str(first + i) for i in range(count)]
+
+
+def start_sampler(workflow: dict) -> tuple:
+    """(sampler id, EmptyLatentImage id) of the sampler that starts from noise, or None"""
+    for node_id, node in workflow.items():
+        source = node.get("inputs", {}).get("latent_image")
+        if node.get("class_type") in SAMPLERS and isinstance(source, list) \
+                and workflow.get(source[0], {}).get("class_type") == "EmptyLatentImage":
+            return node_id, source[0]
+    return None
+
+
+def final_sampler(workflow: dict) -> str:
+    """Id of the sampler whose latent no other sampler carries on from, or None"""
+    samplers = [node_id for node_id, node in workflow.items() if node.get("class_type") in SAMPLERS]
+    fed = {workflow[node_id]["inputs"].get("latent_image", [None])[0] for node_id in samplers}
+    return next((node_id for node_id in samplers if node_id not in fed), None)
+
+
+def keep_latent(workflow: dict, prefix: str) -> dict:
+    """Copy of a workflow that also saves its final latent, for a later job to start from"""
+    sampler = final_sampler(workflow)
+    if sampler is None:
+        raise ValueError("Workflow has no sampler to save a latent from")
+    save_id, = new_ids(workflow, 1)
+    return {**workflow, save_id: {
+        "class_type": "SaveLatent",
+        "inputs": {"filename_prefix": f"{LATENT_SUBFOLDER}/{prefix}", "samples": [sampler, 0]},
+    }}
+
+
+def renoise(workflow: dict, latent: list, denoise: float) -> dict:
+    """Copy of a workflow whose first sampler starts from `latent` (a node link), re-noised only part way.
+
+    The EmptyLatentImage stays in place (ComfyUI skips nodes no output
+    needs), so frames and size still read back from the workflow's roles.
+    """
+    sampler_id, _ = start_sampler(workflow)
+    node = workflow[sampler_id]
+    inputs = {**node["inputs"], "latent_image": latent}
+    if node["class_type"] == "KSampler":
+        inputs["denoise"] = float(denoise)
+    else:
+        # KSamplerAdvanced: skip the steps a partial denoise leaves out
+        steps = int(inputs["steps"])
+        end = min(steps, int(inputs.get("end_at_step", steps)))
+        inputs["add_noise"] = "enable"
+        inputs["start_at_step"] = max(0, min(round(steps * (1 - denoise)), end - 1))
+    return {**workflow, sampler_id: {**node, "inputs": inputs}}
+
+
+def latent_name(path) -> str:
+    """Name to upload a saved latent under: the hash of its contents, so equal latents share cache keys"""
+    with open(path, "rb") as f:
+        return f"{hashlib.sha256(f.read()).hexdigest()}.latent"